@@ -24,10 +24,59 @@ def create_app(config_name='default'):
         r"/api/*": {
             "origins": ["http://localhost:3000", "http://localhost:8080"],
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"]
+            "allow_headers": ["Content-Type", "Authorization", "X-API-Key"]
         }
     })
     
+    # In-process redirect cache
+    from app.cache import init_redirect_cache
+    init_redirect_cache(app)
+    
+    # Cross-request caches of authenticated users and their team roles
+    from app.cache import init_user_cache, init_team_role_cache
+    init_user_cache(app)
+    init_team_role_cache(app)
+    
+    # Short-lived cache of filtered URL listing counts
+    from app.counters import init_listing_count_cache
+    init_listing_count_cache(app)
+    
+    # Versions of users whose token claims were revoked recently
+    from app.revocations import init_token_revocations
+    init_token_revocations(app)
+    
+    # bcrypt at a configured cost, off the request threads
+    from app.passwords import init_password_hasher
+    init_password_hasher(app)
+    
+    # Batched last-used tracking for API keys
+    from app.api_keys import init_api_key_usage
+    init_api_key_usage(app)
+    
+    # Buffered click counting
+    from app.clicks import init_click_aggregator
+    init_click_aggregator(app)
+    
+    # Bloom filter of existing short codes
+    from app.bloom import init_short_code_filter
+    init_short_code_filter(app)
+    
+    # Shared cross-worker redirect table
+    from app.shared_table import init_shared_redirect_table
+    init_shared_redirect_table(app)
+    
+    # Block-based short code allocation
+    from app.allocator import init_short_code_allocator
+    init_short_code_allocator(app)
+    
+    # Pre-generated random short codes, refilled in the background
+    from app.code_pool import init_short_code_pool
+    init_short_code_pool(app)
+    
+    # Preload the hottest redirects before accepting traffic
+    from app.cache import warm_redirect_cache
+    warm_redirect_cache(app)
+    
     # Import and register blueprints
     from app.routes import api_v1
     app.register_blueprint(api_v1)
@@ -36,9 +85,21 @@ def create_app(config_name='default'):
     from app.error_handlers import register_error_handlers
     register_error_handlers(app)
     
+    # Token-bucket rate limits shared by all workers on the node
+    from app.ratelimit import init_rate_limiter
+    init_rate_limiter(app)
+    
     # Health check endpoint
     @app.route('/health')
     def health_check():
         return {'status': 'healthy', 'version': '2.0.0'}, 200
     
+    # Register CLI commands
+    from app.cli import register_cli
+    register_cli(app)
+    
+    # Serve root-level /<code> redirects without the full request pipeline
+    from app.redirects import init_redirect_fast_path
+    init_redirect_fast_path(app)
+    
     return app
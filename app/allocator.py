@@ -0,0 +1,170 @@
+import hashlib
+import os
+import string
+import threading
+from collections import deque
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import URL, IdAllocator, ReservedShortCode
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+FEISTEL_ROUNDS = 4
+EXISTENCE_CHECK_CHUNK = 500
+
+def base62_encode(value, length):
+    """Encode a non-negative integer as exactly length base62 characters."""
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, BASE)
+        chars.append(ALPHABET[digit])
+    if value:
+        raise ValueError('Value does not fit in the requested length')
+    return ''.join(reversed(chars))
+
+def _round(key, index, value, modulus):
+    digest = hashlib.blake2b(f'{index}:{value}'.encode('utf-8'), key=key, digest_size=8).digest()
+    return int.from_bytes(digest, 'little') % modulus
+
+def scramble(value, length, key):
+    """Permute value within [0, 62**length) using a keyed Feistel network.
+    
+    Each round adds a keyed hash of one half to the other half, which is
+    invertible, so distinct inputs always give distinct outputs.
+    """
+    left_size = BASE ** (length // 2)
+    right_size = BASE ** (length - length // 2)
+    left, right = divmod(value, right_size)
+    for index in range(FEISTEL_ROUNDS):
+        if index % 2 == 0:
+            left = (left + _round(key, index, right, left_size)) % left_size
+        else:
+            right = (right + _round(key, index, left, right_size)) % right_size
+    return left * right_size + right
+
+def encode_id(value, min_length=6, key=None):
+    """Map an integer id to a unique short code of at least min_length characters.
+    
+    Ids fill the min_length keyspace first (62**6 codes for length 6), then
+    continue with one more character. With a key, codes within each length are
+    scrambled so consecutive ids do not give consecutive codes.
+    """
+    length = min_length
+    while value >= BASE ** length:
+        value -= BASE ** length
+        length += 1
+    if key:
+        value = scramble(value, length, key)
+    return base62_encode(value, length)
+
+class ShortCodeAllocator:
+    """Hands out short codes from blocks of ids leased from the ``id_allocators`` table.
+    
+    Each process leases ``block_size`` ids with a single UPDATE and then
+    allocates codes from memory. Codes in a new block that already exist
+    (older random codes, or codes reserved by the code pool) are dropped with
+    one IN query per table per block, so
+    no existence check runs per shorten. Ids left in a block when a worker
+    exits are simply never used.
+    """
+    
+    NAME = 'short_code'
+    
+    def __init__(self, block_size=100, min_length=6, scramble_key=None):
+        self.block_size = max(int(block_size), 1)
+        self.min_length = min_length
+        self._key = hashlib.sha256(scramble_key.encode('utf-8')).digest() if scramble_key else None
+        self._codes = deque()
+        self._pid = None
+        self._lock = threading.Lock()
+        self.blocks_leased = 0
+        self.codes_allocated = 0
+        self.codes_skipped = 0
+    
+    def allocate(self):
+        """Return an unused short code."""
+        return self.allocate_many(1)[0]
+    
+    def allocate_many(self, count):
+        """Return count unused short codes, leasing one block large enough for the rest."""
+        with self._lock:
+            if self._pid != os.getpid():
+                # A block inherited across fork would be handed out by both processes
+                self._codes.clear()
+                self._pid = os.getpid()
+            while len(self._codes) < count:
+                self._codes.extend(self._lease_block(max(self.block_size, count - len(self._codes))))
+            self.codes_allocated += count
+            return [self._codes.popleft() for _ in range(count)]
+    
+    def _reserve_ids(self, size):
+        """Advance the shared counter by size ids and return the first one."""
+        table = IdAllocator.__table__
+        for _ in range(2):
+            with db.engine.begin() as connection:
+                result = connection.execute(
+                    table.update().where(table.c.name == self.NAME).values(
+                        next_value=table.c.next_value + size
+                    )
+                )
+                if result.rowcount:
+                    end = connection.execute(
+                        select(table.c.next_value).where(table.c.name == self.NAME)
+                    ).scalar()
+                    return end - size
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(table.insert().values(name=self.NAME, next_value=1))
+            except IntegrityError:
+                # Another worker created the counter first
+                pass
+        raise RuntimeError('Could not lease a block of short code ids')
+    
+    def _lease_block(self, size):
+        start = self._reserve_ids(size)
+        codes = [
+            encode_id(value, self.min_length, self._key)
+            for value in range(start, start + size)
+        ]
+        taken = set()
+        with db.engine.connect() as connection:
+            for offset in range(0, len(codes), EXISTENCE_CHECK_CHUNK):
+                chunk = codes[offset:offset + EXISTENCE_CHECK_CHUNK]
+                taken.update(connection.execute(
+                    select(URL.short_code).where(URL.short_code.in_(chunk))
+                ).scalars())
+                taken.update(connection.execute(
+                    select(ReservedShortCode.short_code).where(ReservedShortCode.short_code.in_(chunk))
+                ).scalars())
+        self.blocks_leased += 1
+        self.codes_skipped += len(taken)
+        return [code for code in codes if code not in taken]
+    
+    def stats(self):
+        """Return block usage counters for this process."""
+        with self._lock:
+            return {
+                'block_size': self.block_size,
+                'min_length': self.min_length,
+                'scrambled': self._key is not None,
+                'remaining_in_block': len(self._codes),
+                'blocks_leased': self.blocks_leased,
+                'codes_allocated': self.codes_allocated,
+                'codes_skipped': self.codes_skipped
+            }
+
+def init_short_code_allocator(app):
+    """Attach the block-based short code allocator to the application."""
+    if app.config.get('SHORT_CODE_ALLOCATOR', 'sequence') != 'sequence':
+        return
+    app.extensions['short_code_allocator'] = ShortCodeAllocator(
+        block_size=app.config.get('SHORT_CODE_BLOCK_SIZE', 100),
+        min_length=app.config.get('SHORT_CODE_MIN_LENGTH', 6),
+        scramble_key=app.config.get('SHORT_CODE_SCRAMBLE_KEY')
+    )
+
+def get_short_code_allocator():
+    """Get the short code allocator for the current application, if enabled."""
+    return current_app.extensions.get('short_code_allocator')
@@ -0,0 +1,148 @@
+import atexit
+import hashlib
+import hmac
+import logging
+import secrets
+import threading
+import time
+import weakref
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import bindparam
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.models import ApiKey
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'usk_'
+PREFIX_LENGTH = 12
+SCOPES = ('urls:read', 'urls:write', 'analytics:read')
+DEFAULT_SCOPES = ('urls:read', 'urls:write')
+
+def generate_api_key():
+    """Return a new random API key."""
+    return KEY_PREFIX + secrets.token_urlsafe(32)
+
+def looks_like_api_key(value):
+    """Check if a bearer credential is an API key rather than a JWT."""
+    return bool(value) and value.startswith(KEY_PREFIX)
+
+def api_key_digest(key):
+    """Keyed digest under which an API key is stored and looked up."""
+    secret = current_app.config.get('API_KEY_SECRET') or current_app.config.get('SECRET_KEY', 'dev-secret-key')
+    return hmac.new(secret.encode('utf-8'), key.encode('utf-8'), hashlib.sha256).hexdigest()
+
+def create_api_key(user_id, name, scopes=DEFAULT_SCOPES, team_id=None):
+    """Create and add (without committing) an API key; return (row, key).
+    
+    The key itself is only available here; the database keeps its digest.
+    """
+    key = generate_api_key()
+    api_key = ApiKey(
+        user_id=user_id,
+        team_id=team_id,
+        name=name,
+        prefix=key[:PREFIX_LENGTH],
+        key_digest=api_key_digest(key),
+        scopes=','.join(scopes)
+    )
+    db.session.add(api_key)
+    return api_key, key
+
+def find_api_key(key):
+    """Return the active ApiKey for a presented key, or None.
+    
+    One indexed lookup by digest, then a constant-time comparison of the digests.
+    """
+    digest = api_key_digest(key)
+    api_key = ApiKey.query.filter_by(key_digest=digest).first()
+    if api_key is None or not hmac.compare_digest(api_key.key_digest, digest):
+        return None
+    if not api_key.is_active:
+        return None
+    return api_key
+
+class ApiKeyUsage:
+    """Buffers API key last-used times and writes them as one batched UPDATE.
+    
+    A request only records the time in memory. The first request after
+    ``flush_interval`` seconds writes every pending time at once, so a busy key
+    costs one UPDATE per interval instead of one per request.
+    """
+    
+    def __init__(self, app, flush_interval=60.0):
+        self.app = app
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.recorded = 0
+        self.flushes = 0
+        _usages.add(self)
+    
+    def record(self, key_id):
+        """Note that a key was used now, flushing if the interval has passed."""
+        with self._lock:
+            self._pending[key_id] = datetime.utcnow()
+            self.recorded += 1
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+    
+    def flush(self):
+        """Write pending last-used times; return the number of keys updated."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        
+        table = ApiKey.__table__
+        statement = table.update().where(table.c.id == bindparam('key_id')).values(
+            last_used_at=bindparam('used_at')
+        )
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(statement, [
+                        {'key_id': key_id, 'used_at': used_at} for key_id, used_at in pending.items()
+                    ])
+        except SQLAlchemyError:
+            logger.exception('Failed to write API key last-used times; will retry')
+            with self._lock:
+                for key_id, used_at in pending.items():
+                    self._pending.setdefault(key_id, used_at)
+            return 0
+        self.flushes += 1
+        return len(pending)
+    
+    def stats(self):
+        """Return buffering counters for this process."""
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'recorded': self.recorded,
+                'flushes': self.flushes,
+                'flush_interval': self.flush_interval
+            }
+
+_usages = weakref.WeakSet()
+
+def flush_all_api_key_usage():
+    """Write every buffered last-used time in this process (used on shutdown)."""
+    for usage in list(_usages):
+        usage.flush()
+
+atexit.register(flush_all_api_key_usage)
+
+def init_api_key_usage(app):
+    """Attach the API key last-used buffer to the application."""
+    app.extensions['api_key_usage'] = ApiKeyUsage(
+        app,
+        flush_interval=app.config.get('API_KEY_LAST_USED_INTERVAL', 60.0)
+    )
+
+def get_api_key_usage():
+    """Get the API key last-used buffer for the current application."""
+    return current_app.extensions.get('api_key_usage')
@@ -0,0 +1,246 @@
+import asyncio
+import io
+import json
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.urls import iri_to_uri
+from app import create_app
+from app.clicks import record_click, flush_all_click_buffers
+from app.api_keys import flush_all_api_key_usage
+from app.redirects import SHORT_CODE_PATH, RATE_LIMITED_KEY, lookup_cached_redirect, lookup_redirect
+
+API_REDIRECT_PATH = re.compile(r'^/api/v1/([A-Za-z0-9_-]{1,10})$')
+API_RESOLVE_PATH = re.compile(r'^/api/v1/resolve/([A-Za-z0-9_-]{1,10})$')
+
+def _json_body(payload):
+    return json.dumps(payload).encode('utf-8')
+
+NOT_FOUND = _json_body({'error': 'Not Found', 'message': 'Short URL not found'})
+GONE = _json_body({'error': 'Gone', 'message': 'This URL has expired'})
+
+class RedirectASGIApp:
+    """ASGI application that serves redirects and resolves on the event loop.
+    
+    Lookups answered from memory (shared table, redirect cache) never leave the
+    loop; misses go to the database on a bounded thread pool. Every other
+    request is handed to the regular Flask WSGI app on the same pool, so models,
+    config and extensions are shared with ``create_app``.
+    """
+    
+    def __init__(self, flask_app, max_threads=32):
+        self.flask_app = flask_app
+        self.executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='asgi-db')
+        self._reserved = {
+            rule.rule for rule in flask_app.url_map.iter_rules() if not rule.arguments
+        }
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        
+        path = scope['path']
+        if scope['method'] in ('GET', 'HEAD') and path not in self._reserved:
+            match = API_RESOLVE_PATH.match(path)
+            if match:
+                await self._resolve(match.group(1), scope, send)
+                return
+            match = SHORT_CODE_PATH.match(path) or API_REDIRECT_PATH.match(path)
+            if match and await self._redirect(match.group(1), scope, send):
+                return
+        
+        await self._call_wsgi(scope, receive, send)
+    
+    async def _lookup(self, short_code):
+        sync = self.flask_app.extensions.get('redirect_cache_sync')
+        if sync is not None and sync.due():
+            # Polls the database, so it runs off the event loop
+            await asyncio.get_running_loop().run_in_executor(self.executor, sync.check)
+        with self.flask_app.app_context():
+            entry = lookup_cached_redirect(short_code)
+        if entry is not None:
+            return entry
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self._lookup_sync, short_code
+        )
+    
+    def _lookup_sync(self, short_code):
+        with self.flask_app.app_context():
+            return lookup_redirect(short_code)
+    
+    def _record_click_sync(self, entry, short_code, headers):
+        with self.flask_app.app_context():
+            record_click(
+                entry.url_id,
+                short_code,
+                referrer=headers.get(b'referer', b'').decode('latin-1') or None,
+                user_agent=headers.get(b'user-agent', b'').decode('latin-1') or None
+            )
+    
+    def _rate_limit(self, scope):
+        """Check the per-IP redirect bucket; returns (result or None, extra headers)."""
+        limiter = self.flask_app.extensions.get('rate_limiter')
+        if limiter is None:
+            return None, []
+        client = scope.get('client') or ('', 0)
+        result = limiter.check('redirect', 'ip', client[0])
+        if result is None:
+            return None, []
+        headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in result.headers()]
+        return result, headers
+    
+    async def _redirect(self, short_code, scope, send):
+        """Serve a redirect. Returns False to let Flask answer unknown root-level paths."""
+        # Checked before the lookup, so floods of unknown codes never reach the database
+        limit, limit_headers = self._rate_limit(scope)
+        if limit is not None and not limit.allowed:
+            await self._send(send, scope, 429, [(b'content-type', b'application/json')] + limit_headers, limit.body())
+            return True
+        entry = await self._lookup(short_code)
+        if entry is None:
+            if scope['path'].startswith('/api/'):
+                await self._send(send, scope, 404, [(b'content-type', b'application/json')], NOT_FOUND)
+                return True
+            # Already charged; the WSGI fast path must not count this request again
+            scope[RATE_LIMITED_KEY] = True
+            return False
+        if entry.is_expired():
+            await self._send(send, scope, 410, [(b'content-type', b'application/json')] + limit_headers, GONE)
+            return True
+        
+        headers = dict(scope.get('headers') or [])
+        if 'click_aggregator' in self.flask_app.extensions:
+            # Only appends to the in-memory buffer, safe on the event loop
+            self._record_click_sync(entry, short_code, headers)
+        else:
+            self.executor.submit(self._record_click_sync, entry, short_code, headers)
+        
+        location = iri_to_uri(entry.long_url).encode('latin-1')
+        await self._send(send, scope, 302, [(b'location', location)] + limit_headers, b'')
+        return True
+    
+    async def _resolve(self, short_code, scope, send):
+        limit, limit_headers = self._rate_limit(scope)
+        if limit is not None and not limit.allowed:
+            await self._send(send, scope, 429, [(b'content-type', b'application/json')] + limit_headers, limit.body())
+            return
+        entry = await self._lookup(short_code)
+        if entry is None:
+            status, body = 404, NOT_FOUND
+        elif entry.is_expired():
+            status, body = 410, GONE
+        else:
+            status, body = 200, _json_body({
+                'short_code': short_code,
+                'long_url': entry.long_url,
+                'expires_at': entry.expires_at.isoformat() if entry.expires_at else None
+            })
+        await self._send(send, scope, status, [(b'content-type', b'application/json')] + limit_headers, body)
+    
+    async def _send(self, send, scope, status, headers, body):
+        if scope['method'] == 'HEAD':
+            body = b''
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers + [(b'content-length', str(len(body)).encode('latin-1'))]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+    
+    async def _call_wsgi(self, scope, receive, send):
+        """Run the Flask WSGI app for this request on the thread pool."""
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.extend(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        
+        environ = self._build_environ(scope, bytes(body))
+        status, headers, payload = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self._run_wsgi, environ
+        )
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                        for name, value in headers]
+        })
+        await send({'type': 'http.response.body', 'body': payload})
+    
+    def _run_wsgi(self, environ):
+        response = {}
+        chunks = []
+        
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = headers
+            return chunks.append
+        
+        iterable = self.flask_app.wsgi_app(environ, start_response)
+        try:
+            chunks.extend(iterable)
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+        return response['status'], response['headers'], b''.join(chunks)
+    
+    def _build_environ(self, scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+            RATE_LIMITED_KEY: scope.get(RATE_LIMITED_KEY, False)
+        }
+        for name, value in scope.get('headers') or []:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+                continue
+            if name == 'CONTENT_LENGTH':
+                continue
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+    
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self.executor, flush_all_click_buffers)
+                await loop.run_in_executor(self.executor, flush_all_api_key_usage)
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+def create_asgi_app(config_name='default'):
+    """Build the ASGI serving mode around a regular Flask app."""
+    flask_app = create_app(config_name)
+    return RedirectASGIApp(
+        flask_app,
+        max_threads=flask_app.config.get('ASGI_DB_THREADS', 32)
+    )
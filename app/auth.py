@@ -1,28 +1,85 @@
 import jwt
-import bcrypt
+from collections import namedtuple
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import request, jsonify, current_app
-from app.models import User
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import make_transient_to_detached
+from app.models import User, TeamMember
+from app.cache import get_user_cache, get_team_role_cache
+from app.passwords import get_password_hasher
+from app.api_keys import looks_like_api_key, find_api_key, get_api_key_usage
+from app.revocations import get_token_revocations
 from app import db
 
+# request.environ keys holding what was resolved for the current request
+CURRENT_USER_KEY = 'url_shortener.current_user'
+CURRENT_API_KEY_KEY = 'url_shortener.api_key'
+CURRENT_IDENTITY_KEY = 'url_shortener.identity'
+TOKEN_PAYLOAD_KEY = 'url_shortener.token_payload'
+
+class Identity(namedtuple('Identity', ['user_id', 'username', 'is_admin', 'teams'])):
+    """Who is making the request and what they may do.
+    
+    ``teams`` maps team_id -> role when taken from token claims, and is None
+    when roles have to be looked up.
+    """
+    __slots__ = ()
+    
+    def team_role(self, team_id):
+        """Return the role in the team, or None if not a member."""
+        if self.teams is None:
+            return get_team_role(self.user_id, team_id)
+        try:
+            return self.teams.get(int(team_id))
+        except (TypeError, ValueError):
+            return None
+
 def hash_password(password):
-    """Hash a password using bcrypt."""
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    """Hash a password using bcrypt at the configured cost (BCRYPT_LOG_ROUNDS)."""
+    return get_password_hasher().hash(password)
 
 def verify_password(password, hashed):
     """Verify a password against its hash."""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    return get_password_hasher().verify(password, hashed)
+
+def password_needs_rehash(hashed):
+    """Return True if the hash was made with a lower cost than BCRYPT_LOG_ROUNDS."""
+    return get_password_hasher().needs_rehash(hashed)
+
+def token_claims(user_id):
+    """Authorization claims for a user's tokens, or None if the user does not exist.
+    
+    The version is read before the team roles, so a membership change that
+    lands in between leaves the token stale rather than trusted.
+    """
+    row = db.session.execute(
+        select(User.is_active, User.is_admin, User.token_version).where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+    teams = db.session.execute(
+        select(TeamMember.team_id, TeamMember.role).where(TeamMember.user_id == user_id)
+    ).all()
+    return {
+        'act': bool(row.is_active),
+        'adm': bool(row.is_admin),
+        'ver': row.token_version,
+        'teams': {str(team_id): role for team_id, role in teams}
+    }
 
-def generate_token(user_id, username, expires_in=3600):
-    """Generate JWT token for user."""
+def generate_token(user_id, username, expires_in=None):
+    """Generate JWT token for user, carrying their authorization claims."""
+    if expires_in is None:
+        expires_in = current_app.config.get('JWT_ACCESS_TOKEN_EXPIRES', 3600)
     payload = {
         'user_id': user_id,
         'username': username,
         'exp': datetime.utcnow() + timedelta(seconds=expires_in),
         'iat': datetime.utcnow()
     }
+    if current_app.config.get('JWT_STATELESS_CLAIMS', True):
+        payload.update(token_claims(user_id) or {})
     secret_key = current_app.config.get('SECRET_KEY', 'dev-secret-key')
     return jwt.encode(payload, secret_key, algorithm='HS256')
 
@@ -37,30 +94,193 @@ def verify_token(token):
     except jwt.InvalidTokenError:
         return None
 
-def get_current_user():
-    """Get current user from JWT token."""
+def load_user(user_id):
+    """Load a user by id, from the user cache when possible.
+    
+    Cache hits are attached to the session without a query, so relationships
+    still lazy-load and changes still flush as usual.
+    """
+    cache = get_user_cache()
+    snapshot = cache.get(user_id) if cache is not None else None
+    if snapshot is not None:
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    
+    user = db.session.get(User, user_id)
+    if user is not None and cache is not None:
+        cache.set(user_id, {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs})
+    return user
+
+def _presented_api_key(auth_header):
+    """Return the API key sent in X-API-Key or as the bearer token, if any."""
+    key = request.headers.get('X-API-Key')
+    if key:
+        return key
+    token = (auth_header or '').split(' ')[-1]
+    return token if looks_like_api_key(token) else None
+
+def _endpoint_accepts_api_keys():
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, 'api_key_scope', None) is not None
+
+def _resolve_api_key_user(key):
+    # Only endpoints that declare an api_key_scope accept keys
+    if not _endpoint_accepts_api_keys():
+        return None
+    api_key = find_api_key(key)
+    if api_key is None:
+        return None
+    user = load_user(api_key.user_id)
+    if not user or not user.is_active:
+        return None
+    request.environ[CURRENT_API_KEY_KEY] = api_key
+    usage = get_api_key_usage()
+    if usage is not None:
+        usage.record(api_key.id)
+    return user
+
+def _token_payload(auth_header):
+    """Decode the bearer JWT once per request; None if missing or invalid."""
+    if TOKEN_PAYLOAD_KEY not in request.environ:
+        payload = None
+        try:
+            token = auth_header.split(' ')[1]  # Bearer <token>
+            payload = verify_token(token)
+        except (AttributeError, IndexError):
+            pass
+        request.environ[TOKEN_PAYLOAD_KEY] = payload
+    return request.environ[TOKEN_PAYLOAD_KEY]
+
+def _resolve_current_user():
     auth_header = request.headers.get('Authorization')
+    key = _presented_api_key(auth_header)
+    if key is not None:
+        return _resolve_api_key_user(key)
     if not auth_header:
         return None
     
     try:
-        token = auth_header.split(' ')[1]  # Bearer <token>
-        payload = verify_token(token)
+        payload = _token_payload(auth_header)
         if payload:
-            user = User.query.get(payload['user_id'])
+            user = load_user(payload['user_id'])
             if user and user.is_active:
                 return user
-    except (IndexError, KeyError):
+    except KeyError:
         pass
     
     return None
 
+def _identity_from_claims(auth_header):
+    """Build the identity from a token's claims, or return None to look it up.
+    
+    Claims are used only if the token carries them and its version is not
+    revoked; otherwise the user is loaded and checked as usual.
+    """
+    if not current_app.config.get('JWT_STATELESS_CLAIMS', True):
+        return None
+    if not auth_header or _presented_api_key(auth_header) is not None:
+        return None
+    payload = _token_payload(auth_header)
+    if not payload or 'ver' not in payload or 'user_id' not in payload:
+        return None
+    revocations = get_token_revocations()
+    if revocations is None or not revocations.is_current(payload['user_id'], payload['ver']):
+        return None
+    return Identity(
+        payload['user_id'],
+        payload.get('username'),
+        bool(payload.get('adm')),
+        {int(team_id): role for team_id, role in (payload.get('teams') or {}).items()}
+    )
+
+def _resolve_identity():
+    auth_header = request.headers.get('Authorization')
+    identity = _identity_from_claims(auth_header)
+    if identity is not None:
+        # Tokens are only issued to active users; deactivation revokes the claims
+        return identity if _token_payload(auth_header).get('act') else None
+    user = get_current_user()
+    if user is None:
+        return None
+    return Identity(user.id, user.username, bool(user.is_admin), None)
+
+def get_current_identity():
+    """Get the identity for the current request, from trusted token claims when possible.
+    
+    Unlike get_current_user, this needs no database access for a current token,
+    which is all the auth decorators need.
+    """
+    if CURRENT_IDENTITY_KEY not in request.environ:
+        request.environ[CURRENT_IDENTITY_KEY] = _resolve_identity()
+    return request.environ[CURRENT_IDENTITY_KEY]
+
+def get_current_user():
+    """Get current user from the JWT token or API key.
+    
+    The result is memoized for the rest of the request, so the decorators and
+    the handler share one token decode and at most one user lookup.
+    """
+    if CURRENT_USER_KEY not in request.environ:
+        request.environ[CURRENT_USER_KEY] = _resolve_current_user()
+    return request.environ[CURRENT_USER_KEY]
+
+def get_team_role(user_id, team_id):
+    """Return the user's role in the team, or None if they are not a member.
+    
+    Answers, including "not a member", are cached per (user_id, team_id) for
+    TEAM_ROLE_CACHE_TTL seconds; membership changes made through the ORM evict
+    them at once.
+    """
+    try:
+        team_id = int(team_id)
+    except (TypeError, ValueError):
+        return None
+    
+    cache = get_team_role_cache()
+    key = (user_id, team_id)
+    role = cache.get(key) if cache is not None else None
+    if role is None:
+        membership = TeamMember.query.filter_by(user_id=user_id, team_id=team_id).first()
+        # '' marks a cached non-membership, since the cache returns None on a miss
+        role = membership.role if membership is not None else ''
+        if cache is not None:
+            cache.set(key, role)
+    return role or None
+
+def get_current_api_key():
+    """Return the ApiKey that authenticated the current request, or None for JWTs."""
+    if _presented_api_key(request.headers.get('Authorization')) is None:
+        return None
+    get_current_user()
+    return request.environ.get(CURRENT_API_KEY_KEY)
+
+def api_key_scope(scope):
+    """Decorator letting API keys with the given scope call an endpoint.
+    
+    Place it below login_required. JWT-authenticated requests are unaffected;
+    endpoints without this decorator do not accept API keys at all.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            api_key = get_current_api_key()
+            if api_key is not None and not api_key.has_scope(scope):
+                return jsonify({
+                    'error': 'Insufficient Scope',
+                    'message': f'API key lacks the {scope} scope'
+                }), 403
+            return f(*args, **kwargs)
+        decorated_function.api_key_scope = scope
+        return decorated_function
+    return decorator
+
 def login_required(f):
     """Decorator to require authentication."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        user = get_current_user()
-        if not user:
+        identity = get_current_identity()
+        if not identity:
             return jsonify({
                 'error': 'Authentication Required',
                 'message': 'Valid JWT token is required'
@@ -72,14 +292,14 @@ def admin_required(f):
     """Decorator to require admin privileges."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        user = get_current_user()
-        if not user:
+        identity = get_current_identity()
+        if not identity:
             return jsonify({
                 'error': 'Authentication Required',
                 'message': 'Valid JWT token is required'
             }), 401
         
-        if not user.is_admin:
+        if not identity.is_admin:
             return jsonify({
                 'error': 'Access Denied',
                 'message': 'Admin privileges required'
@@ -93,8 +313,8 @@ def team_member_required(team_id_param='team_id'):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            user = get_current_user()
-            if not user:
+            identity = get_current_identity()
+            if not identity:
                 return jsonify({
                     'error': 'Authentication Required',
                     'message': 'Valid JWT token is required'
@@ -114,13 +334,7 @@ def team_member_required(team_id_param='team_id'):
                 }), 400
             
             # Check if user is member of the team
-            from app.models import TeamMember
-            membership = TeamMember.query.filter_by(
-                user_id=user.id,
-                team_id=team_id
-            ).first()
-            
-            if not membership:
+            if identity.team_role(team_id) is None:
                 return jsonify({
                     'error': 'Access Denied',
                     'message': 'Team membership required'
@@ -135,8 +349,8 @@ def team_admin_required(team_id_param='team_id'):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            user = get_current_user()
-            if not user:
+            identity = get_current_identity()
+            if not identity:
                 return jsonify({
                     'error': 'Authentication Required',
                     'message': 'Valid JWT token is required'
@@ -156,14 +370,7 @@ def team_admin_required(team_id_param='team_id'):
                 }), 400
             
             # Check if user is admin of the team
-            from app.models import TeamMember
-            membership = TeamMember.query.filter_by(
-                user_id=user.id,
-                team_id=team_id,
-                role='admin'
-            ).first()
-            
-            if not membership:
+            if identity.team_role(team_id) != 'admin':
                 return jsonify({
                     'error': 'Access Denied',
                     'message': 'Team admin privileges required'
@@ -0,0 +1,222 @@
+import hashlib
+import math
+import threading
+import time
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.models import URL
+
+# Ids below the high-water mark that have not been seen may belong to a transaction
+# still in flight (a batch shorten or import chunk committing after later ids).
+# They are re-checked on every refresh until they appear or this many seconds pass,
+# which is longer than any insert transaction; ids left by rollbacks or deletes expire.
+PENDING_ID_TIMEOUT = 600
+# Most unseen ids tracked at once; the highest are kept, since in-flight rows are recent
+MAX_PENDING_IDS = 10000
+# Ids per IN (...) query when re-checking unseen ids
+PENDING_ID_BATCH = 500
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing."""
+    
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.num_bits = max(int(math.ceil(
+            -self.capacity * math.log(error_rate) / (math.log(2) ** 2)
+        )), 8)
+        self.num_hashes = max(int(round(self.num_bits / self.capacity * math.log(2))), 1)
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+    
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+    
+    def add(self, key):
+        """Add key to the filter."""
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+    
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+    
+    @property
+    def size_bytes(self):
+        return len(self._bits)
+    
+    def estimated_false_positive_rate(self):
+        """Expected false-positive rate at the current fill level."""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+class ShortCodeFilter:
+    """Bloom filter of existing short codes, used to reject unknown codes without a query.
+    
+    The filter is built from the database on first use, updated on every insert in
+    this process, and caught up with inserts from other workers at most once per
+    ``refresh_interval`` seconds before it answers "definitely not present".
+    """
+    
+    def __init__(self, capacity=1000000, error_rate=0.001, refresh_interval=1.0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self._filter = None
+        self._max_id = 0
+        self._pending = {}
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        self.rejections = 0
+        self.false_positives = 0
+        self.builds = 0
+        self.build_seconds = 0.0
+    
+    def build(self):
+        """(Re)build the filter from every short code in the database and return it."""
+        started = time.monotonic()
+        with self._lock:
+            total = db.session.query(db.func.count(URL.id)).scalar() or 0
+            bloom = BloomFilter(max(self.capacity, total * 2), self.error_rate)
+            self._filter = bloom
+            self._max_id = 0
+            self._pending = {}
+            rows = db.session.query(URL.id, URL.short_code).order_by(URL.id) \
+                .execution_options(yield_per=10000)
+            self._add_rows(bloom, rows, time.monotonic())
+            self._last_refresh = time.monotonic()
+            self.builds += 1
+            self.build_seconds = round(time.monotonic() - started, 4)
+        return bloom
+    
+    def _add_rows(self, bloom, rows, now):
+        """Add (id, short_code) rows in id order and track the ids skipped over."""
+        for url_id, short_code in rows:
+            if short_code not in bloom:
+                bloom.add(short_code)
+            self._pending.pop(url_id, None)
+            if url_id > self._max_id:
+                # Only the last MAX_PENDING_IDS ids of a long jump can still be in flight
+                for missing in range(max(self._max_id + 1, url_id - MAX_PENDING_IDS), url_id):
+                    self._pending[missing] = now
+                self._max_id = url_id
+        if len(self._pending) > MAX_PENDING_IDS:
+            self._pending = {url_id: self._pending[url_id] for url_id in sorted(self._pending)[-MAX_PENDING_IDS:]}
+    
+    def refresh(self):
+        """Add short codes committed since the last build or refresh.
+        
+        Besides ids above the high-water mark, re-checks the ids below it that
+        have not been seen yet, so rows committed out of id order are not missed.
+        Returns the filter, or None if it was dropped for a rebuild meanwhile.
+        """
+        with self._lock:
+            bloom = self._filter
+            if bloom is None:
+                return None
+            now = time.monotonic()
+            self._pending = {
+                url_id: seen for url_id, seen in self._pending.items()
+                if now - seen < PENDING_ID_TIMEOUT
+            }
+            pending = sorted(self._pending)
+            rows = []
+            for start in range(0, len(pending), PENDING_ID_BATCH):
+                rows += db.session.query(URL.id, URL.short_code).filter(
+                    URL.id.in_(pending[start:start + PENDING_ID_BATCH])
+                ).all()
+            rows += db.session.query(URL.id, URL.short_code).filter(
+                URL.id > self._max_id
+            ).order_by(URL.id).all()
+            self._add_rows(bloom, rows, now)
+            self._last_refresh = now
+        return bloom
+    
+    def add(self, short_code):
+        """Record a newly inserted short code."""
+        bloom = self._filter
+        if bloom is None:
+            return
+        bloom.add(short_code)
+        if bloom.count > bloom.capacity:
+            # Over capacity the false-positive rate climbs; rebuild larger on next use
+            self._filter = None
+    
+    def might_contain(self, short_code):
+        """Return False only if short_code definitely does not exist."""
+        # add() may drop the filter from another thread at any time, so read it once
+        bloom = self._filter
+        if bloom is None:
+            bloom = self.build()
+        if short_code in bloom:
+            return True
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            bloom = self.refresh()
+            if bloom is None:
+                bloom = self.build()
+            if short_code in bloom:
+                return True
+        self.rejections += 1
+        return False
+    
+    def record_false_positive(self):
+        """Count a lookup the filter let through that the database did not find."""
+        self.false_positives += 1
+    
+    def stats(self):
+        """Return configuration, memory use and effectiveness counters."""
+        bloom = self._filter
+        return {
+            'built': bloom is not None,
+            'capacity': bloom.capacity if bloom else self.capacity,
+            'configured_error_rate': self.error_rate,
+            'estimated_error_rate': round(bloom.estimated_false_positive_rate(), 6) if bloom else None,
+            'entries': bloom.count if bloom else 0,
+            'size_bytes': bloom.size_bytes if bloom else 0,
+            'num_hashes': bloom.num_hashes if bloom else None,
+            'refresh_interval': self.refresh_interval,
+            'rejections': self.rejections,
+            'false_positives': self.false_positives,
+            'builds': self.builds,
+            'build_seconds': self.build_seconds
+        }
+
+def init_short_code_filter(app):
+    """Attach the short code Bloom filter to the application."""
+    if not app.config.get('BLOOM_FILTER_ENABLED', True):
+        return
+    code_filter = ShortCodeFilter(
+        capacity=app.config.get('BLOOM_FILTER_CAPACITY', 1000000),
+        error_rate=app.config.get('BLOOM_FILTER_ERROR_RATE', 0.001),
+        refresh_interval=app.config.get('BLOOM_FILTER_REFRESH_INTERVAL', 1.0)
+    )
+    app.extensions['short_code_filter'] = code_filter
+    
+    if app.config.get('BLOOM_FILTER_BUILD_ON_STARTUP', True):
+        with app.app_context():
+            try:
+                code_filter.build()
+                app.logger.info('Built short code filter: %s', code_filter.stats())
+            except SQLAlchemyError:
+                # Tables not created yet; the filter is built on first lookup instead
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+def get_short_code_filter():
+    """Get the short code filter for the current application, if enabled."""
+    return current_app.extensions.get('short_code_filter')
+
+@event.listens_for(URL, 'after_insert')
+def _add_inserted_short_code(mapper, connection, target):
+    if not has_app_context():
+        return
+    code_filter = current_app.extensions.get('short_code_filter')
+    if code_filter is not None:
+        code_filter.add(target.short_code)
@@ -0,0 +1,368 @@
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.models import URL, User, TeamMember, ClickRollupHourly
+
+class RedirectEntry(namedtuple('RedirectEntry', ['url_id', 'long_url', 'expires_at', 'is_active'])):
+    """Cached redirect target for a short code."""
+    __slots__ = ()
+    
+    def is_expired(self):
+        """Check if the cached URL has expired."""
+        if self.expires_at is None:
+            return False
+        return datetime.utcnow() > self.expires_at
+
+def _default_sizeof(key, value):
+    """Rough memory footprint of a cache entry in bytes."""
+    return sys.getsizeof(key) + sys.getsizeof(value)
+
+def redirect_entry_sizeof(key, entry):
+    """Rough memory footprint of a redirect cache entry in bytes."""
+    return sys.getsizeof(key) + sys.getsizeof(entry) + sys.getsizeof(entry.long_url)
+
+class LRUCache:
+    """Thread-safe LRU cache with a per-entry TTL and an optional memory budget."""
+    
+    def __init__(self, max_entries=10000, ttl=300, max_bytes=None, sizeof=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or _default_sizeof
+        self._data = OrderedDict()  # key -> (value, deadline, size)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            value, deadline, size = item
+            if deadline is not None and time.monotonic() > deadline:
+                del self._data[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key, value, ttl=None):
+        """Store value under key, evicting least recently used entries as needed."""
+        ttl = self.ttl if ttl is None else ttl
+        deadline = time.monotonic() + ttl if ttl else None
+        size = self._sizeof(key, value)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._data[key] = (value, deadline, size)
+            self._bytes += size
+            while self._data and (
+                len(self._data) > self.max_entries or
+                (self.max_bytes and self._bytes > self.max_bytes)
+            ):
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+    
+    def invalidate(self, key):
+        """Drop key from the cache if present."""
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is not None:
+                self._bytes -= item[2]
+    
+    def invalidate_where(self, predicate):
+        """Drop every key for which predicate(key) is true."""
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                self._bytes -= self._data.pop(key)[2]
+    
+    def clear(self):
+        """Drop every entry from the cache."""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+    
+    def __len__(self):
+        return len(self._data)
+    
+    def __contains__(self, key):
+        return key in self._data
+    
+    def stats(self):
+        """Return hit/miss/eviction counters and current usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+class RedirectCacheSync:
+    """Drops redirect cache entries of URLs changed in other processes.
+    
+    Edits and soft deletes in this process invalidate the cache at once, but
+    other workers would keep serving the old target until the TTL. Every
+    ``refresh_interval`` seconds one query on the ``updated_at`` index fetches
+    the short codes of URLs changed since the previous poll (clicks leave
+    ``updated_at`` alone) and drops them. Polls overlap by one interval so rows
+    committed shortly after their ``updated_at`` was set are not missed.
+    """
+    
+    def __init__(self, app, cache, refresh_interval=5.0):
+        self.app = app
+        self.cache = cache
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._since = datetime.utcnow()
+        self._refreshed_at = time.monotonic()
+        self.refreshes = 0
+        self.changed_urls = 0
+    
+    def due(self):
+        """Check if the next refresh is due."""
+        return time.monotonic() - self._refreshed_at >= self.refresh_interval
+    
+    def check(self):
+        """Refresh if due; other threads skip a refresh already in progress."""
+        if not self.due():
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self.refresh()
+        finally:
+            self._lock.release()
+    
+    def refresh(self):
+        """Invalidate the short codes of URLs updated since the previous refresh."""
+        started = datetime.utcnow()
+        since = self._since - timedelta(seconds=self.refresh_interval)
+        try:
+            with self.app.app_context():
+                with db.engine.connect() as connection:
+                    codes = connection.execute(
+                        select(URL.short_code).where(URL.updated_at >= since)
+                    ).scalars().all()
+        except SQLAlchemyError:
+            # Entries changed meanwhile are served until the next refresh or their TTL
+            self.app.logger.exception('Failed to refresh the redirect cache')
+            self._refreshed_at = time.monotonic()
+            return
+        for short_code in codes:
+            self.cache.invalidate(short_code)
+        self._since = started
+        self._refreshed_at = time.monotonic()
+        self.refreshes += 1
+        self.changed_urls += len(codes)
+    
+    def stats(self):
+        """Return the refresh interval and counters."""
+        return {
+            'refresh_interval': self.refresh_interval,
+            'refreshes': self.refreshes,
+            'changed_urls': self.changed_urls
+        }
+
+def init_redirect_cache(app):
+    """Attach the redirect cache to the application."""
+    if not app.config.get('REDIRECT_CACHE_ENABLED', True):
+        return
+    app.extensions['redirect_cache'] = LRUCache(
+        max_entries=app.config.get('REDIRECT_CACHE_MAX_ENTRIES', 10000),
+        ttl=app.config.get('REDIRECT_CACHE_TTL', 300),
+        max_bytes=app.config.get('REDIRECT_CACHE_MAX_BYTES'),
+        sizeof=redirect_entry_sizeof
+    )
+    
+    interval = app.config.get('REDIRECT_CACHE_SYNC_INTERVAL', 5.0)
+    if interval > 0:
+        app.extensions['redirect_cache_sync'] = RedirectCacheSync(
+            app, app.extensions['redirect_cache'], refresh_interval=interval
+        )
+
+def get_redirect_cache():
+    """Get the redirect cache for the current application, if enabled."""
+    return current_app.extensions.get('redirect_cache')
+
+def get_redirect_cache_sync():
+    """Get the poller for URLs changed by other workers, if enabled."""
+    return current_app.extensions.get('redirect_cache_sync')
+
+def invalidate_redirect(short_code):
+    """Drop a short code from the redirect cache."""
+    cache = get_redirect_cache()
+    if cache is not None:
+        cache.invalidate(short_code)
+
+def init_user_cache(app):
+    """Attach the cache of user rows (keyed by user_id) used to resolve JWTs."""
+    if not app.config.get('USER_CACHE_ENABLED', True):
+        return
+    app.extensions['user_cache'] = LRUCache(
+        max_entries=app.config.get('USER_CACHE_MAX_ENTRIES', 10000),
+        ttl=app.config.get('USER_CACHE_TTL', 30)
+    )
+
+def get_user_cache():
+    """Get the user cache for the current application, if enabled."""
+    return current_app.extensions.get('user_cache')
+
+def invalidate_user(user_id):
+    """Drop a user from the user cache, e.g. after deactivation or promotion."""
+    cache = get_user_cache()
+    if cache is not None:
+        cache.invalidate(user_id)
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_changed_user(mapper, connection, target):
+    if has_app_context():
+        invalidate_user(target.id)
+
+def init_team_role_cache(app):
+    """Attach the cache of team roles keyed by (user_id, team_id)."""
+    if not app.config.get('TEAM_ROLE_CACHE_ENABLED', True):
+        return
+    app.extensions['team_role_cache'] = LRUCache(
+        max_entries=app.config.get('TEAM_ROLE_CACHE_MAX_ENTRIES', 10000),
+        ttl=app.config.get('TEAM_ROLE_CACHE_TTL', 10)
+    )
+
+def get_team_role_cache():
+    """Get the team role cache for the current application, if enabled."""
+    return current_app.extensions.get('team_role_cache')
+
+def invalidate_team_role(user_id, team_id):
+    """Drop a cached membership, e.g. after a member is added, removed or changes role."""
+    cache = get_team_role_cache()
+    if cache is not None:
+        cache.invalidate((user_id, team_id))
+
+def invalidate_user_team_roles(user_id):
+    """Drop every cached membership of a user, in whichever teams."""
+    cache = get_team_role_cache()
+    if cache is not None:
+        cache.invalidate_where(lambda key: key[0] == user_id)
+
+@event.listens_for(TeamMember, 'after_insert')
+@event.listens_for(TeamMember, 'after_update')
+@event.listens_for(TeamMember, 'after_delete')
+def _invalidate_changed_membership(mapper, connection, target):
+    if has_app_context():
+        invalidate_team_role(target.user_id, target.team_id)
+
+def _hottest_urls(strategy, limit, window_hours):
+    """Return (query, total clicks) for the hottest active URLs, hottest first."""
+    now = datetime.utcnow()
+    columns = (URL.id, URL.short_code, URL.long_url, URL.expires_at)
+    live = db.and_(
+        URL.is_active == True,
+        db.or_(URL.expires_at.is_(None), URL.expires_at > now)
+    )
+    
+    if strategy == 'recent':
+        since = now - timedelta(hours=window_hours)
+        recent = db.func.sum(ClickRollupHourly.clicks)
+        total = db.session.query(db.func.sum(ClickRollupHourly.clicks)).filter(
+            ClickRollupHourly.bucket_start >= since
+        ).scalar()
+        if total:
+            query = db.session.query(*columns, recent).join(
+                ClickRollupHourly, ClickRollupHourly.url_id == URL.id
+            ).filter(
+                live, ClickRollupHourly.bucket_start >= since
+            ).group_by(*columns).order_by(recent.desc()).limit(limit)
+            return query, total
+        # No rollups in the window yet (fresh install); fall back to lifetime counts
+    
+    total = db.session.query(db.func.sum(URL.click_count)).filter(live).scalar() or 0
+    query = db.session.query(*columns, URL.click_count).filter(live).order_by(
+        URL.click_count.desc()
+    ).limit(limit)
+    return query, total
+
+def warm_redirect_cache(app):
+    """Preload the hottest URLs into the redirect cache before serving traffic.
+    
+    URLs are ranked by lifetime ``click_count`` or, with the ``recent`` strategy,
+    by clicks in the last ``REDIRECT_CACHE_WARMUP_WINDOW_HOURS`` hours. Loading
+    stops at ``REDIRECT_CACHE_WARMUP_SIZE`` URLs or once the time budget is
+    spent, whichever comes first. Returns the warm-up stats, or None if skipped.
+    """
+    cache = app.extensions.get('redirect_cache')
+    if cache is None or not app.config.get('REDIRECT_CACHE_WARMUP_ENABLED', False):
+        return None
+    
+    strategy = app.config.get('REDIRECT_CACHE_WARMUP_STRATEGY', 'clicks')
+    limit = min(app.config.get('REDIRECT_CACHE_WARMUP_SIZE', 1000), cache.max_entries)
+    budget = app.config.get('REDIRECT_CACHE_WARMUP_BUDGET', 2.0)
+    started = time.monotonic()
+    entries = []
+    covered = 0
+    timed_out = False
+    
+    with app.app_context():
+        try:
+            query, total = _hottest_urls(
+                strategy, limit, app.config.get('REDIRECT_CACHE_WARMUP_WINDOW_HOURS', 24)
+            )
+            for url_id, short_code, long_url, expires_at, clicks in query.yield_per(500):
+                entries.append((short_code, RedirectEntry(url_id, long_url, expires_at, True)))
+                covered += clicks or 0
+                if time.monotonic() - started > budget:
+                    timed_out = True
+                    break
+        except SQLAlchemyError:
+            # Tables not created yet; nothing to warm
+            db.session.rollback()
+            app.logger.warning('Skipped redirect cache warm-up: database not ready')
+            return None
+        finally:
+            db.session.remove()
+    
+    # Insert coldest first so the hottest URLs end up most recently used
+    for short_code, entry in reversed(entries):
+        cache.set(short_code, entry)
+    
+    stats = {
+        'strategy': strategy,
+        'loaded': len(entries),
+        'requested': limit,
+        'seconds': round(time.monotonic() - started, 4),
+        'timed_out': timed_out,
+        'click_coverage': round(covered / total, 4) if total else None
+    }
+    app.extensions['redirect_cache_warmup'] = stats
+    app.logger.info(
+        'Warmed redirect cache with %d/%d URLs in %.3fs (%s%s), covering %s of clicks',
+        stats['loaded'], limit, stats['seconds'], strategy,
+        ', time budget exhausted' if timed_out else '',
+        f"{stats['click_coverage']:.1%}" if total else 'n/a'
+    )
+    return stats
@@ -0,0 +1,46 @@
+import click
+
+def register_cli(app):
+    """Register custom flask CLI commands."""
+    
+    @app.cli.command('redirect-table-writer')
+    @click.option('--heartbeat', default=1.0, show_default=True,
+                  help='Seconds between writer heartbeats.')
+    @click.option('--sync-interval', default=30.0, show_default=True,
+                  help='Seconds between catch-up syncs from the database.')
+    def redirect_table_writer(heartbeat, sync_interval):
+        """Run the single writer for the shared redirect table."""
+        from app.shared_table import run_writer
+        click.echo(f"Writing shared redirect table to {app.config['SHARED_REDIRECT_TABLE_PATH']}")
+        run_writer(app, heartbeat_interval=heartbeat, sync_interval=sync_interval)
+    
+    @app.cli.command('import-links')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default=None,
+                  help='File format (default: from the file extension).')
+    @click.option('--chunk-size', default=1000, show_default=True,
+                  help='Rows validated, inserted and committed together.')
+    @click.option('--user-id', type=int, default=None, help='Owner of the imported links.')
+    @click.option('--team-id', type=int, default=None, help='Team of the imported links.')
+    @click.option('--checkpoint', 'name', default=None,
+                  help='Checkpoint name (default: the absolute file path).')
+    @click.option('--restart', is_flag=True,
+                  help='Discard the checkpoint and import from the first row.')
+    @click.option('--rejects', 'rejects_path', type=click.Path(dir_okay=False), default=None,
+                  help='Append rejected rows with their errors to this NDJSON file.')
+    def import_links_command(path, fmt, chunk_size, user_id, team_id, name, restart, rejects_path):
+        """Import (long_url, short_code, created_at, click_count) rows from CSV or NDJSON."""
+        from app.importer import import_links
+        try:
+            stats = import_links(
+                path, fmt=fmt, chunk_size=chunk_size, name=name, restart=restart,
+                user_id=user_id, team_id=team_id, rejects_path=rejects_path, progress=click.echo
+            )
+        except (ValueError, RuntimeError) as e:
+            raise click.ClickException(str(e))
+        if stats['resumed_from']:
+            click.echo(f"Resumed after row {stats['resumed_from']}")
+        click.echo(
+            f"Imported {stats['imported']} links, rejected {stats['rejected']} "
+            f"in {stats['seconds']}s ({stats['rows_per_second']} rows/s)"
+        )
@@ -0,0 +1,268 @@
+import atexit
+import hashlib
+import logging
+import os
+import threading
+import weakref
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import bindparam, func
+from app import db
+from app.models import URL, Click
+from app.rollups import increment_rollups, truncate
+
+logger = logging.getLogger(__name__)
+
+# Every aggregator created in this process, so shutdown hooks can drain them
+_aggregators = weakref.WeakSet()
+
+REFERRER_MAX_LENGTH = 500
+
+def hash_user_agent(user_agent):
+    """SHA-256 hex digest of a User-Agent header, or None if absent."""
+    if not user_agent:
+        return None
+    return hashlib.sha256(user_agent.encode('utf-8')).hexdigest()
+
+class ClickAggregator:
+    """Per-worker buffer of clicks flushed as batched writes.
+    
+    Increments are summed in memory per url_id and written as
+    ``click_count = click_count + n``, so concurrent workers never overwrite
+    each other's counts. Raw click events are appended to an in-memory list and
+    bulk-inserted into ``clicks`` in the same transaction. While flushes fail,
+    at most ``max_events`` events are kept; the oldest beyond that are dropped
+    (the counters and rollups still include them).
+    """
+    
+    def __init__(self, app, flush_interval=5.0, max_pending=1000, max_events=100000):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_events = max_events
+        self._pending = {}  # url_id -> clicks not yet written
+        self._pending_total = 0
+        self._events = []  # click rows not yet inserted
+        self._last_click = {}  # url_id -> newest buffered click time
+        self._hourly = {}  # (url_id, hour start) -> clicks not yet rolled up
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.flushes = 0
+        self.flushed_clicks = 0
+        self.failed_flushes = 0
+        self.flushed_events = 0
+        self.dropped_events = 0
+        self.record_events = True
+        _aggregators.add(self)
+    
+    def record(self, url_id, count=1, event=None):
+        """Buffer count clicks (and optionally a click event row) for url_id.
+        
+        A full buffer wakes the background flusher, so the caller never waits on
+        the write; without a flusher thread the flush runs inline.
+        """
+        with self._lock:
+            self._pending[url_id] = self._pending.get(url_id, 0) + count
+            self._pending_total += count
+            clicked_at = event['clicked_at'] if event is not None else datetime.utcnow()
+            hour = (url_id, truncate(clicked_at, 'hour'))
+            self._hourly[hour] = self._hourly.get(hour, 0) + count
+            if event is not None and self.record_events:
+                self._events.append(event)
+                self._last_click[url_id] = clicked_at
+            full = self._pending_total >= self.max_pending
+        self._ensure_flusher()
+        if full:
+            if self._thread is not None and self._thread.is_alive():
+                self._wake.set()
+            else:
+                self.flush()
+    
+    def pending(self, url_id):
+        """Return clicks buffered for url_id that are not yet in the database."""
+        with self._lock:
+            return self._pending.get(url_id, 0)
+    
+    def pending_hourly(self, url_id):
+        """Return buffered clicks for url_id as {hour start: clicks}."""
+        with self._lock:
+            return {hour: clicks for (pending_id, hour), clicks in self._hourly.items()
+                    if pending_id == url_id}
+    
+    def last_click(self, url_id):
+        """Return the time of the newest buffered click for url_id, if any."""
+        with self._lock:
+            return self._last_click.get(url_id)
+    
+    def flush(self):
+        """Write buffered clicks in one transaction.
+        
+        Counters go out as one batched UPDATE, events as one bulk INSERT, and the
+        hourly/daily rollups as batched upserts.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                events, self._events = self._events, []
+                last_click, self._last_click = self._last_click, {}
+                hourly, self._hourly = self._hourly, {}
+                self._pending_total = 0
+            if not batch:
+                return 0
+            
+            table = URL.__table__
+            stmt = table.update().where(
+                table.c.id == bindparam('b_url_id')
+            ).values(
+                click_count=func.coalesce(table.c.click_count, 0) + bindparam('b_clicks'),
+                updated_at=table.c.updated_at  # a click is not an edit
+            )
+            rows = [{'b_url_id': url_id, 'b_clicks': clicks} for url_id, clicks in batch.items()]
+            
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as connection:
+                        connection.execute(stmt, rows)
+                        if events:
+                            connection.execute(Click.__table__.insert(), events)
+                        increment_rollups(connection, hourly)
+            except Exception:
+                # Put the clicks back so the next flush retries them
+                with self._lock:
+                    for url_id, clicks in batch.items():
+                        self._pending[url_id] = self._pending.get(url_id, 0) + clicks
+                        self._pending_total += clicks
+                    self._events[:0] = events
+                    overflow = len(self._events) - self.max_events
+                    if overflow > 0:
+                        # Bound memory while the database is down; the oldest rows go first
+                        del self._events[:overflow]
+                        self.dropped_events += overflow
+                    for url_id, clicked_at in last_click.items():
+                        self._last_click.setdefault(url_id, clicked_at)
+                    for key, clicks in hourly.items():
+                        self._hourly[key] = self._hourly.get(key, 0) + clicks
+                self.failed_flushes += 1
+                logger.exception('Failed to flush %d buffered click counters', len(batch))
+                return 0
+            
+            flushed = sum(batch.values())
+            self.flushes += 1
+            self.flushed_clicks += flushed
+            self.flushed_events += len(events)
+            return flushed
+    
+    def shutdown(self):
+        """Stop the background flusher and write any remaining clicks."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive() and \
+                self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval or None)
+        self.flush()
+    
+    def stats(self):
+        """Return buffer depth and flush counters."""
+        with self._lock:
+            return {
+                'pending_urls': len(self._pending),
+                'pending_clicks': self._pending_total,
+                'pending_events': len(self._events),
+                'max_pending': self.max_pending,
+                'flush_interval': self.flush_interval,
+                'flushes': self.flushes,
+                'flushed_clicks': self.flushed_clicks,
+                'flushed_events': self.flushed_events,
+                'failed_flushes': self.failed_flushes,
+                'max_events': self.max_events,
+                'dropped_events': self.dropped_events
+            }
+    
+    def _ensure_flusher(self):
+        # Threads do not survive fork, so start one lazily in each worker process
+        if not self.flush_interval or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run, name='click-flusher', daemon=True
+            )
+            self._thread.start()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self.flush()
+
+def flush_all_click_buffers():
+    """Drain every click buffer in this process (used on worker shutdown)."""
+    for aggregator in list(_aggregators):
+        aggregator.shutdown()
+
+atexit.register(flush_all_click_buffers)
+
+def init_click_aggregator(app):
+    """Attach the click aggregator to the application."""
+    if not app.config.get('CLICK_BUFFER_ENABLED', True):
+        return
+    aggregator = ClickAggregator(
+        app,
+        flush_interval=app.config.get('CLICK_FLUSH_INTERVAL', 5.0),
+        max_pending=app.config.get('CLICK_FLUSH_MAX_PENDING', 1000),
+        max_events=app.config.get('CLICK_BUFFER_MAX_EVENTS', 100000)
+    )
+    aggregator.record_events = app.config.get('CLICK_EVENTS_ENABLED', True)
+    app.extensions['click_aggregator'] = aggregator
+
+def get_click_aggregator():
+    """Get the click aggregator for the current application, if enabled."""
+    return current_app.extensions.get('click_aggregator')
+
+def record_click(url_id, short_code, referrer=None, user_agent=None):
+    """Count a click and log its event, buffered when the aggregator is enabled."""
+    event = {
+        'url_id': url_id,
+        'short_code': short_code,
+        'clicked_at': datetime.utcnow(),
+        'referrer': referrer[:REFERRER_MAX_LENGTH] if referrer else None,
+        'user_agent_hash': hash_user_agent(user_agent)
+    }
+    aggregator = get_click_aggregator()
+    if aggregator is not None:
+        aggregator.record(url_id, event=event)
+        return
+    URL.query.filter_by(id=url_id).update(
+        {URL.click_count: URL.click_count + 1}, synchronize_session=False
+    )
+    if current_app.config.get('CLICK_EVENTS_ENABLED', True):
+        db.session.add(Click(**event))
+    increment_rollups(db.session.connection(), {(url_id, truncate(event['clicked_at'], 'hour')): 1})
+    db.session.commit()
+
+def pending_clicks(url_id):
+    """Clicks recorded by this worker that have not been flushed yet."""
+    aggregator = get_click_aggregator()
+    return aggregator.pending(url_id) if aggregator is not None else 0
+
+def last_click_at(url_id):
+    """Time of the most recent click on url_id, including unflushed clicks."""
+    aggregator = get_click_aggregator()
+    buffered = aggregator.last_click(url_id) if aggregator is not None else None
+    if buffered is not None:
+        return buffered
+    return db.session.query(func.max(Click.clicked_at)).filter(Click.url_id == url_id).scalar()
+
+def pending_hourly_clicks(url_id):
+    """Unflushed clicks on url_id in this worker, as {hour start: clicks}."""
+    aggregator = get_click_aggregator()
+    return aggregator.pending_hourly(url_id) if aggregator is not None else {}
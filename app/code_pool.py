@@ -0,0 +1,264 @@
+import logging
+import os
+import random
+import socket
+import string
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import URL, ReservedShortCode
+
+logger = logging.getLogger(__name__)
+
+CODE_CHARACTERS = string.ascii_letters + string.digits
+
+# Lengths a caller may ask for: short enough for urls.short_code, long enough not to run out
+MIN_CODE_LENGTH = 4
+MAX_CODE_LENGTH = URL.__table__.c.short_code.type.length
+
+def _insert_ignoring_conflicts(connection, rows):
+    table = ReservedShortCode.__table__
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        connection.execute(insert(table).on_conflict_do_nothing(), rows)
+        return
+    # Portable fallback: insert row by row, skipping codes another worker took
+    for row in rows:
+        try:
+            with connection.begin_nested():
+                connection.execute(table.insert().values(**row))
+        except IntegrityError:
+            pass
+
+class ShortCodePool:
+    """Per-worker queues of pre-reserved random short codes, one per code length.
+    
+    A background thread keeps each queue between ``low_water`` and ``target``
+    codes. It draws random candidates, drops those already used by a URL or
+    reserved by another worker, and bulk-inserts the rest into
+    ``reserved_short_codes``; the primary key makes each reservation exclusive,
+    so only rows this worker inserted are queued. Taking a code is a deque pop.
+    Codes still queued when a worker exits are never handed out; each prune
+    renews this worker's reservations and deletes those not renewed within
+    ``reservation_timeout`` seconds, which only exited workers leave behind.
+    """
+    
+    def __init__(self, app, lengths=(6,), target=1000, low_water=None,
+                 batch_size=500, refill_interval=1.0, prune_interval=300.0,
+                 reservation_timeout=3600.0):
+        self.app = app
+        self.lengths = tuple(lengths)
+        self.target = target
+        self.low_water = target // 2 if low_water is None else low_water
+        self.batch_size = batch_size
+        self.refill_interval = refill_interval
+        self.prune_interval = prune_interval
+        self.reservation_timeout = reservation_timeout
+        self._queues = {length: deque() for length in self.lengths}
+        self._owner = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._refill_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_prune = time.monotonic()
+        self._random = random.SystemRandom()
+        self.reserved = 0
+        self.collisions = 0
+        self.refills = 0
+        self.pruned = 0
+        self.reclaimed = 0
+        self.exhaustions = 0
+        self.last_exhausted_at = None
+        self.last_refill_at = None
+        self.last_refill_rate = None
+    
+    def pop(self, length):
+        """Return a reserved code of the given length, or None if none is available.
+        
+        With a refill thread the caller never waits on the database; without one
+        an empty queue is refilled inline.
+        """
+        queue = self._queues.get(length)
+        if queue is None:
+            return None
+        threaded = self._ensure_refiller()
+        if not queue and not threaded:
+            self.refill(length)
+        try:
+            code = queue.popleft()
+        except IndexError:
+            if self.last_refill_at is not None:
+                # Not counted before the first refill of a freshly started worker
+                self.exhaustions += 1
+                self.last_exhausted_at = datetime.utcnow()
+                logger.warning('Short code pool for length %d is exhausted', length)
+            self._wake.set()
+            return None
+        if threaded and len(queue) < self.low_water:
+            self._wake.set()
+        return code
+    
+    def refill(self, length=None):
+        """Top up queues below the low-water mark, or the given length's queue, to target."""
+        self._ensure_refiller()
+        with self._refill_lock:
+            for code_length in (length,) if length is not None else self.lengths:
+                queue = self._queues[code_length]
+                if length is None and len(queue) >= self.low_water:
+                    continue
+                started = time.monotonic()
+                added = 0
+                while len(queue) < self.target:
+                    codes = self._reserve_batch(code_length, min(self.batch_size, self.target - len(queue)))
+                    if not codes:
+                        break
+                    queue.extend(codes)
+                    added += len(codes)
+                elapsed = time.monotonic() - started
+                self.refills += 1
+                self.last_refill_at = datetime.utcnow()
+                self.last_refill_rate = round(added / elapsed, 1) if elapsed else None
+    
+    def _reserve_batch(self, length, count):
+        candidates = {
+            ''.join(self._random.choice(CODE_CHARACTERS) for _ in range(length))
+            for _ in range(count)
+        }
+        table = ReservedShortCode.__table__
+        with self.app.app_context():
+            with db.engine.begin() as connection:
+                taken = set(connection.execute(
+                    select(URL.short_code).where(URL.short_code.in_(candidates))
+                ).scalars())
+                taken.update(connection.execute(
+                    select(table.c.short_code).where(table.c.short_code.in_(candidates))
+                ).scalars())
+                fresh = candidates - taken
+                self.collisions += len(taken)
+                if not fresh:
+                    return []
+                now = datetime.utcnow()
+                _insert_ignoring_conflicts(connection, [
+                    {'short_code': code, 'length': length, 'reserved_by': self._owner, 'reserved_at': now}
+                    for code in fresh
+                ])
+                # Codes a concurrent worker reserved first keep that worker as owner
+                mine = connection.execute(
+                    select(table.c.short_code).where(
+                        table.c.short_code.in_(fresh),
+                        table.c.reserved_by == self._owner
+                    )
+                ).scalars().all()
+        self.reserved += len(mine)
+        return mine
+    
+    def prune(self):
+        """Delete reservations used by a URL since, and those of workers that have exited."""
+        table = ReservedShortCode.__table__
+        now = datetime.utcnow()
+        with self.app.app_context():
+            with db.engine.begin() as connection:
+                used = connection.execute(table.delete().where(
+                    table.c.short_code.in_(select(URL.short_code))
+                ))
+                if self._owner is not None:
+                    connection.execute(table.update().where(
+                        table.c.reserved_by == self._owner
+                    ).values(reserved_at=now))
+                stale = connection.execute(table.delete().where(
+                    table.c.reserved_at < now - timedelta(seconds=self.reservation_timeout)
+                ))
+        self.pruned += used.rowcount or 0
+        self.reclaimed += stale.rowcount or 0
+        self._last_prune = time.monotonic()
+    
+    def stats(self):
+        """Return queue depths, refill rate and exhaustion counters."""
+        return {
+            'depth': {str(length): len(queue) for length, queue in self._queues.items()},
+            'target': self.target,
+            'low_water': self.low_water,
+            'refill_interval': self.refill_interval,
+            'refills': self.refills,
+            'last_refill_at': self.last_refill_at.isoformat() if self.last_refill_at else None,
+            'last_refill_rate': self.last_refill_rate,
+            'reserved': self.reserved,
+            'collisions': self.collisions,
+            'pruned': self.pruned,
+            'reclaimed': self.reclaimed,
+            'exhaustions': self.exhaustions,
+            'last_exhausted_at': self.last_exhausted_at.isoformat() if self.last_exhausted_at else None
+        }
+    
+    def _ensure_refiller(self):
+        """Reset state after fork and start the refill thread; return True if it runs."""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # Codes inherited across fork would be handed out by both processes
+                    for queue in self._queues.values():
+                        queue.clear()
+                    self._owner = f'{socket.gethostname()[:40]}:{os.getpid()}'
+                    self._pid = os.getpid()
+                    self.last_refill_at = None
+                    self._thread = None
+                    if self.refill_interval:
+                        self._stop = threading.Event()
+                        self._thread = threading.Thread(
+                            target=self._run, name='short-code-pool', daemon=True
+                        )
+                        self._thread.start()
+        return self._thread is not None and self._thread.is_alive()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refill()
+                if time.monotonic() - self._last_prune >= self.prune_interval:
+                    self.prune()
+            except Exception:
+                logger.exception('Failed to refill the short code pool')
+            self._wake.wait(self.refill_interval)
+            self._wake.clear()
+    
+    def shutdown(self):
+        """Stop the refill thread."""
+        self._stop.set()
+        self._wake.set()
+
+def init_short_code_pool(app):
+    """Attach the pre-generated short code pool to the application."""
+    if not app.config.get('SHORT_CODE_POOL_ENABLED', False):
+        return
+    lengths = [
+        int(length) for length in str(app.config.get('SHORT_CODE_POOL_LENGTHS', '6')).split(',')
+        if length.strip()
+    ]
+    for length in lengths:
+        if not MIN_CODE_LENGTH <= length <= MAX_CODE_LENGTH:
+            raise ValueError(
+                f'SHORT_CODE_POOL_LENGTHS: {length} is outside {MIN_CODE_LENGTH}-{MAX_CODE_LENGTH}, '
+                f'the lengths a short code can be requested at'
+            )
+    app.extensions['short_code_pool'] = ShortCodePool(
+        app,
+        lengths=lengths,
+        target=app.config.get('SHORT_CODE_POOL_SIZE', 1000),
+        low_water=app.config.get('SHORT_CODE_POOL_LOW_WATER'),
+        batch_size=app.config.get('SHORT_CODE_POOL_BATCH_SIZE', 500),
+        refill_interval=app.config.get('SHORT_CODE_POOL_REFILL_INTERVAL', 1.0),
+        reservation_timeout=app.config.get('SHORT_CODE_POOL_RESERVATION_TIMEOUT', 3600.0)
+    )
+
+def get_short_code_pool():
+    """Get the short code pool for the current application, if enabled."""
+    return current_app.extensions.get('short_code_pool')
@@ -0,0 +1,118 @@
+from collections import Counter
+from flask import current_app
+from sqlalchemy import event, inspect, select, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app import db
+from app.models import URL, URLCounter
+from app.cache import LRUCache
+
+COUNT_MODES = ('estimate', 'exact', 'none')
+
+def _counter_key(user_id, team_id):
+    return (user_id or 0, team_id or 0)
+
+def adjust_url_counters(connection, deltas):
+    """Add deltas, a mapping of (user_id, team_id) -> change, to the URL counters.
+    
+    Increments run in SQL, so concurrent workers never overwrite each other.
+    """
+    rows = [
+        {'user_id': user_id, 'team_id': team_id, 'active_urls': delta}
+        for (user_id, team_id), delta in sorted(deltas.items()) if delta
+    ]
+    if not rows:
+        return
+    counters = URLCounter.__table__
+    if connection.dialect.name in ('sqlite', 'postgresql'):
+        insert = (sqlite if connection.dialect.name == 'sqlite' else postgresql).insert(counters)
+        connection.execute(insert.on_conflict_do_update(
+            index_elements=['user_id', 'team_id'],
+            set_={'active_urls': counters.c.active_urls + insert.excluded.active_urls}
+        ), rows)
+        return
+    for row in rows:
+        updated = connection.execute(counters.update().where(
+            counters.c.user_id == row['user_id'], counters.c.team_id == row['team_id']
+        ).values(active_urls=counters.c.active_urls + row['active_urls']))
+        if not updated.rowcount:
+            connection.execute(counters.insert().values(**row))
+
+def _counted_state(obj, committed):
+    """(key, active) of a URL before (committed=True) or after this flush."""
+    state = inspect(obj)
+    values = []
+    for name in ('user_id', 'team_id', 'is_active'):
+        history = state.attrs[name].history
+        if committed and history.has_changes():
+            values.append(history.deleted[0] if history.deleted else None)
+        else:
+            values.append(getattr(obj, name))
+    user_id, team_id, is_active = values
+    # is_active defaults to True; only an explicit False means inactive
+    return _counter_key(user_id, team_id), is_active is not False
+
+@event.listens_for(Session, 'after_flush')
+def _count_flushed_urls(session, flush_context):
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, URL):
+            key, active = _counted_state(obj, committed=False)
+            deltas[key] += active
+    for obj in session.dirty:
+        if isinstance(obj, URL) and session.is_modified(obj, include_collections=False):
+            old_key, was_active = _counted_state(obj, committed=True)
+            new_key, is_active = _counted_state(obj, committed=False)
+            deltas[old_key] -= was_active
+            deltas[new_key] += is_active
+    for obj in session.deleted:
+        if isinstance(obj, URL):
+            key, active = _counted_state(obj, committed=True)
+            deltas[key] -= active
+    if any(deltas.values()):
+        adjust_url_counters(session.connection(), deltas)
+
+def url_count(user_id=None, team_id=None):
+    """Active URLs of a user, a team, or a user within a team, from the counters."""
+    query = select(func.coalesce(func.sum(URLCounter.active_urls), 0))
+    if user_id is not None:
+        query = query.where(URLCounter.user_id == user_id)
+    if team_id is not None:
+        query = query.where(URLCounter.team_id == team_id)
+    return db.session.execute(query).scalar()
+
+def init_listing_count_cache(app):
+    """Attach the short-lived cache of filtered listing counts."""
+    if not app.config.get('LISTING_COUNT_CACHE_ENABLED', True):
+        return
+    app.extensions['listing_count_cache'] = LRUCache(
+        max_entries=app.config.get('LISTING_COUNT_CACHE_MAX_ENTRIES', 10000),
+        ttl=app.config.get('LISTING_COUNT_CACHE_TTL', 30)
+    )
+
+def get_listing_count_cache():
+    """Get the listing count cache for the current application, if enabled."""
+    return current_app.extensions.get('listing_count_cache')
+
+def listing_total(query, mode, user_id, team_id=None, filters=()):
+    """Total for a URL listing under a count mode, or None for 'none'.
+    
+    Unfiltered listings read the maintained counters, which are exact. With
+    search or tag filters, 'exact' runs COUNT(*) and 'estimate' reuses a
+    count up to LISTING_COUNT_CACHE_TTL seconds old.
+    """
+    if mode == 'none':
+        return None
+    if not any(filters):
+        return url_count(user_id=user_id, team_id=team_id)
+    
+    cache = get_listing_count_cache()
+    key = (user_id, team_id) + tuple(filters)
+    if mode == 'estimate' and cache is not None:
+        total = cache.get(key)
+        if total is not None:
+            return total
+    total = query.order_by(None).count()
+    if cache is not None:
+        cache.set(key, total)
+    return total
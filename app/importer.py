@@ -0,0 +1,236 @@
+import csv
+import json
+import os
+import re
+import time
+from datetime import datetime
+from marshmallow import ValidationError, validate
+from sqlalchemy import select
+from app import db
+from app.models import URL, ReservedShortCode, ImportCheckpoint
+from app.counters import adjust_url_counters
+from app.rollups import parse_timestamp
+from app.url_hash import long_url_hash
+from app.utils import generate_unique_short_codes
+
+SHORT_CODE_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,10}$')
+FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.json': 'ndjson'}
+
+_validate_url = validate.URL()
+
+def detect_format(path):
+    """Guess the file format from its extension."""
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f'Cannot tell the format of {path}; pass --format csv or ndjson')
+    return fmt
+
+def read_records(path, fmt, offset=0):
+    """Yield (end offset, record) pairs from a CSV or NDJSON file.
+    
+    The file is read one record at a time, starting at a byte offset from a
+    previous run. ``record`` is a dict, or None for a line that is not valid
+    JSON. The end offset is where reading would resume after this record.
+    """
+    with open(path, 'rb') as f:
+        if fmt == 'csv':
+            header = next(csv.reader([f.readline().decode('utf-8-sig')]), [])
+            if offset:
+                f.seek(offset)
+            lines = (line.decode('utf-8') for line in iter(f.readline, b''))
+            for values in csv.reader(lines):
+                if any(value.strip() for value in values):
+                    yield f.tell(), dict(zip(header, values))
+            return
+        
+        f.seek(offset)
+        for line in iter(f.readline, b''):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield f.tell(), record if isinstance(record, dict) else None
+
+def validate_record(record):
+    """Return (row, None) for a valid record or (None, errors)."""
+    if record is None:
+        return None, {'_schema': ['Not a JSON object']}
+    errors = {}
+    row = {}
+    
+    long_url = (record.get('long_url') or '').strip()
+    try:
+        _validate_url(long_url)
+        row['long_url'] = long_url
+    except ValidationError:
+        errors['long_url'] = ['Not a valid URL.']
+    
+    short_code = (record.get('short_code') or '').strip() or None
+    if short_code is not None and not SHORT_CODE_PATTERN.match(short_code):
+        errors['short_code'] = ['Must be 1-10 letters, digits, "-" or "_".']
+    row['short_code'] = short_code
+    
+    created_at = record.get('created_at')
+    try:
+        row['created_at'] = parse_timestamp(str(created_at)) if created_at else None
+    except ValueError:
+        errors['created_at'] = ['Not a valid ISO 8601 datetime.']
+    
+    click_count = record.get('click_count')
+    try:
+        row['click_count'] = int(click_count) if click_count not in (None, '') else 0
+        if row['click_count'] < 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        errors['click_count'] = ['Must be a non-negative integer.']
+    
+    return (None, errors) if errors else (row, None)
+
+def _import_chunk(chunk, user_id, team_id):
+    """Validate and insert one chunk of (row number, record); return the rejected rows."""
+    rows = []
+    rejected = []
+    for number, record in chunk:
+        row, errors = validate_record(record)
+        if errors:
+            rejected.append({'row': number, 'record': record, 'errors': errors})
+        else:
+            rows.append((number, record, row))
+    
+    # Provided codes must be new: in the database, among codes reserved by the
+    # code pool (which would otherwise be handed out again) and within the chunk
+    provided = [row['short_code'] for _, _, row in rows if row['short_code']]
+    taken = set()
+    if provided:
+        taken.update(db.session.execute(
+            select(URL.short_code).where(URL.short_code.in_(provided))
+        ).scalars())
+        taken.update(db.session.execute(
+            select(ReservedShortCode.short_code).where(ReservedShortCode.short_code.in_(provided))
+        ).scalars())
+    seen = set()
+    accepted = []
+    for number, record, row in rows:
+        code = row['short_code']
+        if code is not None:
+            if code in taken or code in seen:
+                rejected.append({'row': number, 'record': record, 'errors': {'short_code': ['Short code already exists']}})
+                continue
+            seen.add(code)
+        accepted.append(row)
+    
+    missing = [row for row in accepted if row['short_code'] is None]
+    codes = [code for code in generate_unique_short_codes(len(missing)) if code not in seen]
+    while len(codes) < len(missing):
+        codes.extend(code for code in generate_unique_short_codes(len(missing) - len(codes)) if code not in seen)
+    for row, code in zip(missing, codes):
+        row['short_code'] = code
+    
+    now = datetime.utcnow()
+    if accepted:
+        db.session.execute(URL.__table__.insert(), [{
+            'long_url': row['long_url'],
+            'url_hash': long_url_hash(row['long_url']),
+            'short_code': row['short_code'],
+            'click_count': row['click_count'],
+            'created_at': row['created_at'] or now,
+            'updated_at': row['created_at'] or now,
+            'user_id': user_id,
+            'team_id': team_id,
+            'is_active': True
+        } for row in accepted])
+        # Core inserts skip the flush hook that maintains the counters
+        adjust_url_counters(db.session.connection(), {(user_id or 0, team_id or 0): len(accepted)})
+    return len(accepted), rejected
+
+def import_links(path, fmt=None, chunk_size=1000, name=None, restart=False,
+                 user_id=None, team_id=None, rejects_path=None, progress=None):
+    """Stream links from a CSV or NDJSON file into the urls table.
+    
+    Rows are validated and inserted one chunk at a time, and each chunk is
+    committed together with the import checkpoint. If the import stops, running
+    it again resumes after the last committed chunk. Memory use depends on
+    chunk_size only, not on the file size. Must be called inside an
+    application context.
+    """
+    fmt = fmt or detect_format(path)
+    source = os.path.abspath(path)
+    name = name or source[-255:]
+    
+    checkpoint = db.session.get(ImportCheckpoint, name)
+    if checkpoint is not None and restart:
+        db.session.delete(checkpoint)
+        db.session.commit()
+        checkpoint = None
+    if checkpoint is None:
+        checkpoint = ImportCheckpoint(name=name, source=source, offset=0, rows_read=0,
+                                      imported=0, rejected=0, completed=False)
+        db.session.add(checkpoint)
+        db.session.commit()
+    elif checkpoint.completed:
+        raise ValueError(f'{path} was already imported; pass --restart to import it again')
+    
+    resumed_from = checkpoint.rows_read
+    started = time.monotonic()
+    rejects = open(rejects_path, 'a', encoding='utf-8') if rejects_path else None
+    
+    def report():
+        elapsed = time.monotonic() - started
+        read = checkpoint.rows_read - resumed_from
+        return {
+            'rows_read': checkpoint.rows_read,
+            'imported': checkpoint.imported,
+            'rejected': checkpoint.rejected,
+            'resumed_from': resumed_from,
+            'seconds': round(elapsed, 2),
+            'rows_per_second': round(read / elapsed, 1) if elapsed else None
+        }
+    
+    records = read_records(path, fmt, checkpoint.offset)
+    try:
+        chunk = []
+        end_offset = checkpoint.offset
+        number = checkpoint.rows_read
+        while True:
+            item = next(records, None)
+            if item is not None:
+                end_offset, record = item
+                number += 1
+                chunk.append((number, record))
+                if len(chunk) < chunk_size:
+                    continue
+            if not chunk:
+                break
+            
+            try:
+                imported, rejected = _import_chunk(chunk, user_id, team_id)
+                checkpoint.offset = end_offset
+                checkpoint.rows_read = number
+                checkpoint.imported += imported
+                checkpoint.rejected += len(rejected)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                raise RuntimeError(
+                    f'Import stopped in rows {chunk[0][0]}-{chunk[-1][0]}; '
+                    f'run the command again to resume from row {chunk[0][0]}: {e}'
+                ) from e
+            
+            if rejects is not None:
+                for reject in rejected:
+                    rejects.write(json.dumps(reject, default=str) + '\n')
+            if progress is not None:
+                stats = report()
+                progress(f"{stats['rows_read']} rows read, {stats['imported']} imported, "
+                         f"{stats['rejected']} rejected ({stats['rows_per_second']} rows/s)")
+            chunk = []
+        
+        checkpoint.completed = True
+        db.session.commit()
+        return report()
+    finally:
+        records.close()
+        if rejects is not None:
+            rejects.close()
@@ -1,9 +1,10 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Boolean, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship, validates
+from sqlalchemy.sql import func, text
 from app import db
+from app.url_hash import long_url_hash
 
 class User(db.Model):
     """User model for authentication and team management."""
@@ -15,6 +16,8 @@ class User(db.Model):
     password_hash = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
+    token_version = Column(Integer, nullable=False, default=1)  # bumped when JWT claims go stale
+    tokens_revoked_at = Column(DateTime, nullable=True)  # when token_version last changed
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
@@ -77,6 +80,7 @@ class TeamMember(db.Model):
     # Constraints
     __table_args__ = (
         UniqueConstraint('user_id', 'team_id', name='unique_user_team'),
+        Index('ix_team_members_team', 'team_id'),  # members of a team
     )
     
     def to_dict(self):
@@ -97,6 +101,7 @@ class URL(db.Model):
     
     id = Column(Integer, primary_key=True)
     long_url = Column(Text, nullable=False)
+    url_hash = Column(String(64), nullable=True)  # SHA-256 of the normalized long_url, for dedup
     short_code = Column(String(10), unique=True, nullable=False)
     click_count = Column(Integer, default=0)
     created_at = Column(DateTime, default=func.now())
@@ -115,6 +120,25 @@ class URL(db.Model):
     user = relationship('User', back_populates='urls')
     team = relationship('Team', back_populates='urls')
     
+    # Indexes
+    __table_args__ = (
+        Index('ix_urls_hash_user_team', 'url_hash', 'user_id', 'team_id'),
+        # Listings by owner, newest first (keyset pagination); partial on PostgreSQL
+        Index('ix_urls_user_active_created', 'user_id', 'is_active', 'created_at', 'id',
+              postgresql_where=text('is_active')),
+        # Team analytics: URL count, click total and rank within a team
+        Index('ix_urls_team_active_clicks', 'team_id', 'is_active', 'click_count',
+              postgresql_where=text('is_active')),
+        # Shared redirect table re-sync of recently changed rows
+        Index('ix_urls_updated_at', 'updated_at'),
+    )
+    
+    @validates('long_url')
+    def _set_url_hash(self, key, long_url):
+        """Keep url_hash in step with long_url."""
+        self.url_hash = long_url_hash(long_url) if long_url else None
+        return long_url
+    
     def to_dict(self):
         """Convert URL to dictionary."""
         return {
@@ -144,3 +168,166 @@ class URL(db.Model):
         self.click_count += 1
         self.updated_at = datetime.utcnow()
         db.session.commit()
+
+class Tag(db.Model):
+    """Normalized tag name shared by all URLs carrying it."""
+    __tablename__ = 'tags'
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50), unique=True, nullable=False)  # lower-cased, trimmed
+
+class URLTag(db.Model):
+    """Tag on a URL, kept in step with URL.tags on every flush."""
+    __tablename__ = 'url_tags'
+    
+    url_id = Column(Integer, ForeignKey('urls.id'), primary_key=True)
+    tag_id = Column(Integer, ForeignKey('tags.id'), primary_key=True)
+    
+    # Indexes
+    __table_args__ = (
+        Index('ix_url_tags_tag_url', 'tag_id', 'url_id'),
+    )
+
+class URLCounter(db.Model):
+    """Number of active URLs per (user, team), kept in step on every flush.
+    
+    0 stands for "no user" / "no team", so each URL counts in exactly one row.
+    """
+    __tablename__ = 'url_counters'
+    
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    team_id = Column(Integer, primary_key=True, autoincrement=False)
+    active_urls = Column(Integer, nullable=False, default=0)
+    
+    # Indexes
+    __table_args__ = (
+        Index('ix_url_counters_team', 'team_id'),
+    )
+
+class Click(db.Model):
+    """Raw click event recorded on each redirect."""
+    __tablename__ = 'clicks'
+    
+    id = Column(Integer, primary_key=True)
+    url_id = Column(Integer, ForeignKey('urls.id'), nullable=False)
+    short_code = Column(String(10), nullable=False)
+    clicked_at = Column(DateTime, nullable=False, default=func.now())
+    referrer = Column(String(500))
+    user_agent_hash = Column(String(64))  # SHA-256 of the User-Agent header
+    
+    # Constraints
+    __table_args__ = (
+        Index('ix_clicks_url_id_clicked_at', 'url_id', 'clicked_at'),
+    )
+    
+    def to_dict(self):
+        """Convert click to dictionary."""
+        return {
+            'id': self.id,
+            'url_id': self.url_id,
+            'short_code': self.short_code,
+            'clicked_at': self.clicked_at.isoformat() if self.clicked_at else None,
+            'referrer': self.referrer,
+            'user_agent_hash': self.user_agent_hash
+        }
+
+class ClickRollupHourly(db.Model):
+    """Clicks per URL per hour, maintained incrementally as clicks are flushed."""
+    __tablename__ = 'click_rollups_hourly'
+    
+    id = Column(Integer, primary_key=True)
+    url_id = Column(Integer, ForeignKey('urls.id'), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)  # start of the hour (UTC)
+    clicks = Column(Integer, nullable=False, default=0)
+    
+    # Constraints
+    __table_args__ = (
+        UniqueConstraint('url_id', 'bucket_start', name='unique_url_hour'),
+    )
+
+class ClickRollupDaily(db.Model):
+    """Clicks per URL per day, maintained incrementally as clicks are flushed."""
+    __tablename__ = 'click_rollups_daily'
+    
+    id = Column(Integer, primary_key=True)
+    url_id = Column(Integer, ForeignKey('urls.id'), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)  # midnight (UTC)
+    clicks = Column(Integer, nullable=False, default=0)
+    
+    # Constraints
+    __table_args__ = (
+        UniqueConstraint('url_id', 'bucket_start', name='unique_url_day'),
+    )
+
+class IdAllocator(db.Model):
+    """Named counter from which workers lease blocks of ids (hi/lo allocation)."""
+    __tablename__ = 'id_allocators'
+    
+    name = Column(String(50), primary_key=True)
+    next_value = Column(BigInteger, nullable=False, default=1)  # first id of the next unleased block
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+class ReservedShortCode(db.Model):
+    """Random short code reserved by a worker's code pool before it is used."""
+    __tablename__ = 'reserved_short_codes'
+    
+    short_code = Column(String(20), primary_key=True)
+    length = Column(Integer, nullable=False)
+    reserved_by = Column(String(64), nullable=False)  # host:pid of the reserving worker
+    reserved_at = Column(DateTime, default=func.now())
+
+class ImportCheckpoint(db.Model):
+    """Progress of a bulk link import, committed together with each imported chunk."""
+    __tablename__ = 'import_checkpoints'
+    
+    name = Column(String(255), primary_key=True)  # absolute source path unless named explicitly
+    source = Column(Text, nullable=False)
+    offset = Column(BigInteger, nullable=False, default=0)  # byte offset after the last committed row
+    rows_read = Column(Integer, nullable=False, default=0)
+    imported = Column(Integer, nullable=False, default=0)
+    rejected = Column(Integer, nullable=False, default=0)
+    completed = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+class ApiKey(db.Model):
+    """Long-lived API key for machine clients, stored as a keyed digest only."""
+    __tablename__ = 'api_keys'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    team_id = Column(Integer, ForeignKey('teams.id'), nullable=True)
+    name = Column(String(100), nullable=False)
+    prefix = Column(String(16), nullable=False)  # first characters of the key, to tell keys apart
+    key_digest = Column(String(64), unique=True, nullable=False)  # HMAC-SHA256 of the full key
+    scopes = Column(String(255), nullable=False, default='')  # comma-separated
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=func.now())
+    last_used_at = Column(DateTime, nullable=True)  # written in batches, may lag a little
+    
+    # Relationships
+    user = relationship('User')
+    team = relationship('Team')
+    
+    @property
+    def scope_list(self):
+        """Scopes as a list."""
+        return [scope for scope in (self.scopes or '').split(',') if scope]
+    
+    def has_scope(self, scope):
+        """Check if the key grants a scope."""
+        return scope in self.scope_list
+    
+    def to_dict(self):
+        """Convert API key to dictionary (never includes the key itself)."""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'prefix': self.prefix,
+            'user_id': self.user_id,
+            'team_id': self.team_id,
+            'scopes': self.scope_list,
+            'is_active': self.is_active,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_used_at': self.last_used_at.isoformat() if self.last_used_at else None
+        }
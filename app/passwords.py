@@ -0,0 +1,122 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+from flask import current_app, has_app_context
+
+DEFAULT_ROUNDS = 12
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _checkpw(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+def hash_rounds(hashed):
+    """Return the cost factor of a bcrypt hash such as ``$2b$12$...``, or None."""
+    parts = hashed.split('$')
+    try:
+        return int(parts[2])
+    except (IndexError, ValueError):
+        return None
+
+class PasswordHasher:
+    """Runs bcrypt at a configured cost, on a bounded process pool when pool_size > 0.
+    
+    bcrypt is CPU-bound, so running it in request threads stalls every other
+    request on the worker during a login storm. The pool is started lazily in
+    each process (never inherited across fork) with the spawn start method, as
+    the parent has background threads. At most ``max_pending`` jobs are queued
+    at once; further callers wait for a free slot instead of growing the queue.
+    """
+    
+    def __init__(self, rounds=DEFAULT_ROUNDS, pool_size=0, max_pending=None):
+        self.rounds = rounds
+        self.pool_size = max(int(pool_size), 0)
+        self.max_pending = max_pending or self.pool_size * 4 or 1
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.hashed = 0
+        self.verified = 0
+        self.rehashed = 0
+        self.seconds = 0.0
+    
+    def _run(self, fn, *args):
+        started = time.monotonic()
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                return fn(*args)
+            with self._slots:
+                return executor.submit(fn, *args).result()
+        finally:
+            self.seconds += time.monotonic() - started
+    
+    def _get_executor(self):
+        if not self.pool_size:
+            return None
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.pool_size,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+    
+    def hash(self, password):
+        """Hash a password at the configured cost."""
+        self.hashed += 1
+        return self._run(_hashpw, password.encode('utf-8'), self.rounds)
+    
+    def verify(self, password, hashed):
+        """Verify a password against its hash."""
+        self.verified += 1
+        return self._run(_checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+    
+    def needs_rehash(self, hashed):
+        """Return True if the hash uses a lower cost than the configured one."""
+        rounds = hash_rounds(hashed)
+        return rounds is not None and rounds < self.rounds
+    
+    def shutdown(self):
+        """Stop the pool's worker processes."""
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown()
+            self._executor = None
+            self._pid = None
+    
+    def stats(self):
+        """Return the configuration and usage counters for this process."""
+        operations = self.hashed + self.verified
+        return {
+            'rounds': self.rounds,
+            'pool_size': self.pool_size,
+            'max_pending': self.max_pending,
+            'pool_started': self._executor is not None and self._pid == os.getpid(),
+            'hashed': self.hashed,
+            'verified': self.verified,
+            'rehashed': self.rehashed,
+            'avg_ms': round(self.seconds / operations * 1000, 2) if operations else None
+        }
+
+def init_password_hasher(app):
+    """Attach the password hasher to the application."""
+    app.extensions['password_hasher'] = PasswordHasher(
+        rounds=app.config.get('BCRYPT_LOG_ROUNDS', DEFAULT_ROUNDS),
+        pool_size=app.config.get('BCRYPT_POOL_SIZE', 0),
+        max_pending=app.config.get('BCRYPT_POOL_MAX_PENDING')
+    )
+
+def get_password_hasher():
+    """Get the password hasher for the current application, or an inline default."""
+    hasher = current_app.extensions.get('password_hasher') if has_app_context() else None
+    return hasher if hasher is not None else _default_hasher
+
+_default_hasher = PasswordHasher()
@@ -0,0 +1,286 @@
+import fcntl
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+from flask import current_app, request, jsonify
+from app.auth import get_current_identity, get_current_api_key
+
+MAGIC = b'USRL'
+LAYOUT_VERSION = 1
+
+# magic, layout version, slot count
+HEADER = struct.Struct('<4sII')
+HEADER_SIZE = 64
+
+# key tag (0 = empty), tokens, last update (epoch seconds)
+SLOT = struct.Struct('<Qdd')
+WAYS = 4  # slots a key may occupy; the stalest one is reused when all are taken
+SET_SIZE = SLOT.size * WAYS
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Flask endpoints and the rule that limits them
+ENDPOINT_RULES = {
+    'api_v1.redirect_to_url': 'redirect',
+    'api_v1.resolve_url': 'redirect',
+    'api_v1.shorten_url': 'shorten',
+    'api_v1.shorten_urls_batch': 'shorten_batch',
+    'api_v1.login': 'login'
+}
+
+RESULT_KEY = 'url_shortener.rate_limit'
+
+class Rate(namedtuple('Rate', ['limit', 'period'])):
+    """A limit of ``limit`` requests per ``period`` seconds, e.g. ``Rate.parse('100/minute')``."""
+    __slots__ = ()
+    
+    @classmethod
+    def parse(cls, text):
+        count, _, unit = text.strip().partition('/')
+        unit = unit.strip().lower().rstrip('s')
+        if unit not in PERIODS:
+            raise ValueError(f'Invalid rate {text!r}; use e.g. 100/minute')
+        return cls(int(count), PERIODS[unit])
+    
+    @property
+    def per_second(self):
+        return self.limit / self.period
+
+class RateLimitResult(namedtuple('RateLimitResult', ['allowed', 'limit', 'remaining', 'reset', 'retry_after'])):
+    """Outcome of one bucket check; reset and retry_after are in whole seconds."""
+    __slots__ = ()
+    
+    def headers(self):
+        """Standard RateLimit-* response headers (plus Retry-After when denied)."""
+        headers = [
+            ('RateLimit-Limit', str(self.limit)),
+            ('RateLimit-Remaining', str(self.remaining)),
+            ('RateLimit-Reset', str(self.reset))
+        ]
+        if not self.allowed:
+            headers.append(('Retry-After', str(self.retry_after)))
+        return headers
+    
+    def body(self):
+        """JSON body of a 429 response."""
+        return json.dumps({
+            'error': 'Too Many Requests',
+            'message': f'Rate limit exceeded; retry in {self.retry_after} seconds'
+        }).encode('utf-8')
+
+def _tag(key):
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+class TokenBucketTable:
+    """Token buckets in a memory-mapped file shared by every worker on the node.
+    
+    Keys hash to a set of WAYS slots. Updating a bucket takes a POSIX record
+    lock on just that set (plus a thread lock, as record locks are per
+    process), so workers only contend when they hit the same keys. When all
+    slots of a set are taken, the least recently updated bucket is dropped,
+    which can only make a limit more lenient, never stricter.
+    """
+    
+    def __init__(self, path, num_slots=65536):
+        self.path = path
+        self.num_sets = max(int(num_slots) // WAYS, 1)
+        self._size = HEADER_SIZE + self.num_sets * SET_SIZE
+        self._pid = None
+        self._fd = None
+        self._mm = None
+        self._lock = threading.Lock()
+        self._open()
+    
+    def _open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(fd, HEADER.size, 0)
+            valid = len(header) == HEADER.size and HEADER.unpack(header) == (MAGIC, LAYOUT_VERSION, self.num_sets)
+            if not valid or os.fstat(fd).st_size != self._size:
+                # New file, or one laid out for another size: start with empty buckets
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, self._size)
+                os.pwrite(fd, HEADER.pack(MAGIC, LAYOUT_VERSION, self.num_sets), 0)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._mm = mmap.mmap(fd, self._size, access=mmap.ACCESS_WRITE)
+        self._pid = os.getpid()
+    
+    def consume(self, key, rate, cost=1, now=None):
+        """Take cost tokens from the bucket for key; return a RateLimitResult."""
+        if self._pid != os.getpid():
+            # A thread lock held at fork time would never be released in the child
+            self._lock = threading.Lock()
+            self._pid = os.getpid()
+        now = time.time() if now is None else now
+        tag = _tag(key)
+        offset = HEADER_SIZE + (tag % self.num_sets) * SET_SIZE
+        capacity = float(rate.limit)
+        refill = rate.per_second
+        mm = self._mm
+        
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, SET_SIZE, offset)
+            try:
+                slot = None
+                stalest = None
+                for way in range(WAYS):
+                    position = offset + way * SLOT.size
+                    slot_tag, tokens, updated = SLOT.unpack_from(mm, position)
+                    if slot_tag == tag:
+                        slot = position
+                        break
+                    # Empty slots read as updated at 0, so they are taken first
+                    if stalest is None or updated < stalest[1]:
+                        stalest = (position, updated)
+                if slot is None:
+                    slot, tokens, updated = stalest[0], capacity, now
+                
+                tokens = min(capacity, tokens + max(now - updated, 0.0) * refill)
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                SLOT.pack_into(mm, slot, tag, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, SET_SIZE, offset)
+        
+        return RateLimitResult(
+            allowed,
+            rate.limit,
+            int(tokens),
+            int(math.ceil((capacity - tokens) / refill)) if refill else 0,
+            0 if allowed else int(math.ceil((cost - tokens) / refill)) if refill else rate.period
+        )
+    
+    def close(self):
+        """Unmap the table."""
+        if self._mm is not None:
+            self._mm.close()
+            os.close(self._fd)
+            self._mm = None
+
+class RateLimiter:
+    """Checks requests against named rules backed by a shared TokenBucketTable."""
+    
+    def __init__(self, table, rules):
+        self.table = table
+        self.rules = rules
+        self.checks = 0
+        self.denied = 0
+    
+    def check(self, rule, kind, ident, cost=1):
+        """Consume from the bucket of (rule, kind, ident); None if the rule is not limited.
+        
+        A cost above the bucket size is charged as a full bucket, so the request
+        waits for a full refill instead of being denied forever.
+        """
+        rate = self.rules.get(rule)
+        if rate is None:
+            return None
+        result = self.table.consume(f'{rule}:{kind}:{ident}', rate, min(cost, rate.limit))
+        self.checks += 1
+        if not result.allowed:
+            self.denied += 1
+        return result
+    
+    def check_all(self, buckets, cost=1):
+        """Check several (rule, kind, ident) buckets; return the denying or tightest result."""
+        tightest = None
+        for rule, kind, ident in buckets:
+            result = self.check(rule, kind, ident, cost)
+            if result is None:
+                continue
+            if not result.allowed:
+                return result
+            if tightest is None or result.remaining < tightest.remaining:
+                tightest = result
+        return tightest
+    
+    def stats(self):
+        """Return the configured rules and counters for this process."""
+        return {
+            'rules': {name: f'{rate.limit}/{rate.period}s' for name, rate in self.rules.items()},
+            'slots': self.table.num_sets * WAYS,
+            'checks': self.checks,
+            'denied': self.denied
+        }
+
+def _request_buckets(rule):
+    """The (rule, kind, ident) buckets a Flask request is counted against."""
+    ip = request.remote_addr or ''
+    if rule == 'login':
+        buckets = [('login_ip', 'ip', ip)]
+        payload = request.get_json(silent=True)
+        username = payload.get('username') if isinstance(payload, dict) else None
+        if isinstance(username, str) and username:
+            # Keyed on the address too, so guesses from elsewhere cannot lock the owner out
+            buckets.append(('login', 'ip_username', f'{ip}:{username.lower()}'))
+        return buckets
+    if rule in ('shorten', 'shorten_batch'):
+        api_key = get_current_api_key()
+        if api_key is not None:
+            return [(rule, 'key', api_key.id)]
+        identity = get_current_identity()
+        if identity is not None:
+            return [(rule, 'user', identity.user_id)]
+    return [(rule, 'ip', ip)]
+
+def _request_cost(rule):
+    """Tokens a Flask request takes: one per URL for batch shortening, else one."""
+    if rule != 'shorten_batch':
+        return 1
+    payload = request.get_json(silent=True)
+    items = payload.get('items') if isinstance(payload, dict) else payload
+    return max(len(items), 1) if isinstance(items, list) else 1
+
+def init_rate_limiter(app):
+    """Attach the shared rate limiter and enforce it on the limited endpoints."""
+    if not app.config.get('RATE_LIMIT_ENABLED', True):
+        return
+    rules = {}
+    for name in ('redirect', 'shorten', 'shorten_batch', 'login', 'login_ip'):
+        value = app.config.get(f'RATE_LIMIT_{name.upper()}')
+        if value:
+            rules[name] = Rate.parse(value)
+    limiter = RateLimiter(
+        TokenBucketTable(app.config['RATE_LIMIT_STORAGE_PATH'], app.config.get('RATE_LIMIT_SLOTS', 65536)),
+        rules
+    )
+    app.extensions['rate_limiter'] = limiter
+    
+    @app.before_request
+    def enforce_rate_limit():
+        rule = ENDPOINT_RULES.get(request.endpoint)
+        if rule is None:
+            return None
+        result = limiter.check_all(_request_buckets(rule), _request_cost(rule))
+        if result is None:
+            return None
+        request.environ[RESULT_KEY] = result
+        if not result.allowed:
+            return jsonify({
+                'error': 'Too Many Requests',
+                'message': f'Rate limit exceeded; retry in {result.retry_after} seconds'
+            }), 429
+        return None
+    
+    @app.after_request
+    def add_rate_limit_headers(response):
+        result = request.environ.get(RESULT_KEY)
+        if result is not None:
+            for name, value in result.headers():
+                response.headers[name] = value
+        return response
+
+def get_rate_limiter():
+    """Get the rate limiter for the current application, if enabled."""
+    return current_app.extensions.get('rate_limiter')
@@ -0,0 +1,140 @@
+import json
+import re
+from werkzeug.urls import iri_to_uri
+from app.models import URL
+from app.cache import RedirectEntry, get_redirect_cache, get_redirect_cache_sync
+from app.bloom import get_short_code_filter
+from app.clicks import record_click
+from app.shared_table import get_shared_redirect_table
+
+SHORT_CODE_PATH = re.compile(r'^/([A-Za-z0-9_-]{1,10})$')
+
+# Set by a server in front of the fast path that already charged the redirect limit
+RATE_LIMITED_KEY = 'url_shortener.redirect_rate_limited'
+
+GONE_BODY = json.dumps({
+    'error': 'Gone',
+    'message': 'This URL has expired'
+}).encode('utf-8')
+
+def lookup_cached_redirect(short_code):
+    """Resolve a short code from in-memory structures only, without touching the database.
+    
+    Checks the shared cross-worker table and then the redirect cache. Returns
+    None on a miss. Must be called inside an application context.
+    """
+    shared = get_shared_redirect_table()
+    if shared is not None:
+        entry = shared.get(short_code)
+        if entry is not None:
+            return entry
+    
+    cache = get_redirect_cache()
+    return cache.get(short_code) if cache is not None else None
+
+def lookup_redirect(short_code):
+    """Resolve a short code to a RedirectEntry, or None if it does not exist.
+    
+    Tries the in-memory lookups first, then the short code filter, and only then
+    the database. Cache entries of URLs changed by other workers are dropped
+    first if a poll is due. Must be called inside an application context.
+    """
+    sync = get_redirect_cache_sync()
+    if sync is not None:
+        sync.check()
+    entry = lookup_cached_redirect(short_code)
+    if entry is not None:
+        return entry
+    
+    code_filter = get_short_code_filter()
+    if code_filter is not None and not code_filter.might_contain(short_code):
+        return None
+    
+    url = URL.query.filter_by(short_code=short_code, is_active=True).first()
+    if not url:
+        if code_filter is not None:
+            code_filter.record_false_positive()
+        return None
+    
+    entry = RedirectEntry(url.id, url.long_url, url.expires_at, url.is_active)
+    cache = get_redirect_cache()
+    if cache is not None:
+        cache.set(short_code, entry)
+    return entry
+
+class RedirectFastPath:
+    """WSGI middleware that serves root-level ``/<code>`` redirects ahead of Flask.
+    
+    Only an application context is pushed (for the database session and the
+    per-app caches); routing, request objects, CORS and error handlers are
+    skipped. Anything that is not a known short code falls through to Flask.
+    """
+    
+    def __init__(self, wsgi_app, app):
+        self.wsgi_app = wsgi_app
+        self.app = app
+        self._reserved = None
+    
+    def _reserved_paths(self):
+        # Root-level routes registered on the app, e.g. /health
+        if self._reserved is None:
+            self._reserved = {
+                rule.rule for rule in self.app.url_map.iter_rules()
+                if not rule.arguments
+            }
+        return self._reserved
+    
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') not in ('GET', 'HEAD'):
+            return self.wsgi_app(environ, start_response)
+        path = environ.get('PATH_INFO', '')
+        match = SHORT_CODE_PATH.match(path)
+        if match is None or path in self._reserved_paths():
+            return self.wsgi_app(environ, start_response)
+        
+        limiter = self.app.extensions.get('rate_limiter')
+        limit = None
+        if limiter is not None and not environ.get(RATE_LIMITED_KEY):
+            # Checked before the lookup, so floods of unknown codes never reach the database
+            limit = limiter.check('redirect', 'ip', environ.get('REMOTE_ADDR', ''))
+        limit_headers = limit.headers() if limit is not None else []
+        if limit is not None and not limit.allowed:
+            body = limit.body()
+            start_response('429 TOO MANY REQUESTS', [
+                ('Content-Type', 'application/json'),
+                ('Content-Length', str(len(body)))
+            ] + limit_headers)
+            return [body]
+        
+        with self.app.app_context():
+            entry = lookup_redirect(match.group(1))
+            if entry is not None and not entry.is_expired():
+                record_click(
+                    entry.url_id,
+                    match.group(1),
+                    referrer=environ.get('HTTP_REFERER'),
+                    user_agent=environ.get('HTTP_USER_AGENT')
+                )
+        
+        if entry is None:
+            # Let Flask produce its regular 404 response
+            return self.wsgi_app(environ, start_response)
+        
+        if entry.is_expired():
+            start_response('410 GONE', [
+                ('Content-Type', 'application/json'),
+                ('Content-Length', str(len(GONE_BODY)))
+            ] + limit_headers)
+            return [GONE_BODY]
+        
+        start_response('302 FOUND', [
+            ('Location', iri_to_uri(entry.long_url)),
+            ('Content-Length', '0')
+        ] + limit_headers)
+        return [b'']
+
+def init_redirect_fast_path(app):
+    """Mount the root-level redirect fast path in front of the Flask app."""
+    if not app.config.get('REDIRECT_FASTPATH_ENABLED', True):
+        return
+    app.wsgi_app = RedirectFastPath(app.wsgi_app, app)
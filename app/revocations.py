@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.models import User, TeamMember
+from app.cache import invalidate_user, invalidate_user_team_roles
+
+logger = logging.getLogger(__name__)
+
+# Changing these invalidates the claims carried by a user's tokens
+CLAIM_ATTRIBUTES = ('is_active', 'is_admin')
+
+class TokenRevocations:
+    """In-memory map of user_id -> current token_version for recently changed users.
+    
+    Only users whose version changed within the token lifetime are kept, since
+    older tokens have expired anyway, so the map stays small. It is reloaded
+    with one query every ``refresh_interval`` seconds; changes made in this
+    process are noted at once. A token's claims are trusted only if its
+    version is not below the one in the map. Users whose version was changed
+    by another process are dropped from this process's user and team role
+    caches on refresh, so the fallback lookups see the change too.
+    """
+    
+    def __init__(self, app, refresh_interval=5.0, token_lifetime=3600):
+        self.app = app
+        self.refresh_interval = refresh_interval
+        self.token_lifetime = token_lifetime
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._refreshed_at = None
+        self.refreshes = 0
+        self.stale_tokens = 0
+    
+    def is_current(self, user_id, version):
+        """Check if claims minted at version are still valid for the user."""
+        if self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            self.refresh()
+        current = self._versions.get(user_id)
+        if current is not None and version < current:
+            self.stale_tokens += 1
+            return False
+        return True
+    
+    def note(self, user_id, version):
+        """Record a version change made in this process."""
+        with self._lock:
+            if version > self._versions.get(user_id, 0):
+                self._versions[user_id] = version
+    
+    def refresh(self):
+        """Reload versions of users whose tokens changed within the token lifetime."""
+        since = datetime.utcnow() - timedelta(seconds=self.token_lifetime)
+        try:
+            with self.app.app_context():
+                with db.engine.connect() as connection:
+                    rows = connection.execute(
+                        select(User.id, User.token_version).where(User.tokens_revoked_at >= since)
+                    ).all()
+        except SQLAlchemyError:
+            # Keep the previous map; claims of users changed since then are trusted a little longer
+            logger.exception('Failed to refresh token revocations')
+            self._refreshed_at = time.monotonic()
+            return
+        with self._lock:
+            versions = dict(rows)
+            changed = [user_id for user_id, version in versions.items()
+                       if version > self._versions.get(user_id, 0)]
+            for user_id, version in self._versions.items():
+                # Local notes may be ahead of a read that started before their commit
+                if version > versions.get(user_id, 0):
+                    versions[user_id] = version
+            self._versions = versions
+            self._refreshed_at = time.monotonic()
+            self.refreshes += 1
+        if changed:
+            with self.app.app_context():
+                for user_id in changed:
+                    invalidate_user(user_id)
+                    invalidate_user_team_roles(user_id)
+    
+    def stats(self):
+        """Return the size of the map and refresh counters."""
+        with self._lock:
+            return {
+                'users': len(self._versions),
+                'refresh_interval': self.refresh_interval,
+                'refreshes': self.refreshes,
+                'stale_tokens': self.stale_tokens
+            }
+
+def init_token_revocations(app):
+    """Attach the token revocation map to the application."""
+    app.extensions['token_revocations'] = TokenRevocations(
+        app,
+        refresh_interval=app.config.get('JWT_REVOCATION_REFRESH_INTERVAL', 5.0),
+        token_lifetime=app.config.get('JWT_ACCESS_TOKEN_EXPIRES', 3600)
+    )
+
+def get_token_revocations():
+    """Get the token revocation map for the current application."""
+    return current_app.extensions.get('token_revocations')
+
+def _bump_token_version(connection, user_id):
+    """Increment a user's token_version in SQL, so stale in-memory values cannot lower it."""
+    users = User.__table__
+    connection.execute(users.update().where(users.c.id == user_id).values(
+        token_version=users.c.token_version + 1,
+        tokens_revoked_at=datetime.utcnow()
+    ))
+    if not has_app_context():
+        return
+    version = connection.execute(select(users.c.token_version).where(users.c.id == user_id)).scalar()
+    revocations = get_token_revocations()
+    if version is not None and revocations is not None:
+        revocations.note(user_id, version)
+    invalidate_user(user_id)
+
+@event.listens_for(User, 'after_update')
+def _revoke_changed_claims(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[key].history.has_changes() for key in CLAIM_ATTRIBUTES):
+        _bump_token_version(connection, target.id)
+
+@event.listens_for(TeamMember, 'after_insert')
+@event.listens_for(TeamMember, 'after_update')
+@event.listens_for(TeamMember, 'after_delete')
+def _revoke_changed_membership(mapper, connection, target):
+    # Team roles are claims too
+    _bump_token_version(connection, target.user_id)
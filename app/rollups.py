@@ -0,0 +1,89 @@
+from datetime import datetime, timezone, timedelta
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models import ClickRollupHourly, ClickRollupDaily
+
+INTERVALS = {
+    'hour': (ClickRollupHourly, timedelta(hours=1)),
+    'day': (ClickRollupDaily, timedelta(days=1))
+}
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 date or datetime into a naive UTC datetime."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def truncate(value, interval):
+    """Truncate a datetime to the start of its hour or day."""
+    if interval == 'day':
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    return value.replace(minute=0, second=0, microsecond=0)
+
+def _upsert(connection, model, rows):
+    table = model.__table__
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['url_id', 'bucket_start'],
+            set_={'clicks': table.c.clicks + stmt.excluded.clicks}
+        )
+        connection.execute(stmt, rows)
+        return
+    # Portable fallback: bump existing buckets, insert the rest
+    for row in rows:
+        result = connection.execute(
+            table.update().where(
+                (table.c.url_id == row['url_id']) &
+                (table.c.bucket_start == row['bucket_start'])
+            ).values(clicks=table.c.clicks + row['clicks'])
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(**row))
+
+def increment_rollups(connection, hourly):
+    """Add hourly click counts {(url_id, hour_start): clicks} to both rollup tables."""
+    if not hourly:
+        return
+    daily = {}
+    for (url_id, hour), clicks in hourly.items():
+        key = (url_id, truncate(hour, 'day'))
+        daily[key] = daily.get(key, 0) + clicks
+    
+    for model, counts in ((ClickRollupHourly, hourly), (ClickRollupDaily, daily)):
+        rows = [
+            {'url_id': url_id, 'bucket_start': bucket, 'clicks': clicks}
+            for (url_id, bucket), clicks in sorted(counts.items())
+        ]
+        _upsert(connection, model, rows)
+
+def click_timeseries(url_id, start, end, interval='day', pending=None):
+    """Return zero-filled click counts per bucket between start and end.
+    
+    Only the rollup table for the interval is read, so the cost depends on the
+    number of buckets in the range rather than on total clicks. ``pending``
+    optionally adds unflushed hourly counts {hour_start: clicks}.
+    """
+    model, step = INTERVALS[interval]
+    first = truncate(start, interval)
+    rows = db.session.query(model.bucket_start, model.clicks).filter(
+        model.url_id == url_id,
+        model.bucket_start >= first,
+        model.bucket_start <= end
+    ).all()
+    
+    counts = {bucket: clicks for bucket, clicks in rows}
+    for hour, clicks in (pending or {}).items():
+        bucket = truncate(hour, interval)
+        if first <= bucket <= end:
+            counts[bucket] = counts.get(bucket, 0) + clicks
+    
+    buckets = []
+    bucket = first
+    while bucket <= end:
+        buckets.append({'start': bucket.isoformat(), 'clicks': counts.get(bucket, 0)})
+        bucket += step
+    return buckets
@@ -1,18 +1,42 @@
 from flask import Blueprint, request, jsonify, redirect, current_app
 from marshmallow import ValidationError
-from app.models import URL, User, Team, TeamMember, db
+from app.models import URL, User, Team, TeamMember, ApiKey, db
 from app.schemas import (
     ShortenRequestSchema, ShortenResponseSchema, URLResponseSchema,
     URLUpdateSchema, URLListSchema, AnalyticsSchema, UserSchema,
     UserResponseSchema, UserLoginSchema, TeamSchema, TeamResponseSchema,
-    TeamMemberSchema, TeamMemberResponseSchema, ErrorSchema, SuccessSchema
+    TeamMemberSchema, TeamMemberResponseSchema, ApiKeySchema, ApiKeyResponseSchema,
+    ErrorSchema, SuccessSchema
 )
 from app.auth import (
-    login_required, admin_required, team_member_required, team_admin_required,
-    hash_password, verify_password, generate_token, get_current_user
+    login_required, admin_required, team_member_required, team_admin_required, api_key_scope,
+    hash_password, verify_password, password_needs_rehash, generate_token, get_current_user,
+    get_current_api_key, get_current_identity, get_team_role
 )
-from app.utils import generate_unique_short_code, get_base_url
-from datetime import datetime
+from app.utils import (
+    generate_unique_short_code, generate_unique_short_codes, get_base_url,
+    find_existing_url, find_existing_urls, keyset_paginate, commit_new_urls
+)
+from app.url_hash import long_url_hash
+from app.allocator import get_short_code_allocator
+from app.code_pool import get_short_code_pool
+from app.passwords import get_password_hasher
+from app.api_keys import DEFAULT_SCOPES, create_api_key, get_api_key_usage
+from app.revocations import get_token_revocations
+from app.ratelimit import get_rate_limiter
+from app.search import search_filter
+from app.tags import parse_tags, tag_filter, tag_facets
+from app.counters import COUNT_MODES, listing_total, get_listing_count_cache
+from app.cache import get_redirect_cache, get_redirect_cache_sync, get_user_cache, get_team_role_cache, invalidate_redirect
+from app.clicks import (
+    record_click, pending_clicks, pending_hourly_clicks, last_click_at, get_click_aggregator
+)
+from app.rollups import click_timeseries, parse_timestamp
+from app.bloom import get_short_code_filter
+from app.redirects import lookup_redirect
+from app.shared_table import get_shared_redirect_table, publish_redirect
+from datetime import datetime, timedelta
+import math
 import re
 
 # Create versioned blueprints
@@ -60,7 +84,7 @@ def register():
             'user': UserResponseSchema().dump(user),
             'token': token
         }), 201
-        
+    
     except ValidationError as e:
         return jsonify({
             'error': 'Validation Error',
@@ -96,6 +120,12 @@ def login():
                 'message': 'Your account has been deactivated'
             }), 403
         
+        # Upgrade hashes made with an older, cheaper cost while the password is at hand
+        if password_needs_rehash(user.password_hash):
+            user.password_hash = hash_password(data['password'])
+            db.session.commit()
+            get_password_hasher().rehashed += 1
+        
         # Generate token
         token = generate_token(user.id, user.username)
         
@@ -104,7 +134,7 @@ def login():
             'user': UserResponseSchema().dump(user),
             'token': token
         }), 200
-        
+    
     except ValidationError as e:
         return jsonify({
             'error': 'Validation Error',
@@ -126,6 +156,83 @@ def get_profile():
         'user': UserResponseSchema().dump(user)
     }), 200
 
+# ============================================================================
+# API KEY ENDPOINTS
+# ============================================================================
+
+@api_v1.route('/api-keys', methods=['POST'])
+@login_required
+def create_key():
+    """Create an API key for the current user; the key is only shown once."""
+    if get_current_api_key() is not None:
+        return jsonify({
+            'error': 'Access Denied',
+            'message': 'API keys cannot create other API keys'
+        }), 403
+    try:
+        schema = ApiKeySchema()
+        data = schema.load(request.json)
+        
+        user = get_current_user()
+        team_id = data.get('team_id')
+        if team_id is not None and get_team_role(user.id, team_id) is None:
+            return jsonify({
+                'error': 'Access Denied',
+                'message': 'Team membership required'
+            }), 403
+        
+        api_key, key = create_api_key(user.id, data['name'], data.get('scopes') or DEFAULT_SCOPES, team_id)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'API key created successfully; store it now, it cannot be shown again',
+            'api_key': ApiKeyResponseSchema().dump(api_key),
+            'key': key
+        }), 201
+    
+    except ValidationError as e:
+        return jsonify({
+            'error': 'Validation Error',
+            'message': 'Invalid input data',
+            'details': e.messages
+        }), 422
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'error': 'API Key Creation Error',
+            'message': str(e)
+        }), 500
+
+@api_v1.route('/api-keys', methods=['GET'])
+@login_required
+def get_keys():
+    """List the current user's API keys."""
+    user = get_current_user()
+    keys = ApiKey.query.filter_by(user_id=user.id).order_by(ApiKey.created_at.desc()).all()
+    return jsonify({
+        'api_keys': [ApiKeyResponseSchema().dump(api_key) for api_key in keys],
+        'total': len(keys)
+    }), 200
+
+@api_v1.route('/api-keys/<int:key_id>', methods=['DELETE'])
+@login_required
+def revoke_key(key_id):
+    """Revoke one of the current user's API keys."""
+    user = get_current_user()
+    api_key = ApiKey.query.filter_by(id=key_id, user_id=user.id).first()
+    if not api_key:
+        return jsonify({
+            'error': 'Not Found',
+            'message': 'API key not found'
+        }), 404
+    
+    api_key.is_active = False
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'API key revoked successfully'
+    }), 200
+
 # ============================================================================
 # TEAM MANAGEMENT ENDPOINTS
 # ============================================================================
@@ -161,7 +268,7 @@ def create_team():
             'message': 'Team created successfully',
             'team': TeamResponseSchema().dump(team)
         }), 201
-        
+    
     except ValidationError as e:
         return jsonify({
             'error': 'Validation Error',
@@ -240,7 +347,7 @@ def add_team_member(team_id):
             'message': 'Team member added successfully',
             'member': TeamMemberResponseSchema().dump(member)
         }), 201
-        
+    
     except ValidationError as e:
         return jsonify({
             'error': 'Validation Error',
@@ -258,8 +365,34 @@ def add_team_member(team_id):
 # ENHANCED URL MANAGEMENT ENDPOINTS
 # ============================================================================
 
+def _apply_api_key_team(data):
+    """Default team_id to the team of the requesting API key.
+    
+    Returns False if a team-bound key names a different team.
+    """
+    api_key = get_current_api_key()
+    if api_key is None or api_key.team_id is None:
+        return True
+    if data.get('team_id') is None:
+        data['team_id'] = api_key.team_id
+    return data['team_id'] == api_key.team_id
+
+def _api_key_team_id():
+    """Team the requesting API key is bound to, or None for JWTs and unbound keys."""
+    api_key = get_current_api_key()
+    return api_key.team_id if api_key is not None else None
+
+def _user_urls(user):
+    """Active URLs of the user, narrowed to the API key's team for team-bound keys."""
+    query = URL.query.filter_by(user_id=user.id, is_active=True)
+    key_team_id = _api_key_team_id()
+    if key_team_id is not None:
+        query = query.filter_by(team_id=key_team_id)
+    return query
+
 @api_v1.route('/shorten', methods=['POST'])
 @login_required
+@api_key_scope('urls:write')
 def shorten_url():
     """Shorten a URL with team collaboration support."""
     try:
@@ -267,13 +400,14 @@ def shorten_url():
         data = schema.load(request.json)
         
         user = get_current_user()
+        if not _apply_api_key_team(data):
+            return jsonify({
+                'error': 'Access Denied',
+                'message': 'This API key can only shorten URLs for its own team'
+            }), 403
         
         # Check if URL already exists for this user/team
-        existing_url = URL.query.filter_by(
-            long_url=data['long_url'],
-            user_id=user.id,
-            team_id=data.get('team_id')
-        ).first()
+        existing_url = find_existing_url(data['long_url'], user.id, data.get('team_id'))
         
         if existing_url:
             return jsonify({
@@ -283,7 +417,8 @@ def shorten_url():
             }), 200
         
         # Generate unique short code
-        short_code = generate_unique_short_code()
+        length = data.get('length', 6)
+        short_code = generate_unique_short_code(length)
         
         # Create URL
         url = URL(
@@ -297,15 +432,15 @@ def shorten_url():
             expires_at=data.get('expires_at')
         )
         
-        db.session.add(url)
-        db.session.commit()
+        short_code, = commit_new_urls([url], length)
+        publish_redirect(url)
         
         return jsonify({
             'short_url': f"{get_base_url()}/{short_code}",
             'short_code': short_code,
             'message': 'URL shortened successfully'
         }), 201
-        
+    
     except ValidationError as e:
         return jsonify({
             'error': 'Validation Error',
@@ -319,82 +454,248 @@ def shorten_url():
             'message': str(e)
         }), 500
 
+@api_v1.route('/shorten/batch', methods=['POST'])
+@login_required
+@api_key_scope('urls:write')
+def shorten_urls_batch():
+    """Shorten many URLs in one request.
+    
+    Items are validated one by one, deduplicated against existing rows with one
+    set-based query, given codes in bulk and inserted in a single transaction.
+    """
+    payload = request.get_json(silent=True)
+    items = payload.get('items') if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        return jsonify({
+            'error': 'Validation Error',
+            'message': 'Request body must be a JSON array of URLs to shorten'
+        }), 422
+    
+    max_items = current_app.config.get('SHORTEN_BATCH_MAX_ITEMS', 10000)
+    if len(items) > max_items:
+        return jsonify({
+            'error': 'Batch Too Large',
+            'message': f'At most {max_items} URLs can be shortened per request'
+        }), 413
+    
+    try:
+        user = get_current_user()
+        schema = ShortenRequestSchema()
+        base_url = get_base_url()
+        results = [None] * len(items)
+        valid = []
+        
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[index] = {'index': index, 'status': 'invalid', 'errors': {'_schema': ['Item must be an object']}}
+                continue
+            try:
+                data = schema.load(item)
+            except ValidationError as e:
+                results[index] = {'index': index, 'status': 'invalid', 'errors': e.messages}
+                continue
+            if not _apply_api_key_team(data):
+                results[index] = {'index': index, 'status': 'invalid', 'errors': {'team_id': ['Not the API key\'s team']}}
+                continue
+            valid.append((index, data, (long_url_hash(data['long_url']), data.get('team_id'))))
+        
+        existing = find_existing_urls([key for _, _, key in valid], user.id)
+        
+        # Repeated URLs within the batch share the first item's new code
+        to_create = {}
+        for index, data, key in valid:
+            if key in existing:
+                results[index] = {'index': index, 'status': 'existing', 'short_code': existing[key]}
+            else:
+                to_create.setdefault(key, (index, data))
+        
+        codes = generate_unique_short_codes(len(to_create))
+        urls = []
+        created = []
+        for (key, (index, data)), short_code in zip(to_create.items(), codes):
+            url = URL(
+                long_url=data['long_url'],
+                short_code=short_code,
+                user_id=user.id,
+                team_id=data.get('team_id'),
+                title=data.get('title'),
+                description=data.get('description'),
+                tags=data.get('tags'),
+                expires_at=data.get('expires_at')
+            )
+            urls.append(url)
+            created.append((key, index, url))
+        
+        codes = commit_new_urls(urls)
+        for (key, index, url), short_code in zip(created, codes):
+            publish_redirect(url)
+            existing[key] = short_code
+            results[index] = {'index': index, 'status': 'created', 'short_code': short_code}
+        
+        for index, data, key in valid:
+            if results[index] is None:
+                results[index] = {'index': index, 'status': 'existing', 'short_code': existing[key]}
+        for result in results:
+            if 'short_code' in result:
+                result['short_url'] = f"{base_url}/{result['short_code']}"
+        
+        return jsonify({
+            'results': results,
+            'created': len(urls),
+            'existing': len(valid) - len(urls),
+            'invalid': len(items) - len(valid)
+        }), 200
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'error': 'URL Shortening Error',
+            'message': str(e)
+        }), 500
+
 @api_v1.route('/<short_code>', methods=['GET'])
 def redirect_to_url(short_code):
     """Redirect to original URL."""
-    url = URL.query.filter_by(short_code=short_code, is_active=True).first()
+    entry = lookup_redirect(short_code)
     
-    if not url:
+    if entry is None:
         return jsonify({
             'error': 'Not Found',
             'message': 'Short URL not found'
         }), 404
     
-    if url.is_expired():
+    if entry.is_expired():
         return jsonify({
             'error': 'Gone',
             'message': 'This URL has expired'
         }), 410
     
-    # Increment click count
-    url.increment_clicks()
+    # Buffer the click; it is written in the next batched flush
+    record_click(
+        entry.url_id,
+        short_code,
+        referrer=request.referrer,
+        user_agent=request.headers.get('User-Agent')
+    )
     
-    return redirect(url.long_url, code=302)
+    return redirect(entry.long_url, code=302)
+
+@api_v1.route('/resolve/<short_code>', methods=['GET'])
+def resolve_url(short_code):
+    """Resolve a short code to its original URL without redirecting."""
+    entry = lookup_redirect(short_code)
+    
+    if entry is None:
+        return jsonify({
+            'error': 'Not Found',
+            'message': 'Short URL not found'
+        }), 404
+    
+    if entry.is_expired():
+        return jsonify({
+            'error': 'Gone',
+            'message': 'This URL has expired'
+        }), 410
+    
+    return jsonify({
+        'short_code': short_code,
+        'long_url': entry.long_url,
+        'expires_at': entry.expires_at.isoformat() if entry.expires_at else None
+    }), 200
 
 @api_v1.route('/urls', methods=['GET'])
 @login_required
+@api_key_scope('urls:read')
 def get_urls():
-    """Get URLs for current user with pagination and team filtering."""
+    """Get URLs for current user with cursor pagination and team filtering."""
     user = get_current_user()
     
     # Get query parameters
-    page = request.args.get('page', 1, type=int)
-    per_page = min(request.args.get('per_page', 20, type=int), 100)
+    page = request.args.get('page', type=int)
+    cursor = request.args.get('cursor')
+    per_page = max(min(request.args.get('per_page', 20, type=int), 100), 1)
+    include_total = request.args.get('include_total', 'false').lower() == 'true'
     team_id = request.args.get('team_id', type=int)
     search = request.args.get('search', '')
+    tags = request.args.getlist('tag')
+    ranked = bool(search) and request.args.get('sort') == 'relevance'
+    
+    # Totals are opt-in for cursor pages; offset pages keep an exact total by default
+    count_mode = request.args.get('count') or ('exact' if include_total or page is not None else 'none')
+    if count_mode not in COUNT_MODES:
+        return jsonify({
+            'error': 'Bad Request',
+            'message': f"count must be one of: {', '.join(COUNT_MODES)}"
+        }), 400
+    
+    key_team_id = _api_key_team_id()
+    if key_team_id is not None:
+        if team_id and team_id != key_team_id:
+            return jsonify({
+                'error': 'Access Denied',
+                'message': 'This API key can only access URLs of its own team'
+            }), 403
+        team_id = key_team_id
     
     # Build query
-    query = URL.query.filter_by(user_id=user.id, is_active=True)
+    query = _user_urls(user)
     
     if team_id:
         query = query.filter_by(team_id=team_id)
     
+    if tags:
+        query = tag_filter(query, tags)
+    
     if search:
-        search_filter = f"%{search}%"
-        query = query.filter(
-            db.or_(
-                URL.title.ilike(search_filter),
-                URL.description.ilike(search_filter),
-                URL.tags.ilike(search_filter)
-            )
-        )
+        query = search_filter(query, search, ranked=ranked)
     
-    # Paginate results
-    pagination = query.order_by(URL.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    if ranked:
+        # Cursors follow (created_at, id), so relevance-ordered results are paged by offset
+        page, cursor = page or 1, None
     
-    urls = [URLResponseSchema().dump(url) for url in pagination.items]
+    filters = (search, tuple(sorted(parse_tags(','.join(tags)))))
     
-    return jsonify({
-        'urls': urls,
-        'total': pagination.total,
-        'page': page,
+    if page is not None and not cursor:
+        # Offset pagination, kept for existing clients; deep pages get slower
+        pagination = query.order_by(URL.created_at.desc(), URL.id.desc()).paginate(
+            page=page, per_page=per_page, error_out=False, count=False
+        )
+        total = listing_total(query, count_mode, user.id, team_id or None, filters)
+        return jsonify({
+            'urls': [URLResponseSchema().dump(url) for url in pagination.items],
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'pages': math.ceil(total / per_page) if total is not None else None
+        }), 200
+    
+    try:
+        result = keyset_paginate(query, per_page, cursor)
+    except ValueError:
+        return jsonify({
+            'error': 'Bad Request',
+            'message': 'Invalid cursor'
+        }), 400
+    
+    response = {
+        'urls': [URLResponseSchema().dump(url) for url in result.items],
         'per_page': per_page,
-        'pages': pagination.pages
-    }), 200
+        'next_cursor': result.next_cursor,
+        'prev_cursor': result.prev_cursor
+    }
+    total = listing_total(query, count_mode, user.id, team_id or None, filters)
+    if total is not None:
+        response['total'] = total
+    return jsonify(response), 200
 
 @api_v1.route('/urls/<short_code>', methods=['GET'])
 @login_required
+@api_key_scope('urls:read')
 def get_url(short_code):
     """Get specific URL details."""
     user = get_current_user()
     
-    url = URL.query.filter_by(
-        short_code=short_code,
-        user_id=user.id,
-        is_active=True
-    ).first()
+    url = _user_urls(user).filter_by(short_code=short_code).first()
     
     if not url:
         return jsonify({
@@ -408,6 +709,7 @@ def get_url(short_code):
 
 @api_v1.route('/urls/<short_code>', methods=['PUT'])
 @login_required
+@api_key_scope('urls:write')
 def update_url(short_code):
     """Update URL details."""
     try:
@@ -416,11 +718,7 @@ def update_url(short_code):
         
         user = get_current_user()
         
-        url = URL.query.filter_by(
-            short_code=short_code,
-            user_id=user.id,
-            is_active=True
-        ).first()
+        url = _user_urls(user).filter_by(short_code=short_code).first()
         
         if not url:
             return jsonify({
@@ -435,12 +733,14 @@ def update_url(short_code):
         
         url.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_redirect(url.short_code)
+        publish_redirect(url)
         
         return jsonify({
             'message': 'URL updated successfully',
             'url': URLResponseSchema().dump(url)
         }), 200
-        
+    
     except ValidationError as e:
         return jsonify({
             'error': 'Validation Error',
@@ -456,15 +756,12 @@ def update_url(short_code):
 
 @api_v1.route('/urls/<short_code>', methods=['DELETE'])
 @login_required
+@api_key_scope('urls:write')
 def delete_url(short_code):
     """Delete a URL (soft delete)."""
     user = get_current_user()
     
-    url = URL.query.filter_by(
-        short_code=short_code,
-        user_id=user.id,
-        is_active=True
-    ).first()
+    url = _user_urls(user).filter_by(short_code=short_code).first()
     
     if not url:
         return jsonify({
@@ -476,22 +773,52 @@ def delete_url(short_code):
     url.is_active = False
     url.updated_at = datetime.utcnow()
     db.session.commit()
+    invalidate_redirect(url.short_code)
+    publish_redirect(url)
     
     return jsonify({
         'message': 'URL deleted successfully'
     }), 200
 
+@api_v1.route('/tags/facets', methods=['GET'])
+@login_required
+@api_key_scope('urls:read')
+def get_tag_facets():
+    """Get per-tag URL counts for the current user or one of their teams."""
+    identity = get_current_identity()
+    team_id = request.args.get('team_id', type=int)
+    limit = max(min(request.args.get('limit', 50, type=int), 500), 1)
+    key_team_id = _api_key_team_id()
+    
+    if key_team_id is not None and team_id and team_id != key_team_id:
+        return jsonify({
+            'error': 'Access Denied',
+            'message': 'This API key can only access URLs of its own team'
+        }), 403
+    if team_id:
+        if identity.team_role(team_id) is None:
+            return jsonify({
+                'error': 'Access Denied',
+                'message': 'Team membership required'
+            }), 403
+        facets = tag_facets(team_id=team_id, limit=limit)
+    else:
+        # A team-bound key sees only the user's URLs in its team
+        facets = tag_facets(user_id=identity.user_id, team_id=key_team_id, limit=limit)
+    
+    return jsonify({
+        'tags': facets,
+        'team_id': team_id
+    }), 200
+
 @api_v1.route('/analytics/<short_code>', methods=['GET'])
 @login_required
+@api_key_scope('analytics:read')
 def get_analytics(short_code):
     """Get analytics for a URL."""
     user = get_current_user()
     
-    url = URL.query.filter_by(
-        short_code=short_code,
-        user_id=user.id,
-        is_active=True
-    ).first()
+    url = _user_urls(user).filter_by(short_code=short_code).first()
     
     if not url:
         return jsonify({
@@ -500,25 +827,83 @@ def get_analytics(short_code):
         }), 404
     
     # Basic analytics
+    last_click = last_click_at(url.id)
     analytics = {
         'short_code': url.short_code,
-        'clicks': url.click_count,
+        'clicks': (url.click_count or 0) + pending_clicks(url.id),
         'created_at': url.created_at.isoformat() if url.created_at else None,
-        'last_click': url.updated_at.isoformat() if url.updated_at else None
+        'last_click': last_click.isoformat() if last_click else None
     }
     
     # Team stats if applicable
     if url.team_id:
-        team_urls = URL.query.filter_by(team_id=url.team_id, is_active=True).all()
-        total_team_clicks = sum(u.click_count for u in team_urls)
+        # Aggregates over the (team_id, is_active, click_count) index; team rows are never loaded
+        team_urls = URL.query.filter_by(team_id=url.team_id, is_active=True)
+        total_urls, total_clicks = team_urls.with_entities(
+            db.func.count(URL.id), db.func.coalesce(db.func.sum(URL.click_count), 0)
+        ).one()
+        # Ties keep id order, as a stable sort by clicks would
+        ahead = team_urls.filter(db.or_(
+            URL.click_count > url.click_count,
+            db.and_(URL.click_count == url.click_count, URL.id < url.id)
+        )).count()
         analytics['team_stats'] = {
-            'total_urls': len(team_urls),
-            'total_clicks': total_team_clicks,
-            'team_rank': sorted(team_urls, key=lambda x: x.click_count, reverse=True).index(url) + 1
+            'total_urls': total_urls,
+            'total_clicks': total_clicks,
+            'team_rank': ahead + 1
         }
     
     return jsonify(analytics), 200
 
+@api_v1.route('/analytics/<short_code>/timeseries', methods=['GET'])
+@login_required
+@api_key_scope('analytics:read')
+def get_analytics_timeseries(short_code):
+    """Get a click histogram for a URL over a date range."""
+    user = get_current_user()
+    
+    url = _user_urls(user).filter_by(short_code=short_code).first()
+    
+    if not url:
+        return jsonify({
+            'error': 'Not Found',
+            'message': 'URL not found'
+        }), 404
+    
+    interval = request.args.get('interval', 'day')
+    if interval not in ('hour', 'day'):
+        return jsonify({
+            'error': 'Bad Request',
+            'message': 'interval must be one of: hour, day'
+        }), 400
+    
+    try:
+        end = parse_timestamp(request.args['end']) if 'end' in request.args else datetime.utcnow()
+        start = parse_timestamp(request.args['start']) if 'start' in request.args else end - timedelta(days=30)
+    except ValueError:
+        return jsonify({
+            'error': 'Bad Request',
+            'message': 'start and end must be ISO 8601 dates'
+        }), 400
+    
+    step = timedelta(hours=1) if interval == 'hour' else timedelta(days=1)
+    if start > end or (end - start) / step > current_app.config.get('TIMESERIES_MAX_BUCKETS', 5000):
+        return jsonify({
+            'error': 'Bad Request',
+            'message': 'Invalid or too large date range for this interval'
+        }), 400
+    
+    buckets = click_timeseries(url.id, start, end, interval, pending=pending_hourly_clicks(url.id))
+    
+    return jsonify({
+        'short_code': url.short_code,
+        'interval': interval,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'total': sum(bucket['clicks'] for bucket in buckets),
+        'buckets': buckets
+    }), 200
+
 # ============================================================================
 # ADMIN ENDPOINTS
 # ============================================================================
@@ -543,6 +928,42 @@ def get_all_teams():
         'total': len(teams)
     }), 200
 
+@api_v1.route('/admin/cache/stats', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """Get redirect cache statistics (admin only)."""
+    cache = get_redirect_cache()
+    cache_sync = get_redirect_cache_sync()
+    aggregator = get_click_aggregator()
+    code_filter = get_short_code_filter()
+    shared = get_shared_redirect_table()
+    allocator = get_short_code_allocator()
+    pool = get_short_code_pool()
+    users = get_user_cache()
+    team_roles = get_team_role_cache()
+    hasher = get_password_hasher()
+    key_usage = get_api_key_usage()
+    revocations = get_token_revocations()
+    limiter = get_rate_limiter()
+    listing_counts = get_listing_count_cache()
+    return jsonify({
+        'redirect_cache': cache.stats() if cache is not None else None,
+        'redirect_cache_sync': cache_sync.stats() if cache_sync is not None else None,
+        'redirect_cache_warmup': current_app.extensions.get('redirect_cache_warmup'),
+        'click_buffer': aggregator.stats() if aggregator is not None else None,
+        'short_code_filter': code_filter.stats() if code_filter is not None else None,
+        'shared_redirect_table': shared.stats() if shared is not None else None,
+        'short_code_allocator': allocator.stats() if allocator is not None else None,
+        'short_code_pool': pool.stats() if pool is not None else None,
+        'user_cache': users.stats() if users is not None else None,
+        'team_role_cache': team_roles.stats() if team_roles is not None else None,
+        'password_hasher': hasher.stats(),
+        'api_key_usage': key_usage.stats() if key_usage is not None else None,
+        'token_revocations': revocations.stats() if revocations is not None else None,
+        'rate_limiter': limiter.stats() if limiter is not None else None,
+        'listing_count_cache': listing_counts.stats() if listing_counts is not None else None
+    }), 200
+
 # ============================================================================
 # LEGACY ENDPOINTS (for backward compatibility)
 # ============================================================================
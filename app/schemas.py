@@ -1,6 +1,8 @@
 from marshmallow import Schema, fields, validate, ValidationError
 from datetime import datetime
 import validators
+from app.api_keys import SCOPES
+from app.code_pool import MIN_CODE_LENGTH, MAX_CODE_LENGTH
 
 # User Schemas
 class UserSchema(Schema):
@@ -56,6 +58,25 @@ class TeamMemberResponseSchema(Schema):
     user = fields.Nested(UserResponseSchema)
     team = fields.Nested(TeamResponseSchema)
 
+# API Key Schemas
+class ApiKeySchema(Schema):
+    """Schema for creating an API key."""
+    name = fields.Str(required=True, validate=validate.Length(min=1, max=100))
+    scopes = fields.List(fields.Str(validate=validate.OneOf(SCOPES)), validate=validate.Length(min=1))
+    team_id = fields.Int(allow_none=True)
+
+class ApiKeyResponseSchema(Schema):
+    """Schema for API key response data (never includes the key itself)."""
+    id = fields.Int(dump_only=True)
+    name = fields.Str()
+    prefix = fields.Str()
+    user_id = fields.Int()
+    team_id = fields.Int(allow_none=True)
+    scopes = fields.List(fields.Str(), attribute='scope_list')
+    is_active = fields.Bool()
+    created_at = fields.DateTime(dump_only=True)
+    last_used_at = fields.DateTime(allow_none=True)
+
 # Enhanced URL Schemas
 class ShortenRequestSchema(Schema):
     """Schema for URL shortening request."""
@@ -65,6 +86,7 @@ class ShortenRequestSchema(Schema):
     description = fields.Str(validate=validate.Length(max=1000))
     tags = fields.Str(validate=validate.Length(max=500))
     team_id = fields.Int(allow_none=True)
+    length = fields.Int(validate=validate.Range(min=MIN_CODE_LENGTH, max=MAX_CODE_LENGTH))
 
 class ShortenResponseSchema(Schema):
     """Schema for URL shortening response."""
@@ -0,0 +1,106 @@
+import re
+from flask import current_app
+from sqlalchemy import DDL, event, inspect, literal_column, select, func, table, column
+from app import db
+from app.models import URL
+
+# Columns covered by the full-text index
+SEARCH_COLUMNS = ('title', 'description', 'tags')
+
+# SQLite: external-content FTS5 table over urls, kept in step by triggers, so
+# Core inserts (batch shorten, imports) and raw SQL are indexed as well
+SQLITE_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS urls_fts USING fts5(
+        title, description, tags, content='urls', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS urls_fts_insert AFTER INSERT ON urls BEGIN
+        INSERT INTO urls_fts(rowid, title, description, tags)
+        VALUES (new.id, new.title, new.description, new.tags);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS urls_fts_delete AFTER DELETE ON urls BEGIN
+        INSERT INTO urls_fts(urls_fts, rowid, title, description, tags)
+        VALUES ('delete', old.id, old.title, old.description, old.tags);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS urls_fts_update AFTER UPDATE OF title, description, tags ON urls BEGIN
+        INSERT INTO urls_fts(urls_fts, rowid, title, description, tags)
+        VALUES ('delete', old.id, old.title, old.description, old.tags);
+        INSERT INTO urls_fts(rowid, title, description, tags)
+        VALUES (new.id, new.title, new.description, new.tags);
+    END""",
+    "INSERT INTO urls_fts(urls_fts) VALUES ('rebuild')"
+)
+
+# PostgreSQL: a generated tsvector column maintained by the database, with a GIN index
+POSTGRESQL_DDL = (
+    """ALTER TABLE urls ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple',
+            coalesce(title, '') || ' ' || coalesce(description, '') || ' ' ||
+            replace(coalesce(tags, ''), ',', ' ')
+        )) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_urls_search_vector ON urls USING gin (search_vector)"
+)
+
+urls_fts = table('urls_fts', column('rowid'), column('rank'))
+search_vector = literal_column('urls.search_vector')
+
+def _fts5_available(ddl, target, bind, **kw):
+    return bind.dialect.name == 'sqlite' and \
+        bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar() == 1
+
+for statement in SQLITE_DDL:
+    event.listen(URL.__table__, 'after_create', DDL(statement).execute_if(callable_=_fts5_available))
+for statement in POSTGRESQL_DDL:
+    event.listen(URL.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+event.listen(URL.__table__, 'before_drop', DDL('DROP TABLE IF EXISTS urls_fts').execute_if(dialect='sqlite'))
+
+def search_terms(text):
+    """Split user input into index tokens; operators and quotes are dropped."""
+    return re.findall(r'[^\W_]+', text.lower())
+
+def full_text_backend():
+    """Return 'sqlite', 'postgresql' or None if the database has no full-text index.
+    
+    Checked once per application, since databases created before the index
+    existed only get it from ``flask db upgrade``.
+    """
+    backend = current_app.extensions.get('url_search_backend', False)
+    if backend is False:
+        inspector = inspect(db.engine)
+        if db.engine.dialect.name == 'sqlite' and inspector.has_table('urls_fts'):
+            backend = 'sqlite'
+        elif db.engine.dialect.name == 'postgresql' and \
+                'search_vector' in {c['name'] for c in inspector.get_columns('urls')}:
+            backend = 'postgresql'
+        else:
+            backend = None
+        current_app.extensions['url_search_backend'] = backend
+    return backend
+
+def _ilike_filter(query, text):
+    pattern = f'%{text}%'
+    return query.filter(db.or_(*(getattr(URL, name).ilike(pattern) for name in SEARCH_COLUMNS)))
+
+def search_filter(query, text, ranked=False):
+    """Restrict a URL query to rows matching every word of text, each as a prefix.
+    
+    With ranked=True the query is also ordered by relevance, best first.
+    Without a full-text index, falls back to substring matching.
+    """
+    terms = search_terms(text)
+    backend = full_text_backend() if terms else None
+    
+    if backend == 'sqlite':
+        match = literal_column('urls_fts').op('MATCH')(' '.join(f'"{term}"*' for term in terms))
+        if not ranked:
+            return query.filter(URL.id.in_(select(urls_fts.c.rowid).where(match)))
+        # bm25 rank: lower is better
+        return query.join(urls_fts, urls_fts.c.rowid == URL.id).filter(match).order_by(urls_fts.c.rank)
+    
+    if backend == 'postgresql':
+        tsquery = func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+        query = query.filter(search_vector.op('@@')(tsquery))
+        if ranked:
+            query = query.order_by(func.ts_rank(search_vector, tsquery).desc())
+        return query
+    
+    return _ilike_filter(query, text)
@@ -0,0 +1,374 @@
+import calendar
+import hashlib
+import json
+import logging
+import mmap
+import os
+import socket
+import struct
+import tempfile
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import URL
+from app.cache import RedirectEntry
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'USRT'
+LAYOUT_VERSION = 1
+
+# magic, layout version, slot count, slot size, writer heartbeat, live entries
+HEADER = struct.Struct('<4sIIIdQ')
+HEADER_SIZE = 64
+
+# seqlock counter, state, code length, url length, url id, expires_at (epoch), code
+SLOT = struct.Struct('<IBBHqq16s')
+SEQ = struct.Struct('<I')
+
+EMPTY, USED, TOMBSTONE = 0, 1, 2
+MAX_PROBES = 64
+MAX_READ_RETRIES = 100
+
+def _slot_hash(short_code):
+    return int.from_bytes(hashlib.blake2b(short_code, digest_size=8).digest(), 'little')
+
+def _to_epoch(value):
+    return calendar.timegm(value.utctimetuple()) if value else 0
+
+def _from_epoch(value):
+    return datetime(1970, 1, 1) + timedelta(seconds=value) if value else None
+
+class SharedRedirectTable:
+    """Open-addressing hash table of short_code -> long_url in a memory-mapped file.
+    
+    Exactly one process (the writer) mutates the file; every worker on the node
+    maps it read-only and shares the same physical pages. Each slot carries a
+    seqlock counter: the writer makes it odd while the slot is being rewritten
+    and even again afterwards, so readers retry instead of taking a lock.
+    """
+    
+    def __init__(self, mm, writable=False):
+        self._mm = mm
+        self.writable = writable
+        magic, version, self.num_slots, self.slot_size, _, _ = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            raise ValueError('Not a shared redirect table')
+        self.max_url_bytes = self.slot_size - SLOT.size
+    
+    @classmethod
+    def create(cls, path, num_slots=65536, slot_size=512):
+        """Create a fresh table and atomically move it into place at path."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.redirects-')
+        try:
+            size = HEADER_SIZE + num_slots * slot_size
+            os.ftruncate(fd, size)
+            mm = mmap.mmap(fd, size, access=mmap.ACCESS_WRITE)
+            HEADER.pack_into(mm, 0, MAGIC, LAYOUT_VERSION, num_slots, slot_size, time.time(), 0)
+            os.replace(tmp_path, path)
+        finally:
+            os.close(fd)
+        return cls(mm, writable=True)
+    
+    @classmethod
+    def open(cls, path):
+        """Map an existing table read-only."""
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mm)
+    
+    def close(self):
+        self._mm.close()
+    
+    @property
+    def heartbeat_age(self):
+        """Seconds since the writer last proved it is alive."""
+        return time.time() - HEADER.unpack_from(self._mm, 0)[4]
+    
+    @property
+    def entries(self):
+        return HEADER.unpack_from(self._mm, 0)[5]
+    
+    def _offsets(self, key):
+        start = _slot_hash(key) % self.num_slots
+        for probe in range(min(MAX_PROBES, self.num_slots)):
+            yield HEADER_SIZE + ((start + probe) % self.num_slots) * self.slot_size
+    
+    def _read_slot(self, offset):
+        mm = self._mm
+        for _ in range(MAX_READ_RETRIES):
+            before = SEQ.unpack_from(mm, offset)[0]
+            if before & 1:
+                continue
+            _, state, code_len, url_len, url_id, expires_at, code = SLOT.unpack_from(mm, offset)
+            url = mm[offset + SLOT.size:offset + SLOT.size + url_len] if state == USED else b''
+            if SEQ.unpack_from(mm, offset)[0] == before:
+                return state, code[:code_len], url, url_id, expires_at
+        return None
+    
+    def get(self, short_code):
+        """Return a RedirectEntry for short_code, or None if it is not in the table."""
+        key = short_code.encode('utf-8')
+        for offset in self._offsets(key):
+            slot = self._read_slot(offset)
+            if slot is None:
+                # Slot kept changing under us; let the caller use the database
+                return None
+            state, code, url, url_id, expires_at = slot
+            if state == EMPTY:
+                return None
+            if state == USED and code == key:
+                return RedirectEntry(url_id, url.decode('utf-8'), _from_epoch(expires_at), True)
+        return None
+    
+    def _write_slot(self, offset, state, key, url, url_id, expires_at):
+        mm = self._mm
+        seq = SEQ.unpack_from(mm, offset)[0]
+        SEQ.pack_into(mm, offset, seq + 1)
+        SLOT.pack_into(mm, offset, seq + 1, state, len(key), len(url), url_id, expires_at, key)
+        mm[offset + SLOT.size:offset + SLOT.size + len(url)] = url
+        SEQ.pack_into(mm, offset, seq + 2)
+    
+    def _find(self, key):
+        """Return (offset of key or None, first reusable offset or None)."""
+        free = None
+        for offset in self._offsets(key):
+            _, state, code_len, _, _, _, code = SLOT.unpack_from(self._mm, offset)
+            if state == USED and code[:code_len] == key:
+                return offset, free
+            if state != USED and free is None:
+                free = offset
+            if state == EMPTY:
+                break
+        return None, free
+    
+    def _adjust_entries(self, delta):
+        header = list(HEADER.unpack_from(self._mm, 0))
+        header[5] += delta
+        HEADER.pack_into(self._mm, 0, *header)
+    
+    def set(self, short_code, url_id, long_url, expires_at=None):
+        """Insert or replace short_code. Returns False if it cannot be stored."""
+        key = short_code.encode('utf-8')
+        url = long_url.encode('utf-8')
+        if len(key) > 16:
+            return False
+        if len(url) > self.max_url_bytes:
+            # Drop any previous value so readers fall back to the cache/DB instead of the old URL
+            self.delete(short_code)
+            return False
+        existing, free = self._find(key)
+        offset = existing if existing is not None else free
+        if offset is None:
+            return False
+        self._write_slot(offset, USED, key, url, url_id or 0, _to_epoch(expires_at))
+        if existing is None:
+            self._adjust_entries(1)
+        return True
+    
+    def delete(self, short_code):
+        """Remove short_code, leaving a tombstone so probe chains stay intact."""
+        key = short_code.encode('utf-8')
+        existing, _ = self._find(key)
+        if existing is None:
+            return False
+        self._write_slot(existing, TOMBSTONE, key, b'', 0, 0)
+        self._adjust_entries(-1)
+        return True
+    
+    def touch(self):
+        """Record a writer heartbeat."""
+        header = list(HEADER.unpack_from(self._mm, 0))
+        header[4] = time.time()
+        HEADER.pack_into(self._mm, 0, *header)
+
+class SharedTableClient:
+    """Worker-side access to the shared table: lock-free reads, change notifications."""
+    
+    def __init__(self, table_path, socket_path, stale_after=5.0):
+        self.table_path = table_path
+        self.socket_path = socket_path
+        self.stale_after = stale_after
+        self._table = None
+        self._next_open = 0.0
+        self._socket = None
+        self._socket_pid = None
+        self.hits = 0
+        self.misses = 0
+        self.unavailable = 0
+        self.dropped_notifications = 0
+    
+    def _current_table(self):
+        table = self._table
+        if table is not None and table.heartbeat_age <= self.stale_after:
+            return table
+        # Missing or stale (writer stopped or replaced the file): retry at most once a second
+        now = time.monotonic()
+        if now < self._next_open:
+            return None
+        self._next_open = now + 1.0
+        try:
+            fresh = SharedRedirectTable.open(self.table_path)
+        except (OSError, ValueError):
+            return None
+        if fresh.heartbeat_age > self.stale_after:
+            fresh.close()
+            return None
+        self._table = fresh
+        return fresh
+    
+    def get(self, short_code):
+        """Look up short_code in the shared table."""
+        table = self._current_table()
+        if table is None:
+            self.unavailable += 1
+            return None
+        entry = table.get(short_code)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+    
+    def notify(self, message):
+        """Send a change to the writer process; never blocks the request."""
+        if self._socket_pid != os.getpid():
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._socket.setblocking(False)
+            self._socket_pid = os.getpid()
+        try:
+            self._socket.sendto(json.dumps(message).encode('utf-8'), self.socket_path)
+        except OSError:
+            # Writer down or its queue is full; its periodic sync picks the change up
+            self.dropped_notifications += 1
+    
+    def stats(self):
+        table = self._table
+        return {
+            'table_path': self.table_path,
+            'available': table is not None and table.heartbeat_age <= self.stale_after,
+            'entries': table.entries if table is not None else 0,
+            'slots': table.num_slots if table is not None else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'unavailable': self.unavailable,
+            'dropped_notifications': self.dropped_notifications
+        }
+
+def apply_change(table, message):
+    """Apply one change notification to the table."""
+    if message.get('op') == 'set':
+        expires_at = message.get('expires_at')
+        return table.set(
+            message['short_code'],
+            message.get('url_id'),
+            message['long_url'],
+            datetime.fromisoformat(expires_at) if expires_at else None
+        )
+    if message.get('op') == 'delete':
+        return table.delete(message['short_code'])
+    return False
+
+def apply_url(table, url):
+    """Bring the table in line with a URL row."""
+    if url.is_active:
+        return table.set(url.short_code, url.id, url.long_url, url.expires_at)
+    return table.delete(url.short_code)
+
+def run_writer(app, heartbeat_interval=1.0, sync_interval=30.0):
+    """Build the shared table from the database and keep applying changes.
+    
+    Workers send change notifications over a Unix datagram socket; a periodic
+    sync of recently created or updated rows covers any that were dropped.
+    """
+    config = app.config
+    table = SharedRedirectTable.create(
+        config['SHARED_REDIRECT_TABLE_PATH'],
+        num_slots=config.get('SHARED_REDIRECT_TABLE_SLOTS', 65536),
+        slot_size=config.get('SHARED_REDIRECT_TABLE_SLOT_SIZE', 512)
+    )
+    
+    last_sync = datetime.utcnow()
+    max_id = 0
+    skipped = 0
+    with app.app_context():
+        rows = db.session.query(
+            URL.id, URL.short_code, URL.long_url, URL.expires_at
+        ).filter(URL.is_active == True).execution_options(yield_per=10000)
+        for url_id, short_code, long_url, expires_at in rows:
+            if not table.set(short_code, url_id, long_url, expires_at):
+                skipped += 1
+        max_id = max(max_id, db.session.query(db.func.max(URL.id)).scalar() or 0)
+        db.session.remove()
+    table.touch()
+    logger.info('Shared redirect table loaded: %d entries, %d skipped', table.entries, skipped)
+    
+    socket_path = config['SHARED_REDIRECT_TABLE_SOCKET']
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(socket_path)
+    sock.settimeout(heartbeat_interval)
+    next_sync = time.monotonic() + sync_interval
+    
+    try:
+        while True:
+            try:
+                data = sock.recv(65536)
+                apply_change(table, json.loads(data))
+            except socket.timeout:
+                pass
+            except (ValueError, KeyError):
+                logger.warning('Ignoring malformed shared table notification')
+            table.touch()
+            
+            if time.monotonic() >= next_sync:
+                sync_started = datetime.utcnow()
+                with app.app_context():
+                    # Overlap the window so rows committed late are not missed
+                    changed = URL.query.filter(db.or_(
+                        URL.id > max_id,
+                        URL.updated_at >= last_sync - timedelta(seconds=sync_interval)
+                    )).all()
+                    for url in changed:
+                        apply_url(table, url)
+                        max_id = max(max_id, url.id)
+                    db.session.remove()
+                last_sync = sync_started
+                next_sync = time.monotonic() + sync_interval
+    finally:
+        sock.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+def init_shared_redirect_table(app):
+    """Attach the shared redirect table client to the application."""
+    if not app.config.get('SHARED_REDIRECT_TABLE_ENABLED', False):
+        return
+    app.extensions['shared_redirect_table'] = SharedTableClient(
+        app.config['SHARED_REDIRECT_TABLE_PATH'],
+        app.config['SHARED_REDIRECT_TABLE_SOCKET'],
+        stale_after=app.config.get('SHARED_REDIRECT_TABLE_STALE_AFTER', 5.0)
+    )
+
+def get_shared_redirect_table():
+    """Get the shared redirect table client for the current application, if enabled."""
+    return current_app.extensions.get('shared_redirect_table')
+
+def publish_redirect(url):
+    """Tell the writer process that a URL was created, changed or deleted."""
+    client = get_shared_redirect_table()
+    if client is None:
+        return
+    if url.is_active:
+        client.notify({
+            'op': 'set',
+            'short_code': url.short_code,
+            'url_id': url.id,
+            'long_url': url.long_url,
+            'expires_at': url.expires_at.isoformat() if url.expires_at else None
+        })
+    else:
+        client.notify({'op': 'delete', 'short_code': url.short_code})
@@ -0,0 +1,88 @@
+from sqlalchemy import event, inspect, select, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app import db
+from app.models import URL, Tag, URLTag
+
+TAG_MAX_LENGTH = 50
+
+def parse_tags(text):
+    """Split comma-separated tags into trimmed, lower-cased names, without repeats."""
+    names = []
+    for part in (text or '').split(','):
+        name = part.strip().lower()[:TAG_MAX_LENGTH]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+def _insert_missing_tags(connection, names):
+    tags = Tag.__table__
+    rows = [{'name': name} for name in sorted(names)]
+    if connection.dialect.name == 'sqlite':
+        connection.execute(sqlite.insert(tags).on_conflict_do_nothing(index_elements=['name']), rows)
+    elif connection.dialect.name == 'postgresql':
+        connection.execute(postgresql.insert(tags).on_conflict_do_nothing(index_elements=['name']), rows)
+    else:
+        existing = set(connection.execute(select(tags.c.name).where(tags.c.name.in_(names))).scalars())
+        rows = [row for row in rows if row['name'] not in existing]
+        if rows:
+            connection.execute(tags.insert(), rows)
+
+def sync_url_tags(connection, tags_by_url):
+    """Replace the url_tags rows of each url_id with the given tag names.
+    
+    Runs set-based: one delete, one insert of unknown tag names, one lookup
+    and one insert, however many URLs are passed.
+    """
+    if not tags_by_url:
+        return
+    tags = Tag.__table__
+    url_tags = URLTag.__table__
+    connection.execute(url_tags.delete().where(url_tags.c.url_id.in_(list(tags_by_url))))
+    
+    names = {name for url_names in tags_by_url.values() for name in url_names}
+    if not names:
+        return
+    _insert_missing_tags(connection, names)
+    tag_ids = dict(connection.execute(select(tags.c.name, tags.c.id).where(tags.c.name.in_(names))).all())
+    connection.execute(url_tags.insert(), [
+        {'url_id': url_id, 'tag_id': tag_ids[name]}
+        for url_id, url_names in tags_by_url.items() for name in url_names
+    ])
+
+@event.listens_for(Session, 'after_flush')
+def _sync_flushed_tags(session, flush_context):
+    # Collected per flush rather than per row, so batch shortening stays set-based
+    tags_by_url = {}
+    for obj in session.new:
+        if isinstance(obj, URL) and obj.tags:
+            tags_by_url[obj.id] = parse_tags(obj.tags)
+    for obj in session.dirty:
+        if isinstance(obj, URL) and inspect(obj).attrs.tags.history.has_changes():
+            tags_by_url[obj.id] = parse_tags(obj.tags)
+    for obj in session.deleted:
+        if isinstance(obj, URL):
+            tags_by_url[obj.id] = []
+    if tags_by_url:
+        sync_url_tags(session.connection(), tags_by_url)
+
+def tag_filter(query, names):
+    """Restrict a URL query to URLs carrying every one of the given tags."""
+    for name in parse_tags(','.join(names)):
+        query = query.filter(URL.id.in_(
+            select(URLTag.url_id).join(Tag, Tag.id == URLTag.tag_id).where(Tag.name == name)
+        ))
+    return query
+
+def tag_facets(user_id=None, team_id=None, limit=50):
+    """Count active URLs per tag for a user or a team, most used first."""
+    query = db.session.query(Tag.name, func.count(URLTag.url_id).label('count')) \
+        .join(URLTag, URLTag.tag_id == Tag.id) \
+        .join(URL, URL.id == URLTag.url_id) \
+        .filter(URL.is_active.is_(True))
+    if user_id is not None:
+        query = query.filter(URL.user_id == user_id)
+    if team_id is not None:
+        query = query.filter(URL.team_id == team_id)
+    rows = query.group_by(Tag.name).order_by(func.count(URLTag.url_id).desc(), Tag.name).limit(limit).all()
+    return [{'tag': name, 'count': count} for name, count in rows]
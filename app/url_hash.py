@@ -0,0 +1,30 @@
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def normalize_long_url(long_url):
+    """Normalize a URL for duplicate detection.
+    
+    Lower-cases the scheme and host, drops default ports and treats an empty
+    path as ``/``. Path, query and fragment are kept as given.
+    """
+    long_url = long_url.strip()
+    try:
+        parts = urlsplit(long_url)
+        port = parts.port
+    except ValueError:
+        return long_url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        host = f'[{host}]'
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{port}'
+    userinfo = parts.netloc.rpartition('@')[0]
+    netloc = f'{userinfo}@{host}' if userinfo else host
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, parts.fragment))
+
+def long_url_hash(long_url):
+    """SHA-256 hex digest of the normalized long URL (64 characters)."""
+    return hashlib.sha256(normalize_long_url(long_url).encode('utf-8')).hexdigest()
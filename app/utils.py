@@ -1,6 +1,16 @@
+import base64
+import json
 import random
 import string
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import String, select, tuple_, type_coerce
+from sqlalchemy.exc import IntegrityError
 from app.models import URL, db
+from app.allocator import get_short_code_allocator
+from app.code_pool import get_short_code_pool
+from app.url_hash import long_url_hash
+from app.search import search_filter
 
 def generate_short_code(length=6):
     """Generate a random short code."""
@@ -8,12 +18,75 @@ def generate_short_code(length=6):
     return ''.join(random.choice(characters) for _ in range(length))
 
 def generate_unique_short_code(length=6):
-    """Generate a unique short code."""
+    """Generate a unique short code.
+    
+    Takes a pre-reserved code from the code pool when one is queued for this
+    length, then tries the block-based allocator, which needs no per-code
+    existence query; otherwise draws random codes until an unused one is found.
+    """
+    pool = get_short_code_pool()
+    if pool is not None:
+        short_code = pool.pop(length)
+        if short_code is not None:
+            return short_code
+    
+    allocator = get_short_code_allocator()
+    if allocator is not None and length == allocator.min_length:
+        return allocator.allocate()
+    
     while True:
         short_code = generate_short_code(length)
         if not URL.query.filter_by(short_code=short_code).first():
             return short_code
 
+def generate_unique_short_codes(count, length=6):
+    """Generate count unique short codes at once.
+    
+    With the block-based allocator this leases a single block for the whole
+    batch; otherwise codes are generated one at a time.
+    """
+    allocator = get_short_code_allocator()
+    if allocator is not None and length == allocator.min_length:
+        return allocator.allocate_many(count)
+    codes = {}
+    while len(codes) < count:
+        codes[generate_unique_short_code(length)] = None
+    return list(codes)
+
+# Attempts at committing new URLs before a short code conflict is reported as an error
+SHORT_CODE_COMMIT_ATTEMPTS = 3
+
+def is_short_code_conflict(error):
+    """Whether an IntegrityError is a unique violation on urls.short_code."""
+    return 'short_code' in str(getattr(error, 'orig', error))
+
+def commit_new_urls(urls, length=6):
+    """Add and commit new URLs, giving fresh codes to any whose code is taken.
+    
+    Allocated codes are checked when they are handed out, but an import with
+    caller-chosen codes can still claim one first. On a unique violation the
+    transaction is rolled back and retried, at most SHORT_CODE_COMMIT_ATTEMPTS times.
+    Returns the committed short codes in the order of urls.
+    """
+    for attempt in range(SHORT_CODE_COMMIT_ATTEMPTS):
+        db.session.add_all(urls)
+        try:
+            db.session.flush()
+            # Read before commit expires the objects, which would cost a query per URL
+            codes = [url.short_code for url in urls]
+            db.session.commit()
+            return codes
+        except IntegrityError as e:
+            db.session.rollback()
+            if not is_short_code_conflict(e) or attempt == SHORT_CODE_COMMIT_ATTEMPTS - 1:
+                raise
+        codes = [url.short_code for url in urls]
+        taken = set(db.session.scalars(select(URL.short_code).where(URL.short_code.in_(codes))))
+        # A conflicting row that is gone again leaves nothing to match; replace every code
+        conflicting = [url for url in urls if url.short_code in taken] or urls
+        for url, short_code in zip(conflicting, generate_unique_short_codes(len(conflicting), length)):
+            url.short_code = short_code
+
 def get_base_url():
     """Get the base URL for the application."""
     from flask import current_app, request
@@ -25,14 +98,38 @@ def create_short_url(short_code):
     """Create a full short URL."""
     return f"{get_base_url()}/{short_code}"
 
-def find_or_create_url(long_url, expires_at=None, user_id=None, team_id=None):
-    """Find existing URL or create new one."""
-    # Check if URL already exists for this user/team combination
-    existing_url = URL.query.filter_by(
-        long_url=long_url,
+def find_existing_url(long_url, user_id=None, team_id=None):
+    """Find a URL with the same normalized long URL for this user/team combination.
+    
+    Looks up the indexed (url_hash, user_id, team_id) columns instead of
+    comparing the long_url text.
+    """
+    return URL.query.filter_by(
+        url_hash=long_url_hash(long_url),
         user_id=user_id,
         team_id=team_id
     ).first()
+
+def find_existing_urls(keys, user_id=None, chunk_size=500):
+    """Map (url_hash, team_id) keys to existing short codes for one user.
+    
+    Runs one indexed IN query per chunk of hashes instead of one query per URL.
+    """
+    hashes = list({url_hash for url_hash, _ in keys})
+    existing = {}
+    for offset in range(0, len(hashes), chunk_size):
+        rows = db.session.query(URL.url_hash, URL.team_id, URL.short_code).filter(
+            URL.user_id == user_id,
+            URL.url_hash.in_(hashes[offset:offset + chunk_size])
+        ).order_by(URL.id)
+        for url_hash, team_id, short_code in rows:
+            existing.setdefault((url_hash, team_id), short_code)
+    return existing
+
+def find_or_create_url(long_url, expires_at=None, user_id=None, team_id=None):
+    """Find existing URL or create new one."""
+    # Check if URL already exists for this user/team combination
+    existing_url = find_existing_url(long_url, user_id, team_id)
     
     if existing_url:
         return existing_url
@@ -72,22 +169,86 @@ def get_team_urls(team_id, page=1, per_page=20):
     )
 
 def search_urls(user_id, search_term, team_id=None, page=1, per_page=20):
-    """Search URLs by title, description, or tags."""
+    """Search URLs by title, description, or tags, best matches first."""
     query = URL.query.filter_by(user_id=user_id, is_active=True)
     
     if team_id:
         query = query.filter_by(team_id=team_id)
     
     if search_term:
-        search_filter = f"%{search_term}%"
-        query = query.filter(
-            db.or_(
-                URL.title.ilike(search_filter),
-                URL.description.ilike(search_filter),
-                URL.tags.ilike(search_filter)
-            )
-        )
+        query = search_filter(query, search_term, ranked=True)
     
     return query.order_by(URL.created_at.desc()).paginate(
         page=page, per_page=per_page, error_out=False
     )
+
+KeysetPage = namedtuple('KeysetPage', ['items', 'next_cursor', 'prev_cursor'])
+
+def _created_at_key():
+    """URL.created_at as compared by keyset pagination.
+    
+    SQLite keeps datetimes as text, and rows stamped with CURRENT_TIMESTAMP
+    lack the microseconds SQLAlchemy adds to bound values, so on SQLite the
+    stored text itself is carried in cursors and compared.
+    """
+    if db.engine.dialect.name == 'sqlite':
+        return type_coerce(URL.created_at, String)
+    return URL.created_at
+
+def encode_cursor(direction, created_at, url_id):
+    """Encode an opaque cursor pointing just past (created_at, url_id)."""
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = json.dumps([direction, created_at, url_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor into (direction, created_at, url_id); raise ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, created_at, url_id = json.loads(raw)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+    if direction not in ('next', 'prev') or not isinstance(created_at, str) or \
+            not isinstance(url_id, int) or isinstance(url_id, bool):
+        raise ValueError('Invalid cursor')
+    return direction, created_at, url_id
+
+def keyset_paginate(query, per_page, cursor=None):
+    """Page a URL query newest first, keyed on (created_at, id) instead of OFFSET.
+    
+    Every page is one indexed range scan of per_page + 1 rows, however deep it
+    is, and no COUNT(*) is run. Returns a KeysetPage whose cursors are None at
+    either end of the list.
+    """
+    key = _created_at_key()
+    position = tuple_(key, URL.id)
+    direction = 'next'
+    if cursor:
+        direction, created_at, url_id = decode_cursor(cursor)
+        if not isinstance(key.type, String):
+            try:
+                created_at = datetime.fromisoformat(created_at)
+            except ValueError:
+                raise ValueError('Invalid cursor')
+        bound = tuple_(type_coerce(created_at, key.type), url_id)
+        query = query.filter(position < bound if direction == 'next' else position > bound)
+    
+    if direction == 'next':
+        query = query.order_by(key.desc(), URL.id.desc())
+    else:
+        query = query.order_by(key.asc(), URL.id.asc())
+    rows = query.add_columns(key).limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'prev':
+        rows.reverse()
+    
+    next_cursor = prev_cursor = None
+    if rows:
+        first, last = rows[0], rows[-1]
+        if more or direction == 'prev':
+            next_cursor = encode_cursor('next', last[1], last[0].id)
+        if (direction == 'next' and cursor) or (direction == 'prev' and more):
+            prev_cursor = encode_cursor('prev', first[1], first[0].id)
+    return KeysetPage([row[0] for row in rows], next_cursor, prev_cursor)
@@ -0,0 +1,4 @@
+from app.asgi import create_asgi_app
+
+# Serve with an ASGI server, e.g. `uvicorn asgi:application --workers 4`
+application = create_asgi_app('development')
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Compare redirect throughput and latency of the ASGI serving mode and the WSGI app.
+
+Both are driven in-process at the same concurrency: the WSGI app from a pool of
+threads (one request per thread, like a threaded worker), the ASGI app from
+asyncio tasks on a single event loop. A file-backed SQLite database is used so
+cache misses pay a real query:
+    
+    python benchmarks/asgi_vs_wsgi.py --requests 20000 --concurrency 64
+    python benchmarks/asgi_vs_wsgi.py --no-cache
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.test import EnvironBuilder
+from app import create_app, db
+from app.asgi import RedirectASGIApp
+from app.models import URL
+from config import config
+
+CODES = 500
+
+def summarize(name, latencies, elapsed):
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:5} {len(latencies) / elapsed:10.0f} req/s   "
+          f"p50 {statistics.median(latencies) * 1000:7.2f} ms   p99 {p99 * 1000:7.2f} ms")
+
+def run_wsgi(app, requests, concurrency):
+    environs = [EnvironBuilder(path=f'/bench{i}', method='GET').get_environ() for i in range(CODES)]
+    
+    def start_response(status, headers, exc_info=None):
+        assert status.startswith('302'), status
+    
+    def one(i):
+        started = time.perf_counter()
+        for _chunk in app.wsgi_app(environs[i % CODES].copy(), start_response):
+            pass
+        return time.perf_counter() - started
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(requests)))
+    return latencies, time.perf_counter() - started
+
+def run_asgi(app, requests, concurrency):
+    asgi_app = RedirectASGIApp(app, max_threads=app.config['ASGI_DB_THREADS'])
+    
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+    
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            assert message['status'] == 302, message['status']
+    
+    async def worker(indexes, latencies):
+        for i in indexes:
+            scope = {'type': 'http', 'method': 'GET', 'path': f'/bench{i % CODES}', 'headers': []}
+            started = time.perf_counter()
+            await asgi_app(scope, receive, send)
+            latencies.append(time.perf_counter() - started)
+    
+    async def main():
+        latencies = []
+        await asyncio.gather(*(
+            worker(range(n, requests, concurrency), latencies) for n in range(concurrency)
+        ))
+        return latencies
+    
+    started = time.perf_counter()
+    latencies = asyncio.run(main())
+    elapsed = time.perf_counter() - started
+    asgi_app.executor.shutdown()
+    return latencies, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--no-cache', action='store_true', help='disable the redirect cache')
+    args = parser.parse_args()
+    
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    config['production'].SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+    config['production'].RATE_LIMIT_ENABLED = False  # every request comes from one address
+    
+    app = create_app('production')
+    app.config['CLICK_FLUSH_INTERVAL'] = 0
+    app.extensions['click_aggregator'].flush_interval = 0
+    app.extensions['click_aggregator'].max_pending = args.requests * 4
+    if args.no_cache:
+        app.extensions.pop('redirect_cache', None)
+    
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(
+            URL(long_url=f'https://www.example.com/landing/{i}', short_code=f'bench{i}')
+            for i in range(CODES)
+        )
+        db.session.commit()
+        app.extensions['short_code_filter'].build()
+    
+    try:
+        # Warm up (cache, filter, SQLAlchemy compiled statements)
+        run_wsgi(app, CODES, args.concurrency)
+        print(f"requests: {args.requests}, concurrency: {args.concurrency}, "
+              f"redirect cache {'off' if args.no_cache else 'on'}")
+        summarize('wsgi', *run_wsgi(app, args.requests, args.concurrency))
+        summarize('asgi', *run_asgi(app, args.requests, args.concurrency))
+    finally:
+        app.extensions['click_aggregator'].flush()
+        os.remove(path)
+
+if __name__ == '__main__':
+    main()
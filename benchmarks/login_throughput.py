@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Measure login throughput with bcrypt run inline and on the hashing process pool.
+
+Logins are driven in-process from a pool of threads against a file-backed SQLite
+database, once per pool size, and reported per CPU core in use:
+    
+    python benchmarks/login_throughput.py --logins 400 --concurrency 16
+    python benchmarks/login_throughput.py --rounds 10 --pool-sizes 0,1,2,4
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import User
+from app.passwords import PasswordHasher
+from config import config
+
+USERS = 50
+
+def run(app, logins, concurrency):
+    client = app.test_client()
+    
+    def one(i):
+        started = time.perf_counter()
+        response = client.post('/api/v1/auth/login', json={
+            'username': f'bench{i % USERS}', 'password': 'password123'
+        })
+        assert response.status_code == 200, response.status_code
+        return time.perf_counter() - started
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(logins)))
+    return latencies, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--logins', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=12, help='bcrypt cost (BCRYPT_LOG_ROUNDS)')
+    parser.add_argument('--pool-sizes', default=f'0,{os.cpu_count() or 1}',
+                        help='comma-separated BCRYPT_POOL_SIZE values; 0 hashes inline')
+    args = parser.parse_args()
+    
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    config['production'].SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+    config['production'].RATE_LIMIT_ENABLED = False  # every request comes from one address
+    
+    app = create_app('production')
+    app.extensions['click_aggregator'].flush_interval = 0
+    setup = PasswordHasher(rounds=args.rounds)
+    with app.app_context():
+        db.create_all()
+        password_hash = setup.hash('password123')
+        db.session.add_all(
+            User(username=f'bench{i}', email=f'bench{i}@example.com', password_hash=password_hash)
+            for i in range(USERS)
+        )
+        db.session.commit()
+    
+    print(f"logins: {args.logins}, concurrency: {args.concurrency}, bcrypt cost: {args.rounds}, "
+          f"cpus: {os.cpu_count()}")
+    try:
+        for pool_size in (int(size) for size in args.pool_sizes.split(',')):
+            hasher = PasswordHasher(rounds=args.rounds, pool_size=pool_size)
+            app.extensions['password_hasher'] = hasher
+            try:
+                # Start the pool's processes before timing
+                run(app, max(pool_size, 1), max(pool_size, 1))
+                latencies, elapsed = run(app, args.logins, args.concurrency)
+            finally:
+                hasher.shutdown()
+            cores = min(max(pool_size, 1), os.cpu_count() or 1)
+            latencies.sort()
+            p99 = latencies[int(len(latencies) * 0.99) - 1]
+            label = f'pool={pool_size}' if pool_size else 'inline'
+            print(f"{label:8} {args.logins / elapsed:8.1f} logins/s   {args.logins / elapsed / cores:7.1f} per core   "
+                  f"p50 {statistics.median(latencies) * 1000:7.1f} ms   p99 {p99 * 1000:7.1f} ms")
+    finally:
+        os.remove(path)
+
+if __name__ == '__main__':
+    main()
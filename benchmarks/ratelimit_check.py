@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Benchmark the cost of one token-bucket check against the shared table.
+
+Runs in-process against a temporary bucket file, the same one every worker on
+a node maps, so the numbers are the per-request overhead of rate limiting:
+
+    python benchmarks/ratelimit_check.py --checks 200000 --keys 10000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ratelimit import Rate, RateLimiter, TokenBucketTable
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--checks', type=int, default=200000)
+    parser.add_argument('--keys', type=int, default=10000, help='distinct client addresses')
+    parser.add_argument('--slots', type=int, default=65536)
+    args = parser.parse_args()
+    
+    fd, path = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    table = TokenBucketTable(path, num_slots=args.slots)
+    limiter = RateLimiter(table, {'redirect': Rate.parse('600/minute')})
+    addresses = [f'10.{index // 65536}.{index // 256 % 256}.{index % 256}' for index in range(args.keys)]
+    
+    try:
+        for address in addresses:
+            limiter.check('redirect', 'ip', address)
+        
+        started = time.perf_counter()
+        for index in range(args.checks):
+            limiter.check('redirect', 'ip', addresses[index % args.keys])
+        elapsed = time.perf_counter() - started
+    finally:
+        table.close()
+        os.remove(path)
+    
+    print(f"checks: {args.checks} over {args.keys} keys ({args.slots} slots)")
+    print(f"per check: {elapsed / args.checks * 1e6:8.2f} us")
+    print(f"denied:    {limiter.denied}")
+
+if __name__ == '__main__':
+    main()
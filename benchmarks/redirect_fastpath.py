@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark the root-level redirect fast path against the blueprint route.
+
+Calls the WSGI app in-process (no network, no server) so the numbers reflect
+only the per-request cost of each path:
+
+    python benchmarks/redirect_fastpath.py --requests 20000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.test import EnvironBuilder
+from app import create_app, db
+from app.models import URL
+
+def run(wsgi_app, path, requests):
+    """Issue requests GETs for path and return requests per second."""
+    environ = EnvironBuilder(path=path, method='GET').get_environ()
+    
+    def start_response(status, headers, exc_info=None):
+        assert status.startswith('302'), status
+    
+    started = time.perf_counter()
+    for _ in range(requests):
+        for _chunk in wsgi_app(environ.copy(), start_response):
+            pass
+    return requests / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--no-cache', action='store_true', help='disable the redirect cache')
+    args = parser.parse_args()
+    
+    app = create_app('testing')
+    app.extensions['click_aggregator'].max_pending = args.requests * 4
+    if args.no_cache:
+        app.extensions.pop('redirect_cache', None)
+    
+    with app.app_context():
+        db.create_all()
+        db.session.add(URL(long_url='https://www.example.com/landing', short_code='bench1'))
+        db.session.commit()
+    
+    # Warm up both paths (cache, filter, SQLAlchemy compiled statements)
+    run(app.wsgi_app, '/api/v1/bench1', 200)
+    run(app.wsgi_app, '/bench1', 200)
+    
+    blueprint = run(app.wsgi_app, '/api/v1/bench1', args.requests)
+    fast_path = run(app.wsgi_app, '/bench1', args.requests)
+    
+    print(f"requests per path: {args.requests} (redirect cache {'off' if args.no_cache else 'on'})")
+    print(f"blueprint  /api/v1/<code>: {blueprint:10.0f} req/s")
+    print(f"fast path  /<code>:        {fast_path:10.0f} req/s")
+    print(f"speedup:                   {fast_path / blueprint:10.2f}x")
+
+if __name__ == '__main__':
+    main()
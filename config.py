@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,9 +14,115 @@ class Config:
         'pool_recycle': 300,
     }
 
+    # JWTs carry is_active, is_admin and team roles; a per-user token_version revokes them
+    JWT_ACCESS_TOKEN_EXPIRES = int(os.environ.get('JWT_ACCESS_TOKEN_EXPIRES', 3600))
+    JWT_STATELESS_CLAIMS = os.environ.get('JWT_STATELESS_CLAIMS', 'true').lower() == 'true'
+    JWT_REVOCATION_REFRESH_INTERVAL = float(os.environ.get('JWT_REVOCATION_REFRESH_INTERVAL', 5.0))
+
+    # In-process redirect cache (short_code -> long_url, expires_at, is_active)
+    REDIRECT_CACHE_ENABLED = os.environ.get('REDIRECT_CACHE_ENABLED', 'true').lower() == 'true'
+    REDIRECT_CACHE_MAX_ENTRIES = int(os.environ.get('REDIRECT_CACHE_MAX_ENTRIES', 10000))
+    REDIRECT_CACHE_MAX_BYTES = int(os.environ.get('REDIRECT_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    REDIRECT_CACHE_TTL = int(os.environ.get('REDIRECT_CACHE_TTL', 300))
+    # Seconds between polls for URLs edited by other workers (0 = rely on the TTL)
+    REDIRECT_CACHE_SYNC_INTERVAL = float(os.environ.get('REDIRECT_CACHE_SYNC_INTERVAL', 5.0))
+    REDIRECT_CACHE_WARMUP_ENABLED = os.environ.get('REDIRECT_CACHE_WARMUP_ENABLED', 'false').lower() == 'true'
+    REDIRECT_CACHE_WARMUP_SIZE = int(os.environ.get('REDIRECT_CACHE_WARMUP_SIZE', 1000))
+    REDIRECT_CACHE_WARMUP_STRATEGY = os.environ.get('REDIRECT_CACHE_WARMUP_STRATEGY', 'clicks')  # clicks | recent
+    REDIRECT_CACHE_WARMUP_WINDOW_HOURS = int(os.environ.get('REDIRECT_CACHE_WARMUP_WINDOW_HOURS', 24))
+    REDIRECT_CACHE_WARMUP_BUDGET = float(os.environ.get('REDIRECT_CACHE_WARMUP_BUDGET', 2.0))
+
+    # Cache of user rows used to resolve JWTs (invalidated on change in this process)
+    USER_CACHE_ENABLED = os.environ.get('USER_CACHE_ENABLED', 'true').lower() == 'true'
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 30))
+    USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 10000))
+
+    # Cache of team roles per (user, team), including non-membership
+    TEAM_ROLE_CACHE_ENABLED = os.environ.get('TEAM_ROLE_CACHE_ENABLED', 'true').lower() == 'true'
+    TEAM_ROLE_CACHE_TTL = int(os.environ.get('TEAM_ROLE_CACHE_TTL', 10))
+    TEAM_ROLE_CACHE_MAX_ENTRIES = int(os.environ.get('TEAM_ROLE_CACHE_MAX_ENTRIES', 10000))
+
+    # Counts of searched or tag-filtered URL listings reused by count=estimate
+    LISTING_COUNT_CACHE_ENABLED = os.environ.get('LISTING_COUNT_CACHE_ENABLED', 'true').lower() == 'true'
+    LISTING_COUNT_CACHE_TTL = int(os.environ.get('LISTING_COUNT_CACHE_TTL', 30))
+    LISTING_COUNT_CACHE_MAX_ENTRIES = int(os.environ.get('LISTING_COUNT_CACHE_MAX_ENTRIES', 10000))
+
+    # bcrypt work factor and the process pool that runs it (0 processes = run inline).
+    # Each gunicorn worker starts its own pool, so by default the node's cores are
+    # split between GUNICORN_WORKERS workers instead of given to each of them
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    BCRYPT_POOL_SIZE = int(os.environ.get('BCRYPT_POOL_SIZE', max(
+        1, (os.cpu_count() or 1) // int(os.environ.get('GUNICORN_WORKERS', 4))
+    )))
+    BCRYPT_POOL_MAX_PENDING = int(os.environ.get('BCRYPT_POOL_MAX_PENDING', 0)) or None
+
+    # API keys: digest secret (defaults to SECRET_KEY) and seconds between last-used writes
+    API_KEY_SECRET = os.environ.get('API_KEY_SECRET')
+    API_KEY_LAST_USED_INTERVAL = float(os.environ.get('API_KEY_LAST_USED_INTERVAL', 60.0))
+
+    # Buffered click counting (flushed as batched UPDATEs per worker)
+    CLICK_BUFFER_ENABLED = os.environ.get('CLICK_BUFFER_ENABLED', 'true').lower() == 'true'
+    CLICK_FLUSH_INTERVAL = float(os.environ.get('CLICK_FLUSH_INTERVAL', 5.0))
+    CLICK_FLUSH_MAX_PENDING = int(os.environ.get('CLICK_FLUSH_MAX_PENDING', 1000))
+    CLICK_EVENTS_ENABLED = os.environ.get('CLICK_EVENTS_ENABLED', 'true').lower() == 'true'
+    CLICK_BUFFER_MAX_EVENTS = int(os.environ.get('CLICK_BUFFER_MAX_EVENTS', 100000))  # kept while flushes fail
+    TIMESERIES_MAX_BUCKETS = int(os.environ.get('TIMESERIES_MAX_BUCKETS', 5000))
+
+    # Bloom filter of existing short codes (rejects unknown codes without a query)
+    BLOOM_FILTER_ENABLED = os.environ.get('BLOOM_FILTER_ENABLED', 'true').lower() == 'true'
+    BLOOM_FILTER_CAPACITY = int(os.environ.get('BLOOM_FILTER_CAPACITY', 1000000))
+    BLOOM_FILTER_ERROR_RATE = float(os.environ.get('BLOOM_FILTER_ERROR_RATE', 0.001))
+    BLOOM_FILTER_REFRESH_INTERVAL = float(os.environ.get('BLOOM_FILTER_REFRESH_INTERVAL', 1.0))
+    BLOOM_FILTER_BUILD_ON_STARTUP = os.environ.get('BLOOM_FILTER_BUILD_ON_STARTUP', 'true').lower() == 'true'
+
+    # Short code allocation: 'sequence' leases id blocks per worker, 'random' retries random codes
+    SHORT_CODE_ALLOCATOR = os.environ.get('SHORT_CODE_ALLOCATOR', 'sequence')
+    SHORT_CODE_BLOCK_SIZE = int(os.environ.get('SHORT_CODE_BLOCK_SIZE', 100))
+    SHORT_CODE_MIN_LENGTH = int(os.environ.get('SHORT_CODE_MIN_LENGTH', 6))
+    SHORT_CODE_SCRAMBLE_KEY = os.environ.get('SHORT_CODE_SCRAMBLE_KEY') or SECRET_KEY
+    SHORT_CODE_POOL_ENABLED = os.environ.get('SHORT_CODE_POOL_ENABLED', 'false').lower() == 'true'
+    SHORT_CODE_POOL_LENGTHS = os.environ.get('SHORT_CODE_POOL_LENGTHS', '6')  # comma-separated
+    SHORT_CODE_POOL_SIZE = int(os.environ.get('SHORT_CODE_POOL_SIZE', 1000))
+    SHORT_CODE_POOL_LOW_WATER = int(os.environ.get('SHORT_CODE_POOL_LOW_WATER', 500))
+    SHORT_CODE_POOL_BATCH_SIZE = int(os.environ.get('SHORT_CODE_POOL_BATCH_SIZE', 500))
+    SHORT_CODE_POOL_REFILL_INTERVAL = float(os.environ.get('SHORT_CODE_POOL_REFILL_INTERVAL', 1.0))
+    # Reservations a worker has not renewed for this long are reclaimed (it has exited)
+    SHORT_CODE_POOL_RESERVATION_TIMEOUT = float(os.environ.get('SHORT_CODE_POOL_RESERVATION_TIMEOUT', 3600.0))
+
+    # POST /api/v1/shorten/batch
+    SHORTEN_BATCH_MAX_ITEMS = int(os.environ.get('SHORTEN_BATCH_MAX_ITEMS', 10000))
+
+    # Token buckets per IP, user and API key, in a memory-mapped file shared by the node's workers
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_REDIRECT = os.environ.get('RATE_LIMIT_REDIRECT', '600/minute')  # per IP
+    RATE_LIMIT_SHORTEN = os.environ.get('RATE_LIMIT_SHORTEN', '120/minute')  # per API key or user
+    RATE_LIMIT_SHORTEN_BATCH = os.environ.get('RATE_LIMIT_SHORTEN_BATCH', '10000/minute')  # URLs per API key or user
+    RATE_LIMIT_LOGIN = os.environ.get('RATE_LIMIT_LOGIN', '10/minute')  # per (IP, username)
+    RATE_LIMIT_LOGIN_IP = os.environ.get('RATE_LIMIT_LOGIN_IP', '30/minute')  # per IP, across usernames
+    RATE_LIMIT_STORAGE_PATH = os.environ.get('RATE_LIMIT_STORAGE_PATH') or \
+        os.path.join(tempfile.gettempdir(), 'url_shortener_ratelimit.bin')
+    RATE_LIMIT_SLOTS = int(os.environ.get('RATE_LIMIT_SLOTS', 65536))
+
+    # Root-level /<code> redirects served by a WSGI middleware ahead of Flask
+    REDIRECT_FASTPATH_ENABLED = os.environ.get('REDIRECT_FASTPATH_ENABLED', 'true').lower() == 'true'
+
+    # Shared memory-mapped redirect table (run `flask redirect-table-writer` once per node)
+    SHARED_REDIRECT_TABLE_ENABLED = os.environ.get('SHARED_REDIRECT_TABLE_ENABLED', 'false').lower() == 'true'
+    SHARED_REDIRECT_TABLE_PATH = os.environ.get('SHARED_REDIRECT_TABLE_PATH') or \
+        os.path.join(tempfile.gettempdir(), 'url_shortener_redirects.tbl')
+    SHARED_REDIRECT_TABLE_SOCKET = os.environ.get('SHARED_REDIRECT_TABLE_SOCKET') or \
+        os.path.join(tempfile.gettempdir(), 'url_shortener_redirects.sock')
+    SHARED_REDIRECT_TABLE_SLOTS = int(os.environ.get('SHARED_REDIRECT_TABLE_SLOTS', 65536))
+    SHARED_REDIRECT_TABLE_SLOT_SIZE = int(os.environ.get('SHARED_REDIRECT_TABLE_SLOT_SIZE', 512))
+    SHARED_REDIRECT_TABLE_STALE_AFTER = float(os.environ.get('SHARED_REDIRECT_TABLE_STALE_AFTER', 5.0))
+
+    # ASGI serving mode (`uvicorn asgi:application`): threads for database lookups and Flask requests
+    ASGI_DB_THREADS = int(os.environ.get('ASGI_DB_THREADS', 32))
+
 class DevelopmentConfig(Config):
     """Development configuration."""
     DEBUG = True
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 10))
 
 class ProductionConfig(Config):
     """Production configuration."""
@@ -25,6 +132,16 @@ class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    CLICK_FLUSH_INTERVAL = 0  # flush explicitly, no background thread
+    BLOOM_FILTER_CAPACITY = 10000
+    BLOOM_FILTER_BUILD_ON_STARTUP = False
+    SHORT_CODE_POOL_SIZE = 20
+    SHORT_CODE_POOL_LOW_WATER = 10
+    SHORT_CODE_POOL_REFILL_INTERVAL = 0  # refill inline, no background thread
+    BCRYPT_LOG_ROUNDS = 4
+    BCRYPT_POOL_SIZE = 0  # hash inline, no worker processes
+    API_KEY_LAST_USED_INTERVAL = 0  # write last-used times on every request
+    RATE_LIMIT_ENABLED = False
 
 config = {
     'development': DevelopmentConfig,
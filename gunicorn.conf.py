@@ -0,0 +1,16 @@
+"""Gunicorn settings for the URL shortener.
+
+Run with: gunicorn -c gunicorn.conf.py app:app
+"""
+
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+
+def worker_exit(server, worker):
+    """Write buffered click counts and API key last-used times before the worker goes away."""
+    from app.clicks import flush_all_click_buffers
+    from app.api_keys import flush_all_api_key_usage
+    flush_all_click_buffers()
+    flush_all_api_key_usage()
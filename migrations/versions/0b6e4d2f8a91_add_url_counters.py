@@ -0,0 +1,48 @@
+"""Add url_counters with active URLs per (user, team), backfilled from urls
+
+Revision ID: 0b6e4d2f8a91
+Revises: f4c2a9e7b130
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b6e4d2f8a91'
+down_revision = 'f4c2a9e7b130'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if 'url_counters' in sa.inspect(bind).get_table_names():
+        return
+    op.create_table(
+        'url_counters',
+        sa.Column('user_id', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('team_id', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('active_urls', sa.Integer(), nullable=False)
+    )
+    op.create_index('ix_url_counters_team', 'url_counters', ['team_id'])
+
+    # One aggregate pass; 0 stands for "no user" / "no team"
+    urls = sa.table('urls', sa.column('user_id', sa.Integer), sa.column('team_id', sa.Integer),
+                    sa.column('is_active', sa.Boolean))
+    counters = sa.table('url_counters', sa.column('user_id', sa.Integer), sa.column('team_id', sa.Integer),
+                        sa.column('active_urls', sa.Integer))
+    user_id = sa.func.coalesce(urls.c.user_id, 0)
+    team_id = sa.func.coalesce(urls.c.team_id, 0)
+    bind.execute(counters.insert().from_select(
+        ['user_id', 'team_id', 'active_urls'],
+        sa.select(user_id, team_id, sa.func.count())
+        .where(sa.or_(urls.c.is_active.is_(None), urls.c.is_active == sa.true()))
+        .group_by(user_id, team_id)
+    ))
+
+
+def downgrade():
+    op.drop_index('ix_url_counters_team', table_name='url_counters')
+    op.drop_table('url_counters')
@@ -0,0 +1,144 @@
+"""Baseline schema: every table not added by a later revision
+
+Databases created with db.create_all() already have these tables; they are
+skipped, so `flask db upgrade` can be run on such a database as well as on
+an empty one.
+
+Revision ID: 3e5d1f7a9c20
+Revises: 
+Create Date: 2026-10-17 08:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e5d1f7a9c20'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# In creation order (foreign keys point backwards); dropped in reverse
+TABLES = (
+    'users', 'teams', 'team_members', 'urls', 'clicks', 'click_rollups_hourly',
+    'click_rollups_daily', 'id_allocators', 'reserved_short_codes', 'import_checkpoints', 'api_keys'
+)
+
+
+def _table_columns(name):
+    if name == 'users':
+        return (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('username', sa.String(length=80), nullable=False, unique=True),
+            sa.Column('email', sa.String(length=120), nullable=False, unique=True),
+            sa.Column('password_hash', sa.String(length=255), nullable=False),
+            sa.Column('is_active', sa.Boolean()),
+            sa.Column('is_admin', sa.Boolean()),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime())
+        )
+    if name == 'teams':
+        return (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('description', sa.Text()),
+            sa.Column('is_active', sa.Boolean()),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime())
+        )
+    if name == 'team_members':
+        return (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('team_id', sa.Integer(), sa.ForeignKey('teams.id'), nullable=False),
+            sa.Column('role', sa.String(length=20)),
+            sa.Column('joined_at', sa.DateTime()),
+            sa.UniqueConstraint('user_id', 'team_id', name='unique_user_team')
+        )
+    if name == 'urls':
+        return (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('long_url', sa.Text(), nullable=False),
+            sa.Column('short_code', sa.String(length=10), nullable=False, unique=True),
+            sa.Column('click_count', sa.Integer()),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('expires_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime()),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+            sa.Column('team_id', sa.Integer(), sa.ForeignKey('teams.id'), nullable=True),
+            sa.Column('title', sa.String(length=200)),
+            sa.Column('description', sa.Text()),
+            sa.Column('tags', sa.Text()),
+            sa.Column('is_active', sa.Boolean())
+        )
+    if name == 'clicks':
+        return (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('url_id', sa.Integer(), sa.ForeignKey('urls.id'), nullable=False),
+            sa.Column('short_code', sa.String(length=10), nullable=False),
+            sa.Column('clicked_at', sa.DateTime(), nullable=False),
+            sa.Column('referrer', sa.String(length=500)),
+            sa.Column('user_agent_hash', sa.String(length=64)),
+            sa.Index('ix_clicks_url_id_clicked_at', 'url_id', 'clicked_at')
+        )
+    if name in ('click_rollups_hourly', 'click_rollups_daily'):
+        return (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('url_id', sa.Integer(), sa.ForeignKey('urls.id'), nullable=False),
+            sa.Column('bucket_start', sa.DateTime(), nullable=False),
+            sa.Column('clicks', sa.Integer(), nullable=False),
+            sa.UniqueConstraint('url_id', 'bucket_start',
+                                name='unique_url_hour' if name.endswith('hourly') else 'unique_url_day')
+        )
+    if name == 'id_allocators':
+        return (
+            sa.Column('name', sa.String(length=50), primary_key=True),
+            sa.Column('next_value', sa.BigInteger(), nullable=False),
+            sa.Column('updated_at', sa.DateTime())
+        )
+    if name == 'reserved_short_codes':
+        return (
+            sa.Column('short_code', sa.String(length=20), primary_key=True),
+            sa.Column('length', sa.Integer(), nullable=False),
+            sa.Column('reserved_by', sa.String(length=64), nullable=False),
+            sa.Column('reserved_at', sa.DateTime())
+        )
+    if name == 'import_checkpoints':
+        return (
+            sa.Column('name', sa.String(length=255), primary_key=True),
+            sa.Column('source', sa.Text(), nullable=False),
+            sa.Column('offset', sa.BigInteger(), nullable=False),
+            sa.Column('rows_read', sa.Integer(), nullable=False),
+            sa.Column('imported', sa.Integer(), nullable=False),
+            sa.Column('rejected', sa.Integer(), nullable=False),
+            sa.Column('completed', sa.Boolean()),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime())
+        )
+    if name == 'api_keys':
+        return (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False, index=True),
+            sa.Column('team_id', sa.Integer(), sa.ForeignKey('teams.id'), nullable=True),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('prefix', sa.String(length=16), nullable=False),
+            sa.Column('key_digest', sa.String(length=64), nullable=False, unique=True),
+            sa.Column('scopes', sa.String(length=255), nullable=False),
+            sa.Column('is_active', sa.Boolean()),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('last_used_at', sa.DateTime(), nullable=True)
+        )
+    raise ValueError(name)
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    for name in TABLES:
+        if name not in existing:
+            op.create_table(name, *_table_columns(name))
+
+
+def downgrade():
+    for name in reversed(TABLES):
+        op.drop_table(name)
@@ -0,0 +1,57 @@
+"""Add url_hash to urls for indexed duplicate detection
+
+Revision ID: a1c4e9f2b7d3
+Revises: 3e5d1f7a9c20
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.url_hash import long_url_hash
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c4e9f2b7d3'
+down_revision = '3e5d1f7a9c20'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = {column['name'] for column in inspector.get_columns('urls')}
+    indexes = {index['name'] for index in inspector.get_indexes('urls')}
+
+    if 'url_hash' not in columns:
+        with op.batch_alter_table('urls') as batch_op:
+            batch_op.add_column(sa.Column('url_hash', sa.String(length=64), nullable=True))
+    if 'ix_urls_hash_user_team' not in indexes:
+        op.create_index('ix_urls_hash_user_team', 'urls', ['url_hash', 'user_id', 'team_id'])
+
+    # Backfill in id order so a large table is never loaded at once
+    urls = sa.table('urls', sa.column('id', sa.Integer), sa.column('long_url', sa.Text),
+                    sa.column('url_hash', sa.String))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(urls.c.id, urls.c.long_url)
+            .where(urls.c.id > last_id, urls.c.url_hash.is_(None))
+            .order_by(urls.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            urls.update().where(urls.c.id == sa.bindparam('b_id')).values(url_hash=sa.bindparam('b_hash')),
+            [{'b_id': row.id, 'b_hash': long_url_hash(row.long_url)} for row in rows]
+        )
+        last_id = rows[-1].id
+
+
+def downgrade():
+    op.drop_index('ix_urls_hash_user_team', table_name='urls')
+    with op.batch_alter_table('urls') as batch_op:
+        batch_op.drop_column('url_hash')
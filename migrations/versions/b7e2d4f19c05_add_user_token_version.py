@@ -0,0 +1,31 @@
+"""Add token_version and tokens_revoked_at to users for JWT claim revocation
+
+Revision ID: b7e2d4f19c05
+Revises: a1c4e9f2b7d3
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d4f19c05'
+down_revision = 'a1c4e9f2b7d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('users')}
+    with op.batch_alter_table('users') as batch_op:
+        if 'token_version' not in columns:
+            batch_op.add_column(sa.Column('token_version', sa.Integer(), nullable=False, server_default='1'))
+        if 'tokens_revoked_at' not in columns:
+            batch_op.add_column(sa.Column('tokens_revoked_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('tokens_revoked_at')
+        batch_op.drop_column('token_version')
@@ -0,0 +1,26 @@
+"""Add (user_id, created_at, id) index on urls for keyset pagination
+
+Revision ID: c5f1a8d3e6b2
+Revises: b7e2d4f19c05
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f1a8d3e6b2'
+down_revision = 'b7e2d4f19c05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('urls')}
+    if 'ix_urls_user_created' not in indexes:
+        op.create_index('ix_urls_user_created', 'urls', ['user_id', 'created_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_urls_user_created', table_name='urls')
@@ -0,0 +1,44 @@
+"""Add full-text search over url title, description and tags
+
+FTS5 table and sync triggers on SQLite, generated tsvector column with a GIN
+index on PostgreSQL. Other databases keep substring search.
+
+Revision ID: d2a7c6e94f18
+Revises: c5f1a8d3e6b2
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+from app.search import SQLITE_DDL, POSTGRESQL_DDL
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a7c6e94f18'
+down_revision = 'c5f1a8d3e6b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        if bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar() != 1:
+            return
+        statements = SQLITE_DDL  # ends with a rebuild that indexes existing rows
+    elif bind.dialect.name == 'postgresql':
+        statements = POSTGRESQL_DDL
+    else:
+        return
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for trigger in ('urls_fts_insert', 'urls_fts_delete', 'urls_fts_update'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS urls_fts')
+    elif bind.dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_urls_search_vector')
+        op.execute('ALTER TABLE urls DROP COLUMN IF EXISTS search_vector')
@@ -0,0 +1,60 @@
+"""Add tags and url_tags, backfilled from the comma-separated urls.tags
+
+Revision ID: e8b3f0a1c7d4
+Revises: d2a7c6e94f18
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.tags import parse_tags, sync_url_tags
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b3f0a1c7d4'
+down_revision = 'd2a7c6e94f18'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+
+    if 'tags' not in tables:
+        op.create_table(
+            'tags',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.UniqueConstraint('name')
+        )
+    if 'url_tags' not in tables:
+        op.create_table(
+            'url_tags',
+            sa.Column('url_id', sa.Integer(), sa.ForeignKey('urls.id'), primary_key=True),
+            sa.Column('tag_id', sa.Integer(), sa.ForeignKey('tags.id'), primary_key=True)
+        )
+        op.create_index('ix_url_tags_tag_url', 'url_tags', ['tag_id', 'url_id'])
+
+    # Backfill in id order so a large table is never loaded at once
+    urls = sa.table('urls', sa.column('id', sa.Integer), sa.column('tags', sa.Text))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(urls.c.id, urls.c.tags)
+            .where(urls.c.id > last_id, urls.c.tags.isnot(None), urls.c.tags != '')
+            .order_by(urls.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        sync_url_tags(bind, {row.id: parse_tags(row.tags) for row in rows})
+        last_id = rows[-1].id
+
+
+def downgrade():
+    op.drop_index('ix_url_tags_tag_url', table_name='url_tags')
+    op.drop_table('url_tags')
+    op.drop_table('tags')
@@ -0,0 +1,48 @@
+"""Add composite indexes for listing, team analytics and re-sync queries
+
+Partial (WHERE is_active) on PostgreSQL. Replaces ix_urls_user_created with
+an index that also covers the is_active filter of every listing.
+
+Revision ID: f4c2a9e7b130
+Revises: e8b3f0a1c7d4
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4c2a9e7b130'
+down_revision = 'e8b3f0a1c7d4'
+branch_labels = None
+depends_on = None
+
+# name -> (table, columns, partial on is_active)
+INDEXES = {
+    'ix_urls_user_active_created': ('urls', ['user_id', 'is_active', 'created_at', 'id'], True),
+    'ix_urls_team_active_clicks': ('urls', ['team_id', 'is_active', 'click_count'], True),
+    'ix_urls_updated_at': ('urls', ['updated_at'], False),
+    'ix_team_members_team': ('team_members', ['team_id'], False)
+}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = {
+        index['name']
+        for table in ('urls', 'team_members')
+        for index in inspector.get_indexes(table)
+    }
+    for name, (table, columns, partial) in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, table, columns,
+                            postgresql_where=sa.text('is_active') if partial else None)
+    if 'ix_urls_user_created' in existing:
+        op.drop_index('ix_urls_user_created', table_name='urls')
+
+
+def downgrade():
+    op.create_index('ix_urls_user_created', 'urls', ['user_id', 'created_at', 'id'])
+    for name, (table, columns, partial) in INDEXES.items():
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,45 @@
+import pytest
+from app import create_app, db
+from app.models import User
+from app.auth import hash_password, generate_token
+
+@pytest.fixture
+def app():
+    """Create application for testing."""
+    app = create_app('testing')
+    return app
+
+@pytest.fixture
+def client(app):
+    """Create test client."""
+    return app.test_client()
+
+@pytest.fixture
+def db_session(app):
+    """Create database session."""
+    with app.app_context():
+        db.create_all()
+        yield db
+        aggregator = app.extensions.get('click_aggregator')
+        if aggregator is not None:
+            aggregator.flush()
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def test_user(db_session):
+    """Create test user."""
+    user = User(
+        username='testuser',
+        email='test@example.com',
+        password_hash=hash_password('password123')
+    )
+    db_session.session.add(user)
+    db_session.session.commit()
+    return user
+
+@pytest.fixture
+def auth_headers(test_user):
+    """Create authentication headers."""
+    token = generate_token(test_user.id, test_user.username)
+    return {'Authorization': f'Bearer {token}'}
@@ -0,0 +1,168 @@
+import pytest
+import json
+import hashlib
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import URL, Click
+
+class TestClickEvents:
+    """Test suite for raw click event logging."""
+    
+    @pytest.fixture
+    def test_url(self, db_session, test_user):
+        """Create a URL owned by the test user."""
+        url = URL(
+            long_url='https://clicked.com',
+            short_code='click1',
+            user_id=test_user.id
+        )
+        db_session.session.add(url)
+        db_session.session.commit()
+        return url
+    
+    def test_click_events_are_bulk_inserted(self, app, client, test_url):
+        """Test that redirects log click events on flush, not per request."""
+        headers = {'Referer': 'https://news.example.com/', 'User-Agent': 'TestBrowser/1.0'}
+        client.get('/click1', headers=headers)
+        client.get('/api/v1/click1', headers=headers)
+        
+        assert Click.query.count() == 0
+        app.extensions['click_aggregator'].flush()
+        
+        clicks = Click.query.all()
+        assert len(clicks) == 2
+        assert clicks[0].short_code == 'click1'
+        assert clicks[0].referrer == 'https://news.example.com/'
+        assert clicks[0].user_agent_hash == hashlib.sha256(b'TestBrowser/1.0').hexdigest()
+    
+    def test_failed_flush_caps_buffered_events(self, app, client, test_url, monkeypatch):
+        """Test that events beyond the cap are dropped oldest first while flushes fail."""
+        aggregator = app.extensions['click_aggregator']
+        aggregator.max_events = 2
+        for referrer in ('https://a.com/', 'https://b.com/', 'https://c.com/'):
+            client.get('/click1', headers={'Referer': referrer})
+        
+        def fail(connection, hourly):
+            raise RuntimeError('database down')
+        
+        monkeypatch.setattr('app.clicks.increment_rollups', fail)
+        assert aggregator.flush() == 0
+        stats = aggregator.stats()
+        assert stats['dropped_events'] == 1
+        assert stats['pending_events'] == 2
+        assert stats['pending_clicks'] == 3
+        
+        monkeypatch.undo()
+        assert aggregator.flush() == 3
+        assert [click.referrer for click in Click.query.order_by(Click.id)] == ['https://b.com/', 'https://c.com/']
+        db.session.refresh(test_url)
+        assert test_url.click_count == 3
+    
+    def test_last_click_comes_from_click_events(self, app, client, test_url, auth_headers):
+        """Test that editing a URL no longer moves last_click."""
+        response = client.get('/api/v1/analytics/click1', headers=auth_headers)
+        assert json.loads(response.data)['last_click'] is None
+        
+        client.get('/click1')
+        app.extensions['click_aggregator'].flush()
+        clicked_at = Click.query.one().clicked_at
+        
+        client.put('/api/v1/urls/click1', json={'title': 'Edited'}, headers=auth_headers)
+        response = client.get('/api/v1/analytics/click1', headers=auth_headers)
+        assert json.loads(response.data)['last_click'] == clicked_at.isoformat()
+    
+    def test_last_click_includes_buffered_clicks(self, client, test_url, auth_headers):
+        """Test that unflushed clicks are reflected in last_click."""
+        client.get('/click1')
+        
+        response = client.get('/api/v1/analytics/click1', headers=auth_headers)
+        assert json.loads(response.data)['last_click'] is not None
+    
+    def test_flush_updates_rollups(self, app, client, test_url):
+        """Test that flushed clicks are added to hourly and daily rollups."""
+        from app.models import ClickRollupHourly, ClickRollupDaily
+        aggregator = app.extensions['click_aggregator']
+        client.get('/click1')
+        client.get('/click1')
+        aggregator.flush()
+        client.get('/click1')
+        aggregator.flush()
+        
+        hourly = ClickRollupHourly.query.filter_by(url_id=test_url.id).all()
+        daily = ClickRollupDaily.query.filter_by(url_id=test_url.id).all()
+        assert sum(row.clicks for row in hourly) == 3
+        assert len(daily) == 1 and daily[0].clicks == 3
+    
+    def test_unbuffered_clicks_update_rollups(self, monkeypatch):
+        """Test that clicks written directly, without the buffer, are rolled up too."""
+        from config import TestingConfig
+        from app.models import ClickRollupHourly, ClickRollupDaily
+        monkeypatch.setattr(TestingConfig, 'CLICK_BUFFER_ENABLED', False)
+        app = create_app('testing')
+        assert 'click_aggregator' not in app.extensions
+        client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            url = URL(long_url='https://unbuffered.com', short_code='direct1')
+            db.session.add(url)
+            db.session.commit()
+            try:
+                for _ in range(3):
+                    assert client.get('/direct1').status_code == 302
+                
+                db.session.refresh(url)
+                assert url.click_count == 3
+                assert Click.query.filter_by(url_id=url.id).count() == 3
+                assert sum(row.clicks for row in ClickRollupHourly.query.filter_by(url_id=url.id)) == 3
+                assert [row.clicks for row in ClickRollupDaily.query.filter_by(url_id=url.id)] == [3]
+            finally:
+                db.session.remove()
+                db.drop_all()
+    
+    def test_timeseries_reads_rollups(self, client, db_session, test_url, auth_headers):
+        """Test daily and hourly histograms over a date range."""
+        from app.models import ClickRollupHourly, ClickRollupDaily
+        day = datetime(2024, 3, 1)
+        db_session.session.add_all([
+            ClickRollupDaily(url_id=test_url.id, bucket_start=day, clicks=4),
+            ClickRollupDaily(url_id=test_url.id, bucket_start=day + timedelta(days=2), clicks=6),
+            ClickRollupHourly(url_id=test_url.id, bucket_start=day + timedelta(hours=5), clicks=4)
+        ])
+        db_session.session.commit()
+        
+        response = client.get(
+            '/api/v1/analytics/click1/timeseries?interval=day&start=2024-03-01&end=2024-03-03',
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert [bucket['clicks'] for bucket in data['buckets']] == [4, 0, 6]
+        assert data['total'] == 10
+        
+        response = client.get(
+            '/api/v1/analytics/click1/timeseries?interval=hour&start=2024-03-01T00:00:00&end=2024-03-01T23:00:00',
+            headers=auth_headers
+        )
+        data = json.loads(response.data)
+        assert len(data['buckets']) == 24
+        assert data['buckets'][5]['clicks'] == 4
+    
+    def test_timeseries_includes_buffered_clicks(self, client, test_url, auth_headers):
+        """Test that unflushed clicks show up in the current bucket."""
+        client.get('/click1')
+        
+        response = client.get('/api/v1/analytics/click1/timeseries?interval=hour', headers=auth_headers)
+        data = json.loads(response.data)
+        assert data['total'] == 1
+        assert data['buckets'][-1]['clicks'] == 1
+    
+    def test_timeseries_rejects_bad_ranges(self, client, test_url, auth_headers):
+        """Test validation of interval and date range."""
+        response = client.get('/api/v1/analytics/click1/timeseries?interval=week', headers=auth_headers)
+        assert response.status_code == 400
+        
+        response = client.get(
+            '/api/v1/analytics/click1/timeseries?interval=hour&start=2000-01-01&end=2024-01-01',
+            headers=auth_headers
+        )
+        assert response.status_code == 400
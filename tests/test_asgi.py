@@ -0,0 +1,138 @@
+import pytest
+import json
+import asyncio
+from datetime import datetime, timedelta
+from app.models import User, URL
+from app.auth import hash_password, generate_token
+from app.asgi import RedirectASGIApp
+
+def call_asgi(asgi_app, method, path, body=b'', headers=None, client=('127.0.0.1', 12345)):
+    """Drive one HTTP request through the ASGI app and collect the response."""
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': b'',
+        'headers': headers or [],
+        'http_version': '1.1',
+        'scheme': 'http',
+        'server': ('localhost', 80),
+        'client': client
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+    
+    async def receive():
+        return messages.pop(0)
+    
+    async def send(message):
+        sent.append(message)
+    
+    asyncio.run(asgi_app(scope, receive, send))
+    start, payload = sent[0], sent[1]
+    return start['status'], dict(start['headers']), payload['body']
+
+class TestASGIServing:
+    """Test suite for the ASGI redirect serving mode."""
+    
+    @pytest.fixture
+    def asgi_app(self, app):
+        """Wrap the Flask app in the ASGI serving mode."""
+        asgi_app = RedirectASGIApp(app, max_threads=4)
+        yield asgi_app
+        asgi_app.executor.shutdown()
+    
+    @pytest.fixture
+    def db_session(self, db_session):
+        """Create database session with a live and an expired URL."""
+        db_session.session.add(URL(long_url='https://example.com/a b', short_code='asgi1'))
+        db_session.session.add(URL(
+            long_url='https://expired.com',
+            short_code='asgi2',
+            expires_at=datetime.utcnow() - timedelta(days=1)
+        ))
+        db_session.session.commit()
+        return db_session
+    
+    def test_redirect_and_click(self, app, asgi_app, db_session):
+        """Test that a redirect is served and its click is buffered."""
+        status, headers, body = call_asgi(asgi_app, 'GET', '/asgi1', headers=[
+            (b'referer', b'https://news.example.com'),
+            (b'user-agent', b'pytest')
+        ])
+        assert status == 302
+        assert headers[b'location'] == b'https://example.com/a%20b'
+        assert body == b''
+        
+        # Second request is answered from the redirect cache
+        status, _, _ = call_asgi(asgi_app, 'GET', '/api/v1/asgi1')
+        assert status == 302
+        
+        app.extensions['click_aggregator'].flush()
+        url = URL.query.filter_by(short_code='asgi1').first()
+        assert url.click_count == 2
+    
+    def test_expired_and_unknown(self, asgi_app, db_session):
+        """Test 410 for expired codes and 404 for unknown API codes."""
+        status, _, body = call_asgi(asgi_app, 'GET', '/asgi2')
+        assert status == 410
+        assert json.loads(body)['error'] == 'Gone'
+        
+        status, _, body = call_asgi(asgi_app, 'GET', '/api/v1/nope99')
+        assert status == 404
+        assert json.loads(body)['error'] == 'Not Found'
+        
+        # Unknown root-level paths fall through to Flask
+        status, _, body = call_asgi(asgi_app, 'GET', '/nope99')
+        assert status == 404
+    
+    def test_resolve(self, asgi_app, db_session):
+        """Test the JSON resolve endpoint."""
+        status, headers, body = call_asgi(asgi_app, 'GET', '/api/v1/resolve/asgi1')
+        assert status == 200
+        data = json.loads(body)
+        assert data['long_url'] == 'https://example.com/a b'
+        assert data['expires_at'] is None
+    
+    def test_other_routes_delegate_to_flask(self, asgi_app, db_session):
+        """Test that non-redirect requests are handled by the Flask app."""
+        user = User(username='asgiuser', email='asgi@example.com',
+                    password_hash=hash_password('password123'))
+        db_session.session.add(user)
+        db_session.session.commit()
+        token = generate_token(user.id, user.username)
+        
+        status, _, body = call_asgi(asgi_app, 'GET', '/health')
+        assert status == 200
+        assert json.loads(body)['status'] == 'healthy'
+        
+        status, _, body = call_asgi(
+            asgi_app, 'POST', '/api/v1/shorten',
+            body=json.dumps({'long_url': 'https://posted.com'}).encode(),
+            headers=[
+                (b'content-type', b'application/json'),
+                (b'authorization', f'Bearer {token}'.encode())
+            ]
+        )
+        assert status == 201
+        short_code = json.loads(body)['short_code']
+        
+        status, headers, _ = call_asgi(asgi_app, 'GET', f'/{short_code}')
+        assert status == 302
+        assert headers[b'location'] == b'https://posted.com'
+    
+    def test_lifespan_flushes_clicks(self, app, asgi_app, db_session):
+        """Test that lifespan shutdown flushes buffered clicks."""
+        call_asgi(asgi_app, 'GET', '/asgi1')
+        messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        sent = []
+        
+        async def receive():
+            return messages.pop(0)
+        
+        async def send(message):
+            sent.append(message['type'])
+        
+        asyncio.run(asgi_app({'type': 'lifespan'}, receive, send))
+        assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+        assert app.extensions['click_aggregator'].stats()['pending_clicks'] == 0
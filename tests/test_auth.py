@@ -0,0 +1,435 @@
+import bcrypt
+import jwt
+import pytest
+from datetime import datetime
+from sqlalchemy import event
+from app import create_app, db
+from app.models import User, Team, TeamMember, URL, ApiKey
+from app.auth import hash_password, verify_password, generate_token, get_current_identity
+from app.passwords import PasswordHasher, hash_rounds
+from app.api_keys import api_key_digest
+
+class TestUserResolution:
+    """Test suite for request-scoped and cached user resolution."""
+    
+    @pytest.fixture
+    def user_queries(self, db_session):
+        """Record SELECTs against the users table."""
+        statements = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT') and 'FROM users' in statement:
+                statements.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', record)
+        yield statements
+        event.remove(db.engine, 'before_cursor_execute', record)
+    
+    def test_user_is_resolved_once_per_request(self, app, client, auth_headers, user_queries):
+        """Test that the decorator and handler share one user lookup."""
+        app.extensions['user_cache'].clear()
+        app.extensions['token_revocations'].refresh()
+        db.session.expunge_all()
+        user_queries.clear()
+        
+        response = client.get('/api/v1/urls', headers=auth_headers)
+        
+        assert response.status_code == 200
+        assert len(user_queries) == 1
+    
+    def test_cached_user_skips_the_query(self, app, client, auth_headers, user_queries):
+        """Test that later requests resolve the user from the cache."""
+        app.extensions['user_cache'].clear()
+        client.get('/api/v1/urls', headers=auth_headers)
+        db.session.expunge_all()
+        user_queries.clear()
+        
+        response = client.get('/api/v1/urls', headers=auth_headers)
+        
+        assert response.status_code == 200
+        assert user_queries == []
+        assert app.extensions['user_cache'].stats()['hits'] >= 1
+    
+    def test_cached_user_can_still_create_urls(self, client, auth_headers):
+        """Test that a cached user attaches to the session for writes."""
+        client.get('/api/v1/urls', headers=auth_headers)
+        
+        response = client.post('/api/v1/shorten', json={'long_url': 'https://example.com/cached'}, headers=auth_headers)
+        
+        assert response.status_code == 201
+        assert db.session.get(User, 1).urls[0].long_url == 'https://example.com/cached'
+    
+    def test_promotion_invalidates_cached_user(self, client, test_user, auth_headers):
+        """Test that admin rights apply on the next request after an update."""
+        assert client.get('/api/v1/admin/cache/stats', headers=auth_headers).status_code == 403
+        
+        test_user.is_admin = True
+        db.session.commit()
+        
+        assert client.get('/api/v1/admin/cache/stats', headers=auth_headers).status_code == 200
+    
+    def test_deactivation_invalidates_cached_user(self, client, test_user, auth_headers):
+        """Test that a deactivated user is rejected on the next request."""
+        assert client.get('/api/v1/urls', headers=auth_headers).status_code == 200
+        
+        test_user.is_active = False
+        db.session.commit()
+        
+        assert client.get('/api/v1/urls', headers=auth_headers).status_code == 401
+
+class TestTokenClaims:
+    """Test suite for authorization claims carried in JWTs."""
+    
+    @pytest.fixture
+    def queries(self, db_session):
+        """Record every statement sent to the database."""
+        statements = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', record)
+        yield statements
+        event.remove(db.engine, 'before_cursor_execute', record)
+    
+    def headers(self, user):
+        return {'Authorization': f'Bearer {generate_token(user.id, user.username)}'}
+    
+    def test_token_carries_claims(self, app, test_user):
+        """Test that tokens include activity, admin flag, team roles and version."""
+        db.session.add(Team(name='Core'))
+        db.session.flush()
+        db.session.add(TeamMember(user_id=test_user.id, team_id=1, role='moderator'))
+        db.session.commit()
+        
+        token = generate_token(test_user.id, test_user.username)
+        payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+        
+        assert payload['act'] is True
+        assert payload['adm'] is False
+        assert payload['teams'] == {'1': 'moderator'}
+        assert payload['ver'] == db.session.get(User, test_user.id).token_version
+    
+    def test_current_token_authorizes_without_queries(self, app, test_user, queries):
+        """Test that decorators authorize a current token from its claims alone."""
+        headers = self.headers(test_user)
+        app.extensions['token_revocations'].refresh()
+        queries.clear()
+        
+        with app.test_request_context('/api/v1/urls', headers=headers):
+            identity = get_current_identity()
+        
+        assert identity.user_id == test_user.id
+        assert identity.teams == {}
+        assert queries == []
+    
+    def test_claim_changes_revoke_older_tokens(self, client, test_user):
+        """Test that promotion and deactivation apply to already issued tokens."""
+        headers = self.headers(test_user)
+        assert client.get('/api/v1/admin/cache/stats', headers=headers).status_code == 403
+        
+        test_user.is_admin = True
+        db.session.commit()
+        assert client.get('/api/v1/admin/cache/stats', headers=headers).status_code == 200
+        
+        fresh_headers = self.headers(test_user)
+        test_user.is_active = False
+        db.session.commit()
+        assert client.get('/api/v1/urls', headers=fresh_headers).status_code == 401
+    
+    def test_membership_changes_revoke_older_tokens(self, client, test_user):
+        """Test that a removed member loses team access despite the role in the token."""
+        team_id = client.post('/api/v1/teams', json={'name': 'Core'}, headers=self.headers(test_user)).get_json()['team']['id']
+        headers = self.headers(test_user)
+        assert client.get(f'/api/v1/teams/{team_id}', headers=headers).status_code == 200
+        
+        membership = TeamMember.query.filter_by(user_id=test_user.id, team_id=team_id).first()
+        db.session.delete(membership)
+        db.session.commit()
+        
+        assert client.get(f'/api/v1/teams/{team_id}', headers=headers).status_code == 403
+    
+    def test_other_workers_pick_up_revocations_on_refresh(self, app, test_user):
+        """Test that the revocation map reloads versions written by other processes."""
+        revocations = app.extensions['token_revocations']
+        revocations.refresh()
+        version = db.session.get(User, test_user.id).token_version
+        assert revocations.is_current(test_user.id, version)
+        
+        users = User.__table__
+        db.session.execute(users.update().where(users.c.id == test_user.id).values(
+            token_version=version + 1, tokens_revoked_at=datetime.utcnow()
+        ))
+        db.session.commit()
+        revocations.refresh()
+        
+        assert not revocations.is_current(test_user.id, version)
+        assert revocations.is_current(test_user.id, version + 1)
+    
+    def test_revocations_evict_caches_in_other_workers(self, monkeypatch, tmp_path):
+        """Test that demotion and removal in one worker apply in another worker's caches."""
+        from config import TestingConfig
+        from app.auth import load_user, get_team_role
+        monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'shared.db'}")
+        monkeypatch.setattr(TestingConfig, 'JWT_REVOCATION_REFRESH_INTERVAL', 0)
+        writer, reader = create_app('testing'), create_app('testing')
+        
+        with writer.app_context():
+            db.create_all()
+            user = User(username='boss', email='boss@example.com', password_hash='x', is_admin=True)
+            team = Team(name='Core')
+            db.session.add_all([user, team])
+            db.session.flush()
+            db.session.add(TeamMember(user_id=user.id, team_id=team.id, role='admin'))
+            db.session.commit()
+            user_id, team_id = user.id, team.id
+            headers = self.headers(user)
+        
+        try:
+            client = reader.test_client()
+            assert client.get('/api/v1/admin/cache/stats', headers=headers).status_code == 200
+            with reader.app_context():
+                # Warm the fallback caches the reader uses once the claims are stale
+                load_user(user_id)
+                assert get_team_role(user_id, team_id) == 'admin'
+            
+            with writer.app_context():
+                user = db.session.get(User, user_id)
+                user.is_admin = False
+                db.session.delete(TeamMember.query.filter_by(user_id=user_id).first())
+                db.session.commit()
+            
+            assert client.get('/api/v1/admin/cache/stats', headers=headers).status_code == 403
+            assert client.get(f'/api/v1/teams/{team_id}', headers=headers).status_code == 403
+            assert reader.extensions['token_revocations'].stats()['stale_tokens'] >= 2
+        finally:
+            with writer.app_context():
+                db.drop_all()
+
+class TestTeamRoleCache:
+    """Test suite for cached team membership checks."""
+    
+    @pytest.fixture
+    def users(self, db_session):
+        """Create a team owner and a second user with their auth headers."""
+        headers = []
+        for name in ('owner', 'other'):
+            user = User(username=name, email=f'{name}@example.com', password_hash=hash_password('password123'))
+            db_session.session.add(user)
+            db_session.session.commit()
+            headers.append((user, {'Authorization': f'Bearer {generate_token(user.id, user.username)}'}))
+        return headers
+    
+    @pytest.fixture
+    def team_id(self, client, users):
+        """Create a team owned by the first user."""
+        response = client.post('/api/v1/teams', json={'name': 'Growth'}, headers=users[0][1])
+        return response.get_json()['team']['id']
+    
+    @pytest.fixture
+    def membership_queries(self, db_session):
+        """Record SELECTs against the team_members table."""
+        statements = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT') and 'FROM team_members' in statement:
+                statements.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', record)
+        yield statements
+        event.remove(db.engine, 'before_cursor_execute', record)
+    
+    def test_repeated_checks_skip_the_membership_query(self, client, users, team_id, membership_queries):
+        """Test that a cached role answers later team requests."""
+        for _ in range(3):
+            assert client.get(f'/api/v1/teams/{team_id}', headers=users[0][1]).status_code == 200
+        
+        assert len(membership_queries) <= 1
+    
+    def test_adding_a_member_invalidates_cached_denial(self, client, users, team_id):
+        """Test that a cached non-membership is dropped when the user joins."""
+        (_, owner_headers), (other, other_headers) = users
+        assert client.get(f'/api/v1/teams/{team_id}', headers=other_headers).status_code == 403
+        
+        response = client.post(f'/api/v1/teams/{team_id}/members',
+                               json={'user_id': other.id, 'team_id': team_id, 'role': 'member'}, headers=owner_headers)
+        assert response.status_code == 201
+        
+        assert client.get(f'/api/v1/teams/{team_id}', headers=other_headers).status_code == 200
+    
+    def test_role_changes_and_removal_apply_immediately(self, client, users, team_id):
+        """Test that demotion and removal are picked up on the next request."""
+        (_, owner_headers), (other, other_headers) = users
+        member = TeamMember(user_id=other.id, team_id=team_id, role='admin')
+        db.session.add(member)
+        db.session.commit()
+        invite = {'user_id': users[0][0].id, 'team_id': team_id, 'role': 'member'}
+        assert client.post(f'/api/v1/teams/{team_id}/members', json=invite, headers=other_headers).status_code == 409
+        
+        member.role = 'member'
+        db.session.commit()
+        assert client.post(f'/api/v1/teams/{team_id}/members', json=invite, headers=other_headers).status_code == 403
+        
+        db.session.delete(member)
+        db.session.commit()
+        assert client.get(f'/api/v1/teams/{team_id}', headers=other_headers).status_code == 403
+
+class TestPasswordHashing:
+    """Test suite for bcrypt cost configuration and the hashing pool."""
+    
+    def test_hashes_use_the_configured_cost(self, db_session):
+        """Test that hash_password follows BCRYPT_LOG_ROUNDS."""
+        hashed = hash_password('password123')
+        
+        assert hash_rounds(hashed) == 4
+        assert verify_password('password123', hashed)
+        assert not verify_password('wrong', hashed)
+    
+    def test_pool_hashes_in_worker_processes(self):
+        """Test that a hasher with a pool round-trips through its processes."""
+        hasher = PasswordHasher(rounds=4, pool_size=1)
+        try:
+            hashed = hasher.hash('password123')
+            assert hasher.verify('password123', hashed)
+            assert not hasher.verify('wrong', hashed)
+            assert hasher.stats()['pool_started']
+        finally:
+            hasher.shutdown()
+    
+    def test_login_rehashes_outdated_cost(self, app, client, db_session):
+        """Test that a successful login upgrades a hash made with a lower cost."""
+        app.extensions['password_hasher'].rounds = 5
+        user = User(username='legacy', email='legacy@example.com',
+                    password_hash=bcrypt.hashpw(b'password123', bcrypt.gensalt(4)).decode('utf-8'))
+        db.session.add(user)
+        db.session.commit()
+        
+        assert client.post('/api/v1/auth/login', json={'username': 'legacy', 'password': 'wrong'}).status_code == 401
+        assert hash_rounds(db.session.get(User, user.id).password_hash) == 4
+        
+        response = client.post('/api/v1/auth/login', json={'username': 'legacy', 'password': 'password123'})
+        
+        assert response.status_code == 200
+        db.session.expire_all()
+        assert hash_rounds(db.session.get(User, user.id).password_hash) == 5
+        assert app.extensions['password_hasher'].stats()['rehashed'] == 1
+
+class TestApiKeys:
+    """Test suite for API key authentication."""
+    
+    def create_key(self, client, auth_headers, **data):
+        data.setdefault('name', 'ci')
+        response = client.post('/api/v1/api-keys', json=data, headers=auth_headers)
+        assert response.status_code == 201
+        return response.get_json()
+    
+    def test_key_is_stored_as_digest_only(self, client, auth_headers):
+        """Test that the key is returned once and only its digest is stored."""
+        created = self.create_key(client, auth_headers)
+        key = created['key']
+        
+        stored = db.session.get(ApiKey, created['api_key']['id'])
+        assert key.startswith('usk_')
+        assert stored.key_digest == api_key_digest(key)
+        assert key not in (stored.key_digest, stored.prefix)
+        assert created['api_key']['scopes'] == ['urls:read', 'urls:write']
+        
+        listed = client.get('/api/v1/api-keys', headers=auth_headers).get_json()
+        assert listed['total'] == 1
+        assert 'key' not in listed['api_keys'][0]
+    
+    def test_key_authenticates_scoped_endpoints(self, client, auth_headers):
+        """Test that X-API-Key and bearer keys work where a scope is declared."""
+        key = self.create_key(client, auth_headers)['key']
+        
+        response = client.post('/api/v1/shorten', json={'long_url': 'https://example.com/key'},
+                               headers={'X-API-Key': key})
+        assert response.status_code == 201
+        assert client.get('/api/v1/urls', headers={'Authorization': f'Bearer {key}'}).status_code == 200
+        
+        # Endpoints without a scope do not accept keys
+        assert client.get('/api/v1/auth/profile', headers={'X-API-Key': key}).status_code == 401
+        assert client.post('/api/v1/api-keys', json={'name': 'x'}, headers={'X-API-Key': key}).status_code == 401
+    
+    def test_missing_scope_is_rejected(self, client, auth_headers):
+        """Test that a read-only key cannot shorten URLs."""
+        key = self.create_key(client, auth_headers, scopes=['urls:read'])['key']
+        
+        response = client.post('/api/v1/shorten', json={'long_url': 'https://example.com/ro'},
+                               headers={'X-API-Key': key})
+        
+        assert response.status_code == 403
+        assert response.get_json()['error'] == 'Insufficient Scope'
+    
+    def test_unknown_and_revoked_keys_are_rejected(self, client, auth_headers):
+        """Test that revocation takes effect on the next request."""
+        created = self.create_key(client, auth_headers)
+        headers = {'X-API-Key': created['key']}
+        assert client.get('/api/v1/urls', headers={'X-API-Key': 'usk_unknown'}).status_code == 401
+        assert client.get('/api/v1/urls', headers=headers).status_code == 200
+        
+        assert client.delete(f"/api/v1/api-keys/{created['api_key']['id']}", headers=auth_headers).status_code == 200
+        
+        assert client.get('/api/v1/urls', headers=headers).status_code == 401
+    
+    def test_team_key_shortens_for_its_team(self, client, auth_headers):
+        """Test that a team-bound key defaults to, and is limited to, its team."""
+        team_id = client.post('/api/v1/teams', json={'name': 'Ops'}, headers=auth_headers).get_json()['team']['id']
+        key = self.create_key(client, auth_headers, team_id=team_id)['key']
+        
+        response = client.post('/api/v1/shorten', json={'long_url': 'https://example.com/team'},
+                               headers={'X-API-Key': key})
+        assert response.status_code == 201
+        assert URL.query.filter_by(short_code=response.get_json()['short_code']).first().team_id == team_id
+        
+        response = client.post('/api/v1/shorten', json={'long_url': 'https://example.com/other', 'team_id': team_id + 1},
+                               headers={'X-API-Key': key})
+        assert response.status_code == 403
+    
+    def test_team_key_only_reaches_its_team_urls(self, client, test_user, auth_headers):
+        """Test that a team-bound key cannot read, change or delete the owner's other URLs."""
+        team_id = client.post('/api/v1/teams', json={'name': 'Ops'}, headers=auth_headers).get_json()['team']['id']
+        db.session.add_all([
+            URL(long_url='https://example.com/personal', short_code='pers01', user_id=test_user.id, tags='shared'),
+            URL(long_url='https://example.com/team', short_code='team01', user_id=test_user.id,
+                team_id=team_id, tags='shared,ops')
+        ])
+        db.session.commit()
+        key = self.create_key(client, auth_headers, team_id=team_id,
+                              scopes=['urls:read', 'urls:write', 'analytics:read'])['key']
+        headers = {'X-API-Key': key}
+        
+        listing = client.get('/api/v1/urls?count=exact', headers=headers).get_json()
+        assert [url['short_code'] for url in listing['urls']] == ['team01']
+        assert listing['total'] == 1
+        assert client.get(f'/api/v1/urls?team_id={team_id + 1}', headers=headers).status_code == 403
+        facets = client.get('/api/v1/tags/facets', headers=headers).get_json()['tags']
+        assert {facet['tag']: facet['count'] for facet in facets} == {'shared': 1, 'ops': 1}
+        
+        assert client.get('/api/v1/urls/pers01', headers=headers).status_code == 404
+        assert client.put('/api/v1/urls/pers01', json={'title': 'Taken'}, headers=headers).status_code == 404
+        assert client.delete('/api/v1/urls/pers01', headers=headers).status_code == 404
+        assert client.get('/api/v1/analytics/pers01', headers=headers).status_code == 404
+        assert client.get('/api/v1/analytics/pers01/timeseries', headers=headers).status_code == 404
+        assert URL.query.filter_by(short_code='pers01').first().is_active
+        
+        assert client.get('/api/v1/urls/team01', headers=headers).status_code == 200
+        assert client.delete('/api/v1/urls/team01', headers=headers).status_code == 200
+        # The owner's own token still reaches personal URLs
+        assert client.get('/api/v1/urls/pers01', headers=auth_headers).status_code == 200
+    
+    def test_last_used_is_written_in_batches(self, app, client, auth_headers):
+        """Test that last-used times are buffered until the interval passes."""
+        created = self.create_key(client, auth_headers)
+        usage = app.extensions['api_key_usage']
+        usage.flush_interval = 3600
+        
+        for _ in range(3):
+            client.get('/api/v1/urls', headers={'X-API-Key': created['key']})
+        db.session.expire_all()
+        assert db.session.get(ApiKey, created['api_key']['id']).last_used_at is None
+        assert usage.stats()['pending'] == 1
+        
+        assert usage.flush() == 1
+        db.session.expire_all()
+        assert db.session.get(ApiKey, created['api_key']['id']).last_used_at is not None
@@ -0,0 +1,158 @@
+import pytest
+import json
+from app import db
+from app.models import URL, ReservedShortCode
+
+class TestBatchShorten:
+    """Test suite for the batch shorten endpoint."""
+    
+    def post_batch(self, client, auth_headers, items):
+        return client.post('/api/v1/shorten/batch',
+                         data=json.dumps(items),
+                         content_type='application/json',
+                         headers=auth_headers)
+    
+    def test_batch_creates_urls(self, client, auth_headers):
+        """Test that every valid item gets its own short code."""
+        items = [{'long_url': f'https://batch.com/{i}', 'title': f'Link {i}'} for i in range(250)]
+        response = self.post_batch(client, auth_headers, items)
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['created'] == 250
+        codes = [result['short_code'] for result in data['results']]
+        assert len(set(codes)) == 250
+        assert [result['index'] for result in data['results']] == list(range(250))
+        assert URL.query.count() == 250
+        assert URL.query.filter_by(short_code=codes[7]).first().title == 'Link 7'
+    
+    def test_batch_dedup_and_validation(self, client, db_session, test_user, auth_headers):
+        """Test per-item results for existing, repeated and invalid items."""
+        db_session.session.add(URL(long_url='https://old.com', short_code='old001', user_id=test_user.id))
+        db_session.session.commit()
+        
+        response = self.post_batch(client, auth_headers, {'items': [
+            {'long_url': 'https://OLD.com/'},
+            {'long_url': 'not-a-url'},
+            {'long_url': 'https://new.com'},
+            {'long_url': 'https://new.com'},
+            'https://plain-string.com'
+        ]})
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        results = data['results']
+        assert results[0]['status'] == 'existing' and results[0]['short_code'] == 'old001'
+        assert results[1]['status'] == 'invalid' and 'long_url' in results[1]['errors']
+        assert results[2]['status'] == 'created'
+        assert results[3]['status'] == 'existing'
+        assert results[3]['short_code'] == results[2]['short_code']
+        assert results[4]['status'] == 'invalid'
+        assert (data['created'], data['existing'], data['invalid']) == (1, 2, 2)
+        assert results[2]['short_url'].endswith('/' + results[2]['short_code'])
+    
+    def test_batch_limits(self, app, client, auth_headers):
+        """Test rejection of non-array bodies and oversized batches."""
+        response = self.post_batch(client, auth_headers, {'long_url': 'https://one.com'})
+        assert response.status_code == 422
+        
+        app.config['SHORTEN_BATCH_MAX_ITEMS'] = 2
+        response = self.post_batch(client, auth_headers, [{'long_url': 'https://a.com'}] * 3)
+        assert response.status_code == 413
+    
+    def test_batch_requires_auth(self, client, db_session):
+        """Test that the batch endpoint requires authentication."""
+        response = self.post_batch(client, {}, [{'long_url': 'https://a.com'}])
+        assert response.status_code == 401
+
+class TestImportLinks:
+    """Test suite for the import-links CLI command."""
+    
+    @pytest.fixture
+    def csv_file(self, tmp_path):
+        """Write a CSV export with one invalid row and one duplicate code."""
+        path = tmp_path / 'links.csv'
+        lines = ['long_url,short_code,created_at,click_count']
+        for i in range(25):
+            lines.append(f'https://old.example.com/{i},old{i},2020-01-0{i % 9 + 1}T00:00:00,{i}')
+        lines.append('not a url,bad1,,')
+        lines.append('https://old.example.com/dup,old3,,')
+        lines.append('"https://old.example.com/q?a=1,2",,,')
+        path.write_text('\n'.join(lines) + '\n')
+        return path
+    
+    def test_import_csv(self, app, db_session, csv_file, tmp_path):
+        """Test streaming a CSV file with per-row rejects."""
+        rejects = tmp_path / 'rejects.ndjson'
+        result = app.test_cli_runner().invoke(args=[
+            'import-links', str(csv_file), '--chunk-size', '10', '--rejects', str(rejects)
+        ])
+        
+        assert result.exit_code == 0, result.output
+        assert 'Imported 26 links, rejected 2' in result.output
+        assert 'rows/s' in result.output
+        assert URL.query.count() == 26
+        url = URL.query.filter_by(short_code='old7').first()
+        assert url.click_count == 7
+        assert url.created_at.day == 8
+        assert url.url_hash is not None
+        assert URL.query.filter_by(long_url='https://old.example.com/q?a=1,2').first() is not None
+        
+        errors = [json.loads(line) for line in rejects.read_text().splitlines()]
+        assert [error['row'] for error in sorted(errors, key=lambda e: e['row'])] == [26, 27]
+        
+        result = app.test_cli_runner().invoke(args=['import-links', str(csv_file)])
+        assert result.exit_code != 0
+        assert 'already imported' in result.output
+    
+    def test_import_resumes_after_failure(self, app, db_session, tmp_path, monkeypatch):
+        """Test that a failed import resumes after the last committed chunk."""
+        import app.importer as importer
+        path = tmp_path / 'links.ndjson'
+        path.write_text(''.join(
+            json.dumps({'long_url': f'https://nd.example.com/{i}'}) + '\n' for i in range(30)
+        ) + 'not json\n')
+        
+        original = importer._import_chunk
+        calls = []
+        
+        def failing_chunk(chunk, user_id, team_id):
+            calls.append(chunk[0][0])
+            if len(calls) == 2:
+                raise RuntimeError('database went away')
+            return original(chunk, user_id, team_id)
+        
+        monkeypatch.setattr(importer, '_import_chunk', failing_chunk)
+        result = app.test_cli_runner().invoke(args=['import-links', str(path), '--chunk-size', '10'])
+        assert result.exit_code != 0
+        assert 'resume from row 11' in result.output
+        assert URL.query.count() == 10
+        
+        monkeypatch.setattr(importer, '_import_chunk', original)
+        result = app.test_cli_runner().invoke(args=['import-links', str(path), '--chunk-size', '10'])
+        assert result.exit_code == 0, result.output
+        assert 'Resumed after row 10' in result.output
+        assert URL.query.count() == 30
+        assert db.session.query(db.func.count(db.distinct(URL.long_url))).scalar() == 30
+    
+    def test_import_rejects_reserved_codes(self, app, db_session, tmp_path):
+        """Test that codes reserved by the code pool are rejected, reporting the original record."""
+        db_session.session.add(ReservedShortCode(short_code='pool01', length=6, reserved_by='host:1'))
+        db_session.session.commit()
+        records = [
+            {'long_url': 'https://nd.example.com/reserved', 'short_code': 'pool01', 'click_count': '5'},
+            {'long_url': 'https://nd.example.com/first', 'short_code': 'dup01'},
+            {'long_url': 'https://nd.example.com/second', 'short_code': 'dup01', 'click_count': '2'}
+        ]
+        path = tmp_path / 'links.ndjson'
+        path.write_text(''.join(json.dumps(record) + '\n' for record in records))
+        rejects = tmp_path / 'rejects.ndjson'
+        
+        result = app.test_cli_runner().invoke(args=['import-links', str(path), '--rejects', str(rejects)])
+        assert result.exit_code == 0, result.output
+        assert 'Imported 1 links, rejected 2' in result.output
+        assert URL.query.filter_by(short_code='pool01').first() is None
+        
+        errors = sorted((json.loads(line) for line in rejects.read_text().splitlines()), key=lambda e: e['row'])
+        assert [error['record'] for error in errors] == [records[0], records[2]]
+        assert all(error['errors'] == {'short_code': ['Short code already exists']} for error in errors)
@@ -0,0 +1,110 @@
+import pytest
+import json
+from sqlalchemy import event
+from app import db
+from app.models import Team, URL, URLCounter
+from app.counters import url_count
+from app.importer import import_links
+
+class TestListingCounts:
+    """Test suite for maintained URL counters and listing count modes."""
+    
+    @pytest.fixture
+    def urls(self, db_session, test_user):
+        """Create a few URLs, one of them in a team."""
+        team = Team(name='Test Team')
+        db_session.session.add(team)
+        db_session.session.flush()
+        db_session.session.add_all([
+            URL(long_url=f'https://example{i}.com', short_code=f'cnt{i}', user_id=test_user.id,
+                title='Campaign' if i < 2 else 'Other', team_id=team.id if i == 0 else None)
+            for i in range(4)
+        ])
+        db_session.session.commit()
+        return team
+    
+    @pytest.fixture
+    def url_counts(self, db_session):
+        """Record COUNT queries over urls."""
+        statements = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if 'count(' in statement.lower() and 'FROM urls' in statement:
+                statements.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', record)
+        yield statements
+        event.remove(db.engine, 'before_cursor_execute', record)
+    
+    def counters(self):
+        return sorted((row.user_id, row.team_id, row.active_urls) for row in URLCounter.query.all())
+    
+    def total(self, client, auth_headers, query):
+        response = client.get(f'/api/v1/urls?{query}', headers=auth_headers)
+        assert response.status_code == 200
+        return json.loads(response.data).get('total')
+    
+    def test_counters_follow_writes(self, client, auth_headers, test_user, urls, db_session, tmp_path):
+        """Test that creates, soft and hard deletes, moves and imports adjust the counters."""
+        assert url_count(user_id=test_user.id) == 4
+        assert url_count(team_id=urls.id) == 1
+        assert self.counters() == [(test_user.id, 0, 3), (test_user.id, urls.id, 1)]
+        
+        client.post('/api/v1/shorten', headers=auth_headers, json={'long_url': 'https://new.example.com'})
+        client.post('/api/v1/shorten/batch', headers=auth_headers, json=[
+            {'long_url': 'https://batch1.example.com'}, {'long_url': 'https://batch2.example.com'}
+        ])
+        assert url_count(user_id=test_user.id) == 7
+        
+        assert client.delete('/api/v1/urls/cnt1', headers=auth_headers).status_code == 200
+        db.session.delete(URL.query.filter_by(short_code='cnt2').first())
+        URL.query.filter_by(short_code='cnt3').first().team_id = urls.id
+        db.session.commit()
+        assert url_count(user_id=test_user.id) == 5
+        assert url_count(user_id=test_user.id, team_id=urls.id) == 2
+        assert self.counters() == [(test_user.id, 0, 3), (test_user.id, urls.id, 2)]
+        
+        source = tmp_path / 'links.ndjson'
+        source.write_text('{"long_url": "https://imported.example.com"}\n')
+        import_links(str(source), user_id=test_user.id)
+        assert url_count(user_id=test_user.id, team_id=0) == 4
+        import_links(str(source), name='anonymous')
+        assert (0, 0, 1) in self.counters()
+        
+        # Counters match a full recount
+        assert url_count(user_id=test_user.id) == URL.query.filter_by(user_id=test_user.id, is_active=True).count()
+    
+    def test_count_modes(self, client, auth_headers, urls, url_counts):
+        """Test count=none|exact|estimate on cursor and offset pages."""
+        assert self.total(client, auth_headers, 'per_page=2') is None
+        assert self.total(client, auth_headers, 'per_page=2&count=exact') == 4
+        assert self.total(client, auth_headers, 'per_page=2&include_total=true') == 4
+        assert self.total(client, auth_headers, f'team_id={urls.id}&count=estimate') == 1
+        
+        response = client.get('/api/v1/urls?page=1&per_page=3', headers=auth_headers)
+        data = json.loads(response.data)
+        assert (data['total'], data['pages']) == (4, 2)
+        data = json.loads(client.get('/api/v1/urls?page=1&count=none', headers=auth_headers).data)
+        assert (data['total'], data['pages']) == (None, None)
+        
+        # Unfiltered totals come from the counters, never from COUNT(*)
+        assert url_counts == []
+        
+        response = client.get('/api/v1/urls?count=approximate', headers=auth_headers)
+        assert response.status_code == 400
+    
+    def test_filtered_estimate_is_cached(self, client, auth_headers, test_user, urls, db_session, url_counts):
+        """Test that filtered counts are reused by estimate and recomputed by exact."""
+        assert self.total(client, auth_headers, 'search=campaign&count=estimate') == 2
+        assert len(url_counts) == 1
+        
+        db_session.session.add(URL(long_url='https://late.example.com', short_code='cnt9',
+                                   user_id=test_user.id, title='Campaign'))
+        db_session.session.commit()
+        
+        assert self.total(client, auth_headers, 'search=campaign&count=estimate') == 2
+        assert len(url_counts) == 1
+        assert self.total(client, auth_headers, 'search=campaign&count=exact') == 3
+        assert len(url_counts) == 2
+        assert self.total(client, auth_headers, 'search=campaign&count=estimate') == 3
+        assert len(url_counts) == 2
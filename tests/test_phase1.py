@@ -194,6 +194,64 @@ class TestPhase1Features:
         assert data['page'] == 1
         assert data['per_page'] == 10
     
+    def test_get_user_urls_with_cursor(self, client, db_session, test_user, auth_headers):
+        """Test walking URLs newest first with opaque cursors."""
+        # Ties on created_at (including database-stamped rows) are broken by id
+        same_time = datetime(2024, 1, 1, 12, 0, 0)
+        for i in range(25):
+            url = URL(
+                long_url=f'https://example{i}.com',
+                short_code=f'curs{i:02d}',
+                user_id=test_user.id,
+                created_at=same_time if i % 3 else None
+            )
+            db_session.session.add(url)
+        db_session.session.commit()
+        expected = [
+            url.short_code for url in URL.query.order_by(URL.created_at.desc(), URL.id.desc())
+        ]
+        
+        pages = []
+        cursor = None
+        while True:
+            path = '/api/v1/urls?per_page=10' + (f'&cursor={cursor}' if cursor else '')
+            data = json.loads(client.get(path, headers=auth_headers).data)
+            assert 'total' not in data
+            pages.append(data)
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        
+        assert [len(page['urls']) for page in pages] == [10, 10, 5]
+        assert [url['short_code'] for page in pages for url in page['urls']] == expected
+        assert pages[0]['prev_cursor'] is None
+        
+        # Walking back from the last page returns the middle page again
+        response = client.get(f"/api/v1/urls?per_page=10&cursor={pages[2]['prev_cursor']}", headers=auth_headers)
+        data = json.loads(response.data)
+        assert data['urls'] == pages[1]['urls']
+        assert data['next_cursor'] is not None
+        
+        response = client.get(f"/api/v1/urls?per_page=10&cursor={data['prev_cursor']}", headers=auth_headers)
+        data = json.loads(response.data)
+        assert data['urls'] == pages[0]['urls']
+        assert data['prev_cursor'] is None
+    
+    def test_get_user_urls_total_and_invalid_cursor(self, client, db_session, test_user, auth_headers):
+        """Test the optional total and rejection of malformed cursors."""
+        for i in range(3):
+            db_session.session.add(URL(long_url=f'https://example{i}.com', short_code=f'tot{i}', user_id=test_user.id))
+        db_session.session.commit()
+        
+        response = client.get('/api/v1/urls?per_page=2&include_total=true', headers=auth_headers)
+        data = json.loads(response.data)
+        assert data['total'] == 3
+        assert len(data['urls']) == 2
+        
+        response = client.get('/api/v1/urls?cursor=not-a-cursor', headers=auth_headers)
+        assert response.status_code == 400
+        assert json.loads(response.data)['message'] == 'Invalid cursor'
+    
     def test_search_urls(self, client, db_session, test_user, auth_headers):
         """Test URL search functionality."""
         # Create URLs with different titles
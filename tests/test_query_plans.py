@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models import Team, TeamMember, URL
+
+class TestQueryPlans:
+    """Test that the hot URL queries are served by their indexes (SQLite EXPLAIN QUERY PLAN)."""
+    
+    @pytest.fixture
+    def test_user(self, db_session, test_user):
+        """Give the test user a team and URLs, half of them in the team."""
+        team = Team(name='Test Team')
+        db_session.session.add(team)
+        db_session.session.flush()
+        db_session.session.add(TeamMember(user_id=test_user.id, team_id=team.id, role='member'))
+        for i in range(30):
+            db_session.session.add(URL(
+                long_url=f'https://example{i}.com',
+                short_code=f'plan{i:02d}',
+                user_id=test_user.id,
+                team_id=team.id if i % 2 else None,
+                click_count=i
+            ))
+        db_session.session.commit()
+        return test_user
+    
+    @pytest.fixture
+    def plans(self, db_session):
+        """Collect the query plan of every SELECT on urls run while the fixture is active."""
+        statements = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().startswith('SELECT') and 'FROM urls' in statement:
+                statements.append((statement, parameters))
+        
+        event.listen(db.engine, 'before_cursor_execute', record)
+        
+        def explain():
+            with db.engine.connect() as connection:
+                return [
+                    (statement, ' | '.join(row[-1] for row in connection.exec_driver_sql(
+                        f'EXPLAIN QUERY PLAN {statement}', parameters
+                    )))
+                    for statement, parameters in statements
+                ]
+        
+        yield explain
+        event.remove(db.engine, 'before_cursor_execute', record)
+    
+    def test_listing_uses_owner_index(self, client, auth_headers, plans):
+        """Test that listing pages, with and without cursor or team filter, need no sort."""
+        first = client.get('/api/v1/urls?per_page=5', headers=auth_headers).get_json()
+        client.get(f"/api/v1/urls?per_page=5&cursor={first['next_cursor']}", headers=auth_headers)
+        client.get('/api/v1/urls?per_page=5&team_id=1', headers=auth_headers)
+        
+        listing = [plan for statement, plan in plans() if 'ORDER BY urls.created_at' in statement]
+        assert len(listing) == 3
+        for plan in listing:
+            assert 'USING INDEX ix_urls_user_active_created (user_id=? AND is_active=?' in plan
+            assert 'TEMP B-TREE' not in plan
+    
+    def test_team_analytics_use_team_index(self, client, auth_headers, plans):
+        """Test that team stats are index-only aggregates."""
+        response = client.get('/api/v1/analytics/plan29', headers=auth_headers)
+        assert response.status_code == 200
+        assert response.get_json()['team_stats'] == {'total_urls': 15, 'total_clicks': 225, 'team_rank': 1}
+        
+        team = [plan for statement, plan in plans() if 'urls.team_id = ?' in statement]
+        assert len(team) == 2
+        for plan in team:
+            assert 'USING COVERING INDEX ix_urls_team_active_clicks' in plan
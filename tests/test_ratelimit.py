@@ -0,0 +1,223 @@
+import pytest
+import json
+from config import TestingConfig
+from app import create_app, db
+from app.models import URL
+from app.asgi import RedirectASGIApp
+from app.ratelimit import Rate, TokenBucketTable
+from tests.test_asgi import call_asgi
+
+class TestTokenBuckets:
+    """Test suite for the shared token-bucket table."""
+    
+    @pytest.fixture
+    def table(self, tmp_path):
+        """Create a small bucket table."""
+        table = TokenBucketTable(str(tmp_path / 'buckets.bin'), num_slots=64)
+        yield table
+        table.close()
+    
+    def test_parse_rate(self):
+        """Test parsing of rate strings."""
+        assert Rate.parse('100/minute') == Rate(100, 60)
+        assert Rate.parse('5 / seconds') == Rate(5, 1)
+        with pytest.raises(ValueError):
+            Rate.parse('100/fortnight')
+    
+    def test_bucket_refills(self, table):
+        """Test that a bucket empties and refills at the configured rate."""
+        rate = Rate(3, 60)  # one token every 20 seconds
+        results = [table.consume('ip:1', rate, now=1000.0) for _ in range(4)]
+        assert [result.allowed for result in results] == [True, True, True, False]
+        assert results[2].remaining == 0
+        assert results[3].retry_after == 20
+        assert results[3].reset == 60
+        
+        assert not table.consume('ip:1', rate, now=1019.0).allowed
+        refilled = table.consume('ip:1', rate, now=1020.0)
+        assert refilled.allowed
+        assert refilled.remaining == 0
+        
+        # Other keys have their own bucket
+        assert table.consume('ip:2', rate, now=1020.0).remaining == 2
+    
+    def test_shared_between_tables(self, table):
+        """Test that two mappings of the same file share buckets (as workers do)."""
+        other = TokenBucketTable(table.path, num_slots=64)
+        try:
+            rate = Rate(2, 60)
+            assert table.consume('user:7', rate, now=1000.0).allowed
+            assert other.consume('user:7', rate, now=1000.0).allowed
+            assert not table.consume('user:7', rate, now=1000.0).allowed
+        finally:
+            other.close()
+    
+    def test_full_set_evicts_stalest(self, tmp_path):
+        """Test that a full set reuses the least recently updated slot."""
+        table = TokenBucketTable(str(tmp_path / 'tiny.bin'), num_slots=4)
+        try:
+            rate = Rate(1, 60)
+            for index in range(5):
+                assert table.consume(f'ip:{index}', rate, now=1000.0 + index).allowed
+            # ip:0 was dropped and starts with a full bucket; ip:4 is still limited
+            assert table.consume('ip:0', rate, now=1010.0).allowed
+            assert not table.consume('ip:4', rate, now=1010.0).allowed
+        finally:
+            table.close()
+
+class TestRateLimiting:
+    """Test suite for rate limits on the API and redirect paths."""
+    
+    @pytest.fixture
+    def app(self, monkeypatch, tmp_path):
+        """Create application for testing with small limits."""
+        monkeypatch.setattr(TestingConfig, 'RATE_LIMIT_ENABLED', True)
+        monkeypatch.setattr(TestingConfig, 'RATE_LIMIT_REDIRECT', '3/minute')
+        monkeypatch.setattr(TestingConfig, 'RATE_LIMIT_SHORTEN', '2/minute')
+        monkeypatch.setattr(TestingConfig, 'RATE_LIMIT_SHORTEN_BATCH', '5/minute')
+        monkeypatch.setattr(TestingConfig, 'RATE_LIMIT_LOGIN', '2/minute')
+        monkeypatch.setattr(TestingConfig, 'RATE_LIMIT_LOGIN_IP', '3/minute')
+        monkeypatch.setattr(TestingConfig, 'RATE_LIMIT_STORAGE_PATH', str(tmp_path / 'buckets.bin'))
+        monkeypatch.setattr(TestingConfig, 'RATE_LIMIT_SLOTS', 256)
+        app = create_app('testing')
+        yield app
+        app.extensions['rate_limiter'].table.close()
+    
+    @pytest.fixture
+    def db_session(self, db_session):
+        """Create database session with one URL to redirect to."""
+        db_session.session.add(URL(long_url='https://example.com/limited', short_code='limit1'))
+        db_session.session.commit()
+        return db_session
+    
+    def test_disabled_in_testing(self, monkeypatch):
+        """Test that the limiter is off unless enabled."""
+        monkeypatch.undo()
+        app = create_app('testing')
+        assert 'rate_limiter' not in app.extensions
+    
+    def test_shorten_limited_per_user(self, app, client, auth_headers):
+        """Test that shortening is limited per user, with RateLimit headers."""
+        for index in range(2):
+            response = client.post('/api/v1/shorten', headers=auth_headers,
+                                   json={'long_url': f'https://example.com/{index}'})
+            assert response.status_code == 201
+            assert response.headers['RateLimit-Limit'] == '2'
+            assert response.headers['RateLimit-Remaining'] == str(1 - index)
+        
+        response = client.post('/api/v1/shorten', headers=auth_headers,
+                               json={'long_url': 'https://example.com/2'})
+        assert response.status_code == 429
+        assert response.json['error'] == 'Too Many Requests'
+        assert int(response.headers['Retry-After']) > 0
+        assert response.headers['RateLimit-Remaining'] == '0'
+        
+        # Unlimited endpoints carry no headers
+        response = client.get('/api/v1/urls', headers=auth_headers)
+        assert response.status_code == 200
+        assert 'RateLimit-Limit' not in response.headers
+    
+    def test_batch_shorten_charged_per_url(self, app, client, auth_headers):
+        """Test that a batch takes one token per URL from its own bucket."""
+        items = [{'long_url': f'https://example.com/{index}'} for index in range(4)]
+        response = client.post('/api/v1/shorten/batch', headers=auth_headers, json=items)
+        assert response.status_code == 200
+        assert response.headers['RateLimit-Remaining'] == '1'
+        
+        response = client.post('/api/v1/shorten/batch', headers=auth_headers, json=items[:2])
+        assert response.status_code == 429
+        
+        # Single shortening has a separate bucket
+        response = client.post('/api/v1/shorten', headers=auth_headers,
+                               json={'long_url': 'https://example.com/single'})
+        assert response.status_code == 201
+    
+    def test_batch_larger_than_bucket_takes_full_bucket(self, app, client, auth_headers):
+        """Test that a batch above the limit is charged a full bucket instead of never passing."""
+        items = [{'long_url': f'https://example.com/{index}'} for index in range(8)]
+        response = client.post('/api/v1/shorten/batch', headers=auth_headers, json=items)
+        assert response.status_code == 200
+        assert response.headers['RateLimit-Remaining'] == '0'
+        
+        response = client.post('/api/v1/shorten/batch', headers=auth_headers, json=items[:1])
+        assert response.status_code == 429
+    
+    def test_login_limited_per_address_and_username(self, app, client, test_user):
+        """Test that guesses from one address do not lock the owner out elsewhere."""
+        for _ in range(2):
+            response = client.post('/api/v1/auth/login', json={
+                'username': 'TestUser', 'password': 'wrong'
+            }, environ_base={'REMOTE_ADDR': '10.0.0.1'})
+            assert response.status_code == 401
+        
+        response = client.post('/api/v1/auth/login', json={
+            'username': 'testuser', 'password': 'wrong'
+        }, environ_base={'REMOTE_ADDR': '10.0.0.1'})
+        assert response.status_code == 429
+        
+        response = client.post('/api/v1/auth/login', json={
+            'username': 'testuser', 'password': 'password123'
+        }, environ_base={'REMOTE_ADDR': '10.0.0.9'})
+        assert response.status_code == 200
+    
+    def test_login_limited_per_address(self, app, client, test_user):
+        """Test that one address cannot spray guesses across many usernames."""
+        for index in range(3):
+            response = client.post('/api/v1/auth/login', json={
+                'username': f'user{index}', 'password': 'wrong'
+            }, environ_base={'REMOTE_ADDR': '10.0.0.1'})
+            assert response.status_code == 401
+        
+        response = client.post('/api/v1/auth/login', json={
+            'username': 'user3', 'password': 'wrong'
+        }, environ_base={'REMOTE_ADDR': '10.0.0.1'})
+        assert response.status_code == 429
+    
+    def test_fast_path_redirects_limited_per_ip(self, app, client, db_session, monkeypatch):
+        """Test that root-level redirects are limited per client address."""
+        for _ in range(3):
+            response = client.get('/limit1')
+            assert response.status_code == 302
+            assert 'RateLimit-Remaining' in response.headers
+        
+        response = client.get('/limit1')
+        assert response.status_code == 429
+        assert json.loads(response.data)['error'] == 'Too Many Requests'
+        assert 'Retry-After' in response.headers
+        
+        # Another address has its own bucket
+        response = client.get('/limit1', environ_base={'REMOTE_ADDR': '10.1.1.1'})
+        assert response.status_code == 302
+        
+        # Unknown codes count too, and limited requests are answered before any lookup
+        import app.redirects as redirects
+        lookups = []
+        original = redirects.lookup_redirect
+        monkeypatch.setattr(redirects, 'lookup_redirect', lambda code: lookups.append(code) or original(code))
+        flood = {'REMOTE_ADDR': '10.2.2.2'}
+        assert [client.get(f'/nosuch{i}', environ_base=flood).status_code for i in range(4)] == [404, 404, 404, 429]
+        assert lookups == ['nosuch0', 'nosuch1', 'nosuch2']
+        
+        app.extensions['click_aggregator'].flush()
+        assert db.session.get(URL, 1).click_count == 4
+    
+    def test_asgi_redirects_limited_per_ip(self, app, db_session):
+        """Test that the ASGI serving mode applies the redirect limit."""
+        asgi_app = RedirectASGIApp(app, max_threads=2)
+        try:
+            for _ in range(3):
+                status, headers, _ = call_asgi(asgi_app, 'GET', '/limit1')
+                assert status == 302
+            status, headers, body = call_asgi(asgi_app, 'GET', '/limit1')
+            assert status == 429
+            assert b'retry-after' in headers
+            assert json.loads(body)['error'] == 'Too Many Requests'
+            assert call_asgi(asgi_app, 'GET', '/api/v1/resolve/limit1')[0] == 429
+            
+            # Unknown root-level codes fall through to Flask and are charged only once
+            checks = app.extensions['rate_limiter'].checks
+            status, _, _ = call_asgi(asgi_app, 'GET', '/nosuchcode', client=('10.3.3.3', 1234))
+            assert status == 404
+            assert app.extensions['rate_limiter'].checks == checks + 1
+        finally:
+            asgi_app.executor.shutdown()
@@ -0,0 +1,419 @@
+import pytest
+import json
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import URL, ClickRollupHourly
+from app.cache import LRUCache, warm_redirect_cache
+
+class TestRedirectCache:
+    """Test suite for the in-process redirect cache."""
+    
+    @pytest.fixture
+    def cached_url(self, db_session, test_user):
+        """Create a URL owned by the test user."""
+        url = URL(
+            long_url='https://cached.com',
+            short_code='cache1',
+            user_id=test_user.id
+        )
+        db_session.session.add(url)
+        db_session.session.commit()
+        return url
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = LRUCache(max_entries=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1
+        cache.set('c', 3)
+        
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+        assert cache.stats()['evictions'] == 1
+    
+    def test_memory_budget_eviction(self):
+        """Test that entries are evicted once the byte budget is exceeded."""
+        cache = LRUCache(max_entries=100, ttl=60, max_bytes=250,
+                         sizeof=lambda key, value: 100)
+        for i in range(5):
+            cache.set(i, i)
+        
+        assert len(cache) == 2
+        assert cache.stats()['bytes'] <= 250
+    
+    def test_ttl_expiry(self):
+        """Test that expired entries count as misses."""
+        cache = LRUCache(max_entries=10, ttl=-1)
+        cache.set('a', 1)
+        
+        assert cache.get('a') is None
+        assert cache.stats()['expirations'] == 1
+    
+    def test_redirect_populates_cache(self, app, client, cached_url):
+        """Test that repeated redirects are served from the cache."""
+        response = client.get('/api/v1/cache1')
+        assert response.status_code == 302
+        response = client.get('/api/v1/cache1')
+        assert response.status_code == 302
+        assert response.location == 'https://cached.com'
+        
+        stats = app.extensions['redirect_cache'].stats()
+        assert stats['misses'] == 1
+        assert stats['hits'] == 1
+    
+    def test_update_invalidates_cache(self, client, cached_url, auth_headers):
+        """Test that updating a URL invalidates its cached redirect."""
+        client.get('/api/v1/cache1')
+        
+        response = client.put('/api/v1/urls/cache1', json={
+            'long_url': 'https://updated.com'
+        }, headers=auth_headers)
+        assert response.status_code == 200
+        
+        response = client.get('/api/v1/cache1')
+        assert response.location == 'https://updated.com'
+    
+    def test_delete_invalidates_cache(self, client, cached_url, auth_headers):
+        """Test that deleting a URL invalidates its cached redirect."""
+        client.get('/api/v1/cache1')
+        
+        response = client.delete('/api/v1/urls/cache1', headers=auth_headers)
+        assert response.status_code == 200
+        
+        response = client.get('/api/v1/cache1')
+        assert response.status_code == 404
+    
+    def test_changes_by_other_workers_invalidate_cache(self, app, client, db_session, cached_url):
+        """Test that URLs edited outside this process are dropped on the next poll."""
+        sync = app.extensions['redirect_cache_sync']
+        sync.refresh_interval = 3600
+        client.get('/api/v1/cache1')
+        
+        # Another worker edits the row; this process's cache is not told
+        db_session.session.execute(URL.__table__.update().where(URL.id == cached_url.id).values(
+            long_url='https://elsewhere.com', updated_at=datetime.utcnow()
+        ))
+        db_session.session.commit()
+        assert client.get('/api/v1/cache1').location == 'https://cached.com'
+        
+        sync.refresh_interval = 0
+        assert client.get('/api/v1/cache1').location == 'https://elsewhere.com'
+        assert sync.stats()['changed_urls'] >= 1
+    
+    def test_cached_expiry_returns_gone(self, app, client, db_session, test_user):
+        """Test that expiry is honoured for cached entries."""
+        url = URL(
+            long_url='https://expired.com',
+            short_code='exp1',
+            user_id=test_user.id,
+            expires_at=datetime.utcnow() - timedelta(days=1)
+        )
+        db_session.session.add(url)
+        db_session.session.commit()
+        
+        assert client.get('/api/v1/exp1').status_code == 410
+        assert client.get('/api/v1/exp1').status_code == 410
+        assert app.extensions['redirect_cache'].stats()['hits'] == 1
+    
+    def test_cache_stats_admin_only(self, client, db_session, test_user, auth_headers):
+        """Test the cache statistics endpoint."""
+        response = client.get('/api/v1/admin/cache/stats', headers=auth_headers)
+        assert response.status_code == 403
+        
+        test_user.is_admin = True
+        db_session.session.commit()
+        
+        response = client.get('/api/v1/admin/cache/stats', headers=auth_headers)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert 'hits' in data['redirect_cache']
+    
+    def test_clicks_are_buffered_until_flush(self, app, client, cached_url, auth_headers):
+        """Test that redirects buffer clicks and flush them in one batch."""
+        for _ in range(3):
+            assert client.get('/api/v1/cache1').status_code == 302
+        
+        db.session.refresh(cached_url)
+        assert cached_url.click_count == 0
+        
+        # Analytics include clicks still sitting in this worker's buffer
+        response = client.get('/api/v1/analytics/cache1', headers=auth_headers)
+        assert json.loads(response.data)['clicks'] == 3
+        
+        aggregator = app.extensions['click_aggregator']
+        assert aggregator.flush() == 3
+        db.session.refresh(cached_url)
+        assert cached_url.click_count == 3
+        assert aggregator.stats()['pending_clicks'] == 0
+    
+    def test_click_buffer_flushes_when_full(self, app, client, cached_url):
+        """Test that a full buffer is flushed without waiting for the interval."""
+        app.extensions['click_aggregator'].max_pending = 2
+        client.get('/api/v1/cache1')
+        client.get('/api/v1/cache1')
+        
+        db.session.refresh(cached_url)
+        assert cached_url.click_count == 2
+    
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test that every added key is reported as possibly present."""
+        from app.bloom import BloomFilter
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        codes = [f'code{i}' for i in range(1000)]
+        for code in codes:
+            bloom.add(code)
+        
+        assert all(code in bloom for code in codes)
+        false_positives = sum(f'other{i}' in bloom for i in range(10000))
+        assert false_positives < 300
+    
+    def test_unknown_code_rejected_without_query(self, app, client, cached_url):
+        """Test that the filter answers 404 for unknown codes."""
+        code_filter = app.extensions['short_code_filter']
+        code_filter.refresh_interval = 3600
+        
+        assert client.get('/api/v1/nope42').status_code == 404
+        assert client.get('/api/v1/cache1').status_code == 302
+        assert code_filter.stats()['rejections'] == 1
+    
+    def test_filter_dropped_by_another_thread(self, app, db_session, cached_url, monkeypatch):
+        """Test that a lookup survives the filter being dropped for a rebuild meanwhile."""
+        code_filter = app.extensions['short_code_filter']
+        build = code_filter.build
+        
+        def build_then_drop():
+            bloom = build()
+            code_filter._filter = None  # as add() does once over capacity
+            return bloom
+        
+        monkeypatch.setattr(code_filter, 'build', build_then_drop)
+        assert code_filter.might_contain('cache1')
+        code_filter.refresh_interval = 0
+        assert not code_filter.might_contain('nope42')
+    
+    def test_new_codes_are_added_to_filter(self, app, client, db_session, cached_url, test_user):
+        """Test that inserts after the filter is built are not rejected."""
+        code_filter = app.extensions['short_code_filter']
+        code_filter.refresh_interval = 3600
+        client.get('/api/v1/cache1')
+        
+        url = URL(long_url='https://fresh.com', short_code='fresh1', user_id=test_user.id)
+        db_session.session.add(url)
+        db_session.session.commit()
+        
+        assert client.get('/api/v1/fresh1').status_code == 302
+    
+    def test_filter_catches_up_with_other_workers(self, app, client, db_session, cached_url):
+        """Test that codes inserted elsewhere are found after a refresh."""
+        code_filter = app.extensions['short_code_filter']
+        code_filter.refresh_interval = 0
+        client.get('/api/v1/cache1')
+        
+        # A core insert bypasses the ORM hook, like a write from another worker
+        db_session.session.execute(URL.__table__.insert().values(
+            long_url='https://elsewhere.com', short_code='else1', is_active=True
+        ))
+        db_session.session.commit()
+        
+        assert client.get('/api/v1/else1').status_code == 302
+    
+    def test_filter_catches_rows_committed_out_of_id_order(self, app, client, db_session, cached_url):
+        """Test that a row committed after rows with later ids is still found."""
+        code_filter = app.extensions['short_code_filter']
+        code_filter.refresh_interval = 0
+        insert = URL.__table__.insert()
+        
+        db_session.session.execute(insert.values(id=300, long_url='https://early.com', short_code='early300'))
+        db_session.session.commit()
+        assert client.get('/api/v1/nope42').status_code == 404
+        
+        # Ids 2..299 were skipped over; 150 commits later, like a slow batch or import chunk
+        db_session.session.execute(insert.values(id=150, long_url='https://late.com', short_code='late150'))
+        db_session.session.commit()
+        assert client.get('/late150').status_code == 302
+        assert client.get('/api/v1/late150').status_code == 302
+        
+        # Seen ids stop being re-checked
+        assert 150 not in code_filter._pending
+        assert 299 in code_filter._pending
+    
+    def test_root_fast_path_redirect(self, app, client, cached_url):
+        """Test that /<code> is served by the WSGI fast path."""
+        response = client.get('/cache1')
+        
+        assert response.status_code == 302
+        assert response.location == 'https://cached.com'
+        assert app.extensions['click_aggregator'].pending(cached_url.id) == 1
+    
+    def test_root_fast_path_expired(self, client, db_session, test_user):
+        """Test that expired codes return 410 from the fast path."""
+        url = URL(
+            long_url='https://expired.com',
+            short_code='exp2',
+            user_id=test_user.id,
+            expires_at=datetime.utcnow() - timedelta(days=1)
+        )
+        db_session.session.add(url)
+        db_session.session.commit()
+        
+        response = client.get('/exp2')
+        assert response.status_code == 410
+        assert json.loads(response.data)['error'] == 'Gone'
+    
+    def test_root_fast_path_falls_through(self, client, db_session):
+        """Test that unknown codes and app routes still reach Flask."""
+        response = client.get('/unknown1')
+        assert response.status_code == 404
+        assert json.loads(response.data)['error'] == 'Not Found'
+        
+        response = client.get('/health')
+        assert response.status_code == 200
+    
+    def test_warm_up_preloads_hottest_urls(self, app, db_session):
+        """Test that start-up warm-up loads the most clicked live URLs."""
+        for i, clicks in enumerate([50, 5, 30, 1]):
+            db_session.session.add(URL(
+                long_url=f'https://hot{i}.com', short_code=f'hot{i}', click_count=clicks
+            ))
+        db_session.session.add(URL(
+            long_url='https://expired.com', short_code='hotexp', click_count=500,
+            expires_at=datetime.utcnow() - timedelta(days=1)
+        ))
+        db_session.session.commit()
+        
+        assert warm_redirect_cache(app) is None  # disabled by default
+        
+        app.config['REDIRECT_CACHE_WARMUP_ENABLED'] = True
+        app.config['REDIRECT_CACHE_WARMUP_SIZE'] = 2
+        stats = warm_redirect_cache(app)
+        cache = app.extensions['redirect_cache']
+        
+        assert stats['loaded'] == 2
+        assert stats['timed_out'] is False
+        assert stats['click_coverage'] == round(80 / 86, 4)
+        assert 'hot0' in cache and 'hot2' in cache
+        assert 'hot1' not in cache and 'hotexp' not in cache
+    
+    def test_warm_up_by_recent_clicks(self, app, db_session):
+        """Test that the recent strategy ranks by rollup clicks in the window."""
+        old = URL(long_url='https://old.com', short_code='old1', click_count=1000)
+        new = URL(long_url='https://new.com', short_code='new1', click_count=3)
+        db_session.session.add_all([old, new])
+        db_session.session.commit()
+        hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        db_session.session.add_all([
+            ClickRollupHourly(url_id=new.id, bucket_start=hour, clicks=3),
+            ClickRollupHourly(url_id=old.id, bucket_start=hour - timedelta(days=3), clicks=1000)
+        ])
+        db_session.session.commit()
+        
+        app.config.update(
+            REDIRECT_CACHE_WARMUP_ENABLED=True,
+            REDIRECT_CACHE_WARMUP_SIZE=1,
+            REDIRECT_CACHE_WARMUP_STRATEGY='recent'
+        )
+        stats = warm_redirect_cache(app)
+        
+        assert stats['loaded'] == 1
+        assert stats['click_coverage'] == 1.0
+        assert 'new1' in app.extensions['redirect_cache']
+
+class TestSharedRedirectTable:
+    """Test suite for the memory-mapped cross-worker redirect table."""
+    
+    @pytest.fixture
+    def table_path(self, tmp_path):
+        """Path for a table file."""
+        return str(tmp_path / 'redirects.tbl')
+    
+    def test_set_get_delete(self, table_path):
+        """Test basic operations through a separate read-only mapping."""
+        from app.shared_table import SharedRedirectTable
+        writer = SharedRedirectTable.create(table_path, num_slots=64, slot_size=256)
+        reader = SharedRedirectTable.open(table_path)
+        expires = datetime(2030, 1, 1, 12, 0, 0)
+        
+        assert writer.set('abc123', 7, 'https://example.com', expires)
+        entry = reader.get('abc123')
+        assert entry.long_url == 'https://example.com'
+        assert entry.url_id == 7
+        assert entry.expires_at == expires
+        
+        writer.set('abc123', 7, 'https://changed.com')
+        assert reader.get('abc123').long_url == 'https://changed.com'
+        
+        assert writer.delete('abc123')
+        assert reader.get('abc123') is None
+        assert reader.entries == 0
+    
+    def test_collisions_and_tombstones(self, table_path):
+        """Test that probe chains survive deletes in a crowded table."""
+        from app.shared_table import SharedRedirectTable
+        table = SharedRedirectTable.create(table_path, num_slots=16, slot_size=128)
+        codes = [f'c{i}' for i in range(12)]
+        for i, code in enumerate(codes):
+            assert table.set(code, i, f'https://example.com/{i}')
+        
+        for code in codes[::2]:
+            table.delete(code)
+        for i, code in enumerate(codes):
+            entry = table.get(code)
+            if i % 2:
+                assert entry.long_url == f'https://example.com/{i}'
+            else:
+                assert entry is None
+    
+    def test_oversized_url_is_skipped(self, table_path):
+        """Test that URLs too long for a slot are left to the database."""
+        from app.shared_table import SharedRedirectTable
+        table = SharedRedirectTable.create(table_path, num_slots=8, slot_size=64)
+        
+        assert not table.set('long1', 1, 'https://example.com/' + 'x' * 100)
+        assert table.get('long1') is None
+    
+    def test_update_to_oversized_url_drops_old_entry(self, table_path):
+        """Test that a link changed to a URL too long for a slot stops serving the old URL."""
+        from app.shared_table import SharedRedirectTable
+        table = SharedRedirectTable.create(table_path, num_slots=8, slot_size=128)
+        assert table.set('upd1', 1, 'https://example.com/old')
+        
+        assert not table.set('upd1', 1, 'https://example.com/' + 'x' * 200)
+        assert table.get('upd1') is None
+        assert table.entries == 0
+    
+    def test_redirect_served_from_shared_table(self, table_path, tmp_path):
+        """Test that workers resolve codes from the shared table without a DB row."""
+        from app.shared_table import SharedRedirectTable, apply_change
+        table = SharedRedirectTable.create(table_path, num_slots=64, slot_size=256)
+        apply_change(table, {
+            'op': 'set', 'short_code': 'shared1', 'url_id': 99,
+            'long_url': 'https://shared.com', 'expires_at': None
+        })
+        
+        app = create_app('testing')
+        app.config['SHARED_REDIRECT_TABLE_ENABLED'] = True
+        app.config['SHARED_REDIRECT_TABLE_PATH'] = table_path
+        app.config['SHARED_REDIRECT_TABLE_SOCKET'] = str(tmp_path / 'writer.sock')
+        from app.shared_table import init_shared_redirect_table
+        init_shared_redirect_table(app)
+        
+        with app.app_context():
+            db.create_all()
+            response = app.test_client().get('/shared1')
+            assert response.status_code == 302
+            assert response.location == 'https://shared.com'
+            assert app.extensions['shared_redirect_table'].hits == 1
+            app.extensions['click_aggregator'].flush()
+            db.drop_all()
+    
+    def test_stale_table_is_ignored(self, table_path, tmp_path):
+        """Test that readers stop trusting a table whose writer has gone away."""
+        from app.shared_table import SharedRedirectTable, SharedTableClient
+        table = SharedRedirectTable.create(table_path, num_slots=8, slot_size=128)
+        table.set('old1', 1, 'https://old.com')
+        
+        client = SharedTableClient(table_path, str(tmp_path / 'writer.sock'), stale_after=-1)
+        assert client.get('old1') is None
+        assert client.unavailable == 1
@@ -0,0 +1,72 @@
+import pytest
+import json
+from app.models import URL
+from app.search import full_text_backend, search_terms
+from app.utils import search_urls
+
+class TestFullTextSearch:
+    """Test suite for full-text URL search."""
+    
+    @pytest.fixture
+    def urls(self, db_session, test_user):
+        """Create URLs with searchable text."""
+        urls = [
+            URL(long_url='https://a.com', short_code='srch1', user_id=test_user.id,
+                title='Spring Marketing Campaign', tags='marketing,spring'),
+            URL(long_url='https://b.com', short_code='srch2', user_id=test_user.id,
+                title='Product Page', description='Linked from the marketing newsletter'),
+            URL(long_url='https://c.com', short_code='srch3', user_id=test_user.id,
+                title='Careers', tags='hiring')
+        ]
+        db_session.session.add_all(urls)
+        db_session.session.commit()
+        return urls
+    
+    def search(self, client, auth_headers, text, **params):
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+        response = client.get(f'/api/v1/urls?search={text}&{query}', headers=auth_headers)
+        assert response.status_code == 200
+        return [url['short_code'] for url in json.loads(response.data)['urls']]
+    
+    def test_index_created(self, app, db_session):
+        """Test that create_all builds the FTS5 index on SQLite."""
+        assert full_text_backend() == 'sqlite'
+    
+    def test_search_terms(self):
+        """Test that query syntax in user input is reduced to plain tokens."""
+        assert search_terms('Spring "campaign" OR hiring*') == ['spring', 'campaign', 'or', 'hiring']
+        assert search_terms('snake_case') == ['snake', 'case']
+    
+    def test_prefix_and_all_terms(self, client, auth_headers, urls):
+        """Test that every word must match, each as a prefix, in any column."""
+        assert sorted(self.search(client, auth_headers, 'market')) == ['srch1', 'srch2']
+        assert self.search(client, auth_headers, 'market spr') == ['srch1']
+        assert self.search(client, auth_headers, 'hiring') == ['srch3']
+        assert self.search(client, auth_headers, 'arketing') == []
+        assert self.search(client, auth_headers, '"OR*') == []
+    
+    def test_ranked_results(self, client, auth_headers, urls):
+        """Test that sort=relevance puts the better match first."""
+        assert self.search(client, auth_headers, 'marketing', sort='relevance') == ['srch1', 'srch2']
+        
+        with client.application.test_request_context():
+            page = search_urls(urls[0].user_id, 'marketing')
+        assert [url.short_code for url in page.items] == ['srch1', 'srch2']
+        assert page.total == 2
+    
+    def test_index_follows_writes(self, client, auth_headers, urls, db_session):
+        """Test that inserts, updates, deletes and batch inserts keep the index in sync."""
+        response = client.put('/api/v1/urls/srch3', headers=auth_headers, json={'title': 'Engineering Jobs'})
+        assert response.status_code == 200
+        assert self.search(client, auth_headers, 'engineer') == ['srch3']
+        assert self.search(client, auth_headers, 'careers') == []
+        
+        db_session.session.delete(db_session.session.get(URL, urls[1].id))
+        db_session.session.commit()
+        assert self.search(client, auth_headers, 'newsletter') == []
+        
+        response = client.post('/api/v1/shorten/batch', headers=auth_headers, json=[
+            {'long_url': 'https://d.com', 'title': 'Quarterly Report'}
+        ])
+        assert response.status_code == 200
+        assert len(self.search(client, auth_headers, 'quarter')) == 1
@@ -0,0 +1,240 @@
+import pytest
+import json
+from datetime import datetime, timedelta
+from app import create_app, db
+from config import TestingConfig
+from app.models import URL, IdAllocator, ReservedShortCode
+from app.allocator import ShortCodeAllocator, encode_id, BASE
+from app.code_pool import ShortCodePool
+from app.utils import generate_unique_short_code, find_or_create_url
+from app.url_hash import normalize_long_url, long_url_hash
+
+class TestShortCodeAllocator:
+    """Test suite for block-based short code allocation."""
+    
+    def test_encoding_is_unique_and_grows(self):
+        """Test that ids map to distinct codes and spill into longer codes."""
+        key = b'k' * 32
+        codes = {encode_id(value, 2, key) for value in range(BASE ** 2)}
+        assert len(codes) == BASE ** 2
+        assert all(len(code) == 2 for code in codes)
+        
+        assert len(encode_id(BASE ** 2, 2, key)) == 3
+        assert encode_id(5, 6) == '000005'
+        assert encode_id(5, 6, key) != '000005'
+    
+    def test_workers_lease_disjoint_blocks(self, db_session):
+        """Test that allocators sharing the counter never hand out the same code."""
+        first = ShortCodeAllocator(block_size=10, scramble_key='secret')
+        second = ShortCodeAllocator(block_size=10, scramble_key='secret')
+        codes = [first.allocate() for _ in range(15)] + [second.allocate() for _ in range(15)]
+        
+        assert len(set(codes)) == 30
+        assert all(len(code) == 6 and code.isalnum() for code in codes)
+        assert first.stats()['blocks_leased'] == 2
+        assert db.session.get(IdAllocator, 'short_code').next_value == 41
+    
+    def test_existing_codes_are_skipped(self, db_session):
+        """Test that codes already in use are dropped when a block is leased."""
+        taken = encode_id(1, 6, None)
+        db_session.session.add(URL(long_url='https://legacy.com', short_code=taken))
+        db_session.session.commit()
+        
+        allocator = ShortCodeAllocator(block_size=5)
+        codes = [allocator.allocate() for _ in range(4)]
+        
+        assert taken not in codes
+        assert allocator.stats()['codes_skipped'] == 1
+    
+    def test_shorten_uses_allocator(self, app, client, auth_headers):
+        """Test that shortening allocates codes without per-code existence checks."""
+        response = client.post('/api/v1/shorten',
+                             data=json.dumps({'long_url': 'https://one.com'}),
+                             content_type='application/json',
+                             headers=auth_headers)
+        assert response.status_code == 201
+        
+        with app.app_context():
+            stats = app.extensions['short_code_allocator'].stats()
+            assert stats['codes_allocated'] == 1
+            assert stats['remaining_in_block'] == app.config['SHORT_CODE_BLOCK_SIZE'] - 1
+    
+    def test_taken_allocated_code_is_retried(self, app, client, db_session, auth_headers):
+        """Test that a code claimed after its block was leased is replaced, not a 500."""
+        allocator = app.extensions['short_code_allocator']
+        allocator.allocate()
+        upcoming = list(allocator._codes)[:3]
+        # Written directly, as the importer does with caller-chosen codes
+        db_session.session.execute(URL.__table__.insert(), [
+            {'long_url': f'https://imported{i}.com', 'short_code': upcoming[i], 'is_active': True}
+            for i in (0, 2)
+        ])
+        db_session.session.commit()
+        
+        response = client.post('/api/v1/shorten', headers=auth_headers, json={'long_url': 'https://one.com'})
+        assert response.status_code == 201
+        short_code = json.loads(response.data)['short_code']
+        assert short_code not in (upcoming[0], upcoming[2])
+        assert client.get(f'/api/v1/{short_code}').headers['Location'] == 'https://one.com'
+        
+        response = client.post('/api/v1/shorten/batch', headers=auth_headers, json=[
+            {'long_url': 'https://two.com'}, {'long_url': 'https://three.com'}
+        ])
+        assert response.status_code == 200
+        codes = [result['short_code'] for result in json.loads(response.data)['results']]
+        assert len(set(codes)) == 2 and upcoming[2] not in codes
+        assert URL.query.filter(URL.short_code.in_(codes)).count() == 2
+    
+    def test_random_allocator_fallback(self, app, db_session):
+        """Test that the random strategy and other lengths still work."""
+        app.extensions.pop('short_code_allocator')
+        code = generate_unique_short_code()
+        assert len(code) == 6
+        
+        app.extensions['short_code_allocator'] = ShortCodeAllocator()
+        assert len(generate_unique_short_code(length=8)) == 8
+
+class TestShortCodePool:
+    """Test suite for the pre-generated short code pool."""
+    
+    @pytest.fixture
+    def app(self):
+        """Create application for testing with the code pool enabled."""
+        from config import config
+        config['testing'].SHORT_CODE_POOL_ENABLED = True
+        config['testing'].SHORT_CODE_POOL_LENGTHS = '6,8'
+        try:
+            app = create_app('testing')
+        finally:
+            config['testing'].SHORT_CODE_POOL_ENABLED = False
+            del config['testing'].SHORT_CODE_POOL_LENGTHS
+        return app
+    
+    def test_codes_are_reserved_and_popped(self, app, db_session):
+        """Test that popped codes come from the reservation table."""
+        pool = app.extensions['short_code_pool']
+        code = generate_unique_short_code()
+        
+        assert len(code) == 6
+        assert pool.stats()['depth']['6'] == pool.target - 1
+        assert db.session.get(ReservedShortCode, code).reserved_by == pool._owner
+        assert ReservedShortCode.query.count() == pool.target
+    
+    def test_used_and_foreign_codes_are_skipped(self, app, db_session):
+        """Test that codes used by URLs or reserved by other workers are never queued."""
+        pool = ShortCodePool(app, lengths=(1,), target=62, batch_size=62, refill_interval=0)
+        db_session.session.add(URL(long_url='https://a.com', short_code='a'))
+        db_session.session.add(ReservedShortCode(short_code='b', length=1, reserved_by='other:1'))
+        db_session.session.commit()
+        
+        codes = set()
+        for _ in range(60):
+            code = pool.pop(1)
+            if code is not None:
+                codes.add(code)
+        assert 'a' not in codes and 'b' not in codes
+        assert pool.stats()['collisions'] > 0
+    
+    def test_exhaustion_falls_back(self, app, db_session):
+        """Test that an empty pool is reported and shortening still gets a code."""
+        pool = app.extensions['short_code_pool']
+        pool.refill(6)
+        pool._queues[6].clear()
+        pool._thread = type('Alive', (), {'is_alive': lambda self: True})()
+        
+        code = generate_unique_short_code()
+        assert len(code) == 6
+        stats = pool.stats()
+        assert stats['exhaustions'] == 1
+        assert stats['last_exhausted_at'] is not None
+    
+    def test_prune_removes_used_reservations(self, app, db_session):
+        """Test that reservations for codes now used by URLs are deleted."""
+        pool = app.extensions['short_code_pool']
+        code = generate_unique_short_code()
+        db_session.session.add(URL(long_url='https://used.com', short_code=code))
+        db_session.session.commit()
+        
+        pool.prune()
+        assert db.session.get(ReservedShortCode, code) is None
+        assert pool.stats()['pruned'] == 1
+    
+    def test_stale_reservations_are_reclaimed(self, app, db_session):
+        """Test that reservations left by exited workers are deleted, and live ones renewed."""
+        pool = app.extensions['short_code_pool']
+        code = generate_unique_short_code()
+        long_ago = datetime.utcnow() - timedelta(seconds=pool.reservation_timeout + 60)
+        db_session.session.add(ReservedShortCode(
+            short_code='gone01', length=6, reserved_by='exited:1', reserved_at=long_ago
+        ))
+        ReservedShortCode.query.filter_by(reserved_by=pool._owner).update({'reserved_at': long_ago})
+        db_session.session.commit()
+        
+        pool.prune()
+        db_session.session.expire_all()
+        assert db.session.get(ReservedShortCode, 'gone01') is None
+        assert ReservedShortCode.query.filter_by(reserved_by=pool._owner).count() == pool.target
+        assert pool.stats()['reclaimed'] == 1
+    
+    def test_shorten_with_length(self, app, client, auth_headers):
+        """Test that a requested length is served from that length's queue."""
+        response = client.post('/api/v1/shorten', headers=auth_headers,
+                               json={'long_url': 'https://long.com', 'length': 8})
+        assert response.status_code == 201
+        assert len(response.json['short_code']) == 8
+        pool = app.extensions['short_code_pool']
+        assert pool.stats()['depth']['8'] == pool.target - 1
+        
+        response = client.post('/api/v1/shorten', headers=auth_headers,
+                               json={'long_url': 'https://longer.com', 'length': 11})
+        assert response.status_code == 422
+    
+    def test_lengths_validated_at_startup(self, monkeypatch):
+        """Test that pool lengths that do not fit urls.short_code are rejected."""
+        monkeypatch.setattr(TestingConfig, 'SHORT_CODE_POOL_ENABLED', True)
+        monkeypatch.setattr(TestingConfig, 'SHORT_CODE_POOL_LENGTHS', '6,12')
+        with pytest.raises(ValueError, match='SHORT_CODE_POOL_LENGTHS'):
+            create_app('testing')
+
+class TestURLDeduplication:
+    """Test suite for hash-based duplicate detection on shorten."""
+    
+    def test_normalization(self):
+        """Test that equivalent spellings of a URL hash the same."""
+        assert normalize_long_url('HTTPS://Example.COM') == 'https://example.com/'
+        assert normalize_long_url('https://example.com:443/a?b#c') == 'https://example.com/a?b#c'
+        assert normalize_long_url('http://example.com:8080') == 'http://example.com:8080/'
+        assert long_url_hash('https://Example.com/Path') != long_url_hash('https://example.com/path')
+        assert len(long_url_hash('https://example.com')) == 64
+    
+    def test_hash_follows_long_url(self, db_session):
+        """Test that url_hash is set on create and kept in step on update."""
+        url = URL(long_url='https://first.com', short_code='hash01')
+        db_session.session.add(url)
+        db_session.session.commit()
+        assert url.url_hash == long_url_hash('https://first.com')
+        
+        url.long_url = 'https://second.com'
+        db_session.session.commit()
+        assert url.url_hash == long_url_hash('https://second.com')
+    
+    def test_shorten_dedups_by_hash(self, client, auth_headers):
+        """Test that shortening an equivalent URL returns the existing code."""
+        first = client.post('/api/v1/shorten',
+                          data=json.dumps({'long_url': 'https://dedup.com/page'}),
+                          content_type='application/json',
+                          headers=auth_headers)
+        second = client.post('/api/v1/shorten',
+                           data=json.dumps({'long_url': 'https://DEDUP.com:443/page'}),
+                           content_type='application/json',
+                           headers=auth_headers)
+        
+        assert first.status_code == 201
+        assert second.status_code == 200
+        assert json.loads(second.data)['short_code'] == json.loads(first.data)['short_code']
+    
+    def test_find_or_create_url(self, db_session):
+        """Test that find_or_create_url reuses rows per user/team."""
+        url = find_or_create_url('https://reuse.com')
+        assert find_or_create_url('https://reuse.com/').id == url.id
+        assert URL.query.count() == 1
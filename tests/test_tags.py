@@ -0,0 +1,110 @@
+import pytest
+import json
+from app import db
+from app.models import Team, TeamMember, URL, Tag, URLTag
+from app.auth import generate_token
+from app.tags import parse_tags
+
+class TestTags:
+    """Test suite for normalized tags, tag filtering and facets."""
+    
+    @pytest.fixture
+    def test_team(self, db_session, test_user):
+        """Create test team with the test user as member."""
+        team = Team(name='Test Team', description='A test team')
+        db_session.session.add(team)
+        db_session.session.flush()
+        db_session.session.add(TeamMember(user_id=test_user.id, team_id=team.id, role='member'))
+        db_session.session.commit()
+        return team
+    
+    @pytest.fixture
+    def auth_headers(self, test_user, test_team):
+        """Create authentication headers (after team membership, so claims include it)."""
+        token = generate_token(test_user.id, test_user.username)
+        return {'Authorization': f'Bearer {token}'}
+    
+    @pytest.fixture
+    def urls(self, db_session, test_user, test_team):
+        """Create tagged URLs."""
+        urls = [
+            URL(long_url='https://a.com', short_code='tag1', user_id=test_user.id, tags='AI, research'),
+            URL(long_url='https://b.com', short_code='tag2', user_id=test_user.id, tags='mail,research,ai'),
+            URL(long_url='https://c.com', short_code='tag3', user_id=test_user.id, tags='mail',
+                team_id=test_team.id),
+            URL(long_url='https://d.com', short_code='tag4', user_id=test_user.id, tags='research',
+                is_active=False)
+        ]
+        db_session.session.add_all(urls)
+        db_session.session.commit()
+        return urls
+    
+    def list_codes(self, client, auth_headers, query):
+        response = client.get(f'/api/v1/urls?{query}', headers=auth_headers)
+        assert response.status_code == 200
+        return sorted(url['short_code'] for url in json.loads(response.data)['urls'])
+    
+    def test_parse_tags(self):
+        """Test tag normalization."""
+        assert parse_tags(' AI, mail ,,ai ') == ['ai', 'mail']
+        assert parse_tags(None) == []
+        assert parse_tags('x' * 80) == ['x' * 50]
+    
+    def test_tags_synced_on_flush(self, db_session, urls):
+        """Test that url_tags follows inserts, updates and deletes."""
+        def names(url):
+            return sorted(name for name, in db.session.query(Tag.name).join(URLTag, URLTag.tag_id == Tag.id)
+                          .filter(URLTag.url_id == url.id))
+        
+        assert names(urls[0]) == ['ai', 'research']
+        assert Tag.query.count() == 3
+        
+        urls[0].tags = 'ml'
+        db.session.commit()
+        assert names(urls[0]) == ['ml']
+        
+        url_id = urls[1].id
+        db.session.delete(urls[1])
+        db.session.commit()
+        assert URLTag.query.filter_by(url_id=url_id).count() == 0
+    
+    def test_tag_filter_is_exact(self, client, auth_headers, urls):
+        """Test that the tag filter matches whole tags, not substrings."""
+        assert self.list_codes(client, auth_headers, 'tag=ai') == ['tag1', 'tag2']
+        assert self.list_codes(client, auth_headers, 'tag=AI&tag=mail') == ['tag2']
+        assert self.list_codes(client, auth_headers, 'tag=research&page=1') == ['tag1', 'tag2']
+        assert self.list_codes(client, auth_headers, 'tag=a') == []
+    
+    def test_batch_shorten_tags(self, client, auth_headers, urls):
+        """Test that URLs created in a batch are tagged."""
+        response = client.post('/api/v1/shorten/batch', headers=auth_headers, json=[
+            {'long_url': 'https://e.com', 'tags': 'launch'},
+            {'long_url': 'https://f.com', 'tags': 'launch, ai'}
+        ])
+        assert response.status_code == 200
+        assert len(self.list_codes(client, auth_headers, 'tag=launch')) == 2
+    
+    def test_facets_for_user(self, client, auth_headers, urls):
+        """Test per-tag counts over the user's active URLs."""
+        response = client.get('/api/v1/tags/facets', headers=auth_headers)
+        assert response.status_code == 200
+        assert json.loads(response.data)['tags'] == [
+            {'tag': 'ai', 'count': 2},
+            {'tag': 'mail', 'count': 2},
+            {'tag': 'research', 'count': 2}
+        ]
+        
+        response = client.get('/api/v1/tags/facets?limit=1', headers=auth_headers)
+        assert json.loads(response.data)['tags'] == [{'tag': 'ai', 'count': 2}]
+    
+    def test_facets_for_team(self, client, auth_headers, urls, test_team, db_session):
+        """Test team facets and the membership check."""
+        response = client.get(f'/api/v1/tags/facets?team_id={test_team.id}', headers=auth_headers)
+        assert response.status_code == 200
+        assert json.loads(response.data)['tags'] == [{'tag': 'mail', 'count': 1}]
+        
+        other = Team(name='Other Team')
+        db_session.session.add(other)
+        db_session.session.commit()
+        response = client.get(f'/api/v1/tags/facets?team_id={other.id}', headers=auth_headers)
+        assert response.status_code == 403